@@ -0,0 +1,282 @@
+import argparse
+import asyncio
+import json
+import math
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from setups import NUMERIC_COLUMNS, normalize_setups, result_payloads, setup_records, size_setups
+from result_cache import CANONICAL_DECIMALS
+import reference_tables
+import result_cache
+
+# ==========================================================
+# HTTP JSON API
+# A small asyncio HTTP/1.1 server (stdlib only) exposing the same
+# calculation as the Streamlit page.
+#
+#   python api.py --port 8600
+#
+#   POST /v1/setup   {"rider_kg": 68, "category": "Enduro", ...}
+#   POST /v1/batch   {"setups": [{...}, {...}]}
+#   GET  /v1/health
+#
+# Setup fields are the setups.py columns. Batches are sized in one
+# vectorized pass; identical canonicalized setups are served from a
+# bounded in-process LRU cache, backed by the shared result cache that
+# all API workers and app sessions on the host use (result_cache.py).
+# ==========================================================
+
+DEFAULT_PORT = 8600
+CACHE_SIZE = 50_000
+MAX_BODY_BYTES = 32 * 1024 * 1024
+OFFLOAD_BATCH_SIZE = 512  # Larger batches are sized off the event loop
+
+# ==========================================================
+# 1. RESULT CACHE
+# ==========================================================
+class LRUCache:
+    # Locked because large batches run in executor threads
+    def __init__(self, maxsize=CACHE_SIZE):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def stats(self):
+        return {"size": len(self._data), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses}
+
+def canonical_key(record, fingerprint=None):
+    # Normalized (defaults filled) inputs, rounded so float noise still hits, plus the
+    # reference-table fingerprint so a table reload doesn't serve old results
+    return (fingerprint, record["category"], record["spring_type"]) + tuple(
+        None if record[k] is None else round(record[k], CANONICAL_DECIMALS) for k in NUMERIC_COLUMNS
+    )
+
+# ==========================================================
+# 2. CALCULATION
+# ==========================================================
+def lookup(setups, cache):
+    # Canonicalize and serve what this process's LRU already holds; None marks a miss
+    columns = {k: [s.get(k) for s in setups] for k in {k for s in setups for k in s}}
+    setup = normalize_setups(columns, len(setups))
+    # Strings such as "inf" get past the JSON parser
+    infinite = [k for k in NUMERIC_COLUMNS if np.isinf(setup[k]).any()]
+    if infinite:
+        raise ValueError(f"Numbers must be finite: {', '.join(infinite)}")
+    # Tables are read once, so every key of this call agrees
+    context = result_cache.key_context()
+    records = setup_records(setup)
+    keys = [canonical_key(r, context["fingerprint"]) for r in records]
+    request = {"setup": setup, "records": records, "context": context, "keys": keys}
+    return request, [cache.get(k) for k in keys]
+
+def fill(request, results, cache, shared=None):
+    # Serve LRU misses from the shared cross-process cache (result_cache.py) and
+    # size all remaining misses together. Does SQLite I/O when shared is set, so
+    # the server runs it off the event loop.
+    setup, records, keys = request["setup"], request["records"], request["keys"]
+    shared_keys = {}
+    if shared is not None:
+        # One batched lookup for every local miss
+        local_misses = [i for i, r in enumerate(results) if r is None]
+        shared_keys = dict(zip(local_misses, result_cache.cache_keys(
+            "api.setup", [records[i] for i in local_misses], request["context"])))
+        found = shared.get_many("api.setup", list(set(shared_keys.values()))) if shared_keys else {}
+        for i, key in shared_keys.items():
+            if key in found:
+                results[i] = found[key]
+                cache.put(keys[i], results[i])
+    missing = [i for i, r in enumerate(results) if r is None]
+    if missing:
+        idx = np.array(missing)
+        subset = {k: v[idx] for k, v in setup.items()}
+        for i, payload in zip(missing, result_payloads(subset, size_setups(subset))):
+            cache.put(keys[i], payload)
+            results[i] = payload
+        if shared is not None:
+            shared.put_many("api.setup", {shared_keys[i]: results[i] for i in missing}.items())
+    return results
+
+def calculate(setups, cache, shared=None):
+    return fill(*lookup(setups, cache), cache, shared)
+
+# ==========================================================
+# 3. HTTP SERVER
+# ==========================================================
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 500: "Internal Server Error"}
+
+class NonFiniteError(ValueError):
+    pass
+
+def _reject_constant(name):
+    raise NonFiniteError(f"Numbers must be finite, got {name}")
+
+def _finite_float(text):
+    value = float(text)
+    if not math.isfinite(value):
+        raise NonFiniteError(f"Numbers must be finite, got {text}")
+    return value
+
+class SpringRateAPI:
+    def __init__(self, cache_size=CACHE_SIZE, shared=None):
+        self.cache = LRUCache(cache_size)
+        self.shared = shared
+
+    async def route(self, method, path, body):
+        if path == "/v1/health":
+            health = {"status": "ok", "tables": reference_tables.current()["version"], "cache": self.cache.stats()}
+            if self.shared is not None:
+                # stats() scans the cache file
+                loop = asyncio.get_running_loop()
+                health["shared_cache"] = await loop.run_in_executor(None, self.shared.stats)
+            return 200, health
+        if path not in ("/v1/setup", "/v1/batch"):
+            return 404, {"error": f"No route for {path}"}
+        if method != "POST":
+            return 405, {"error": "Use POST"}
+
+        try:
+            payload = json.loads(body or b"null", parse_constant=_reject_constant, parse_float=_finite_float)
+        except NonFiniteError as e:
+            return 400, {"error": str(e)}
+        except ValueError:
+            return 400, {"error": "Body must be JSON"}
+
+        try:
+            if path == "/v1/setup":
+                if not isinstance(payload, dict):
+                    return 400, {"error": "Expected a JSON object"}
+                return 200, (await self._calculate([payload]))[0]
+
+            setups = payload.get("setups") if isinstance(payload, dict) else None
+            if not isinstance(setups, list) or not all(isinstance(s, dict) for s in setups):
+                return 400, {"error": "Expected {\"setups\": [ {...}, ... ]}"}
+            if not setups:
+                return 200, {"results": []}
+            return 200, {"results": await self._calculate(setups)}
+        except (ValueError, OverflowError) as e:
+            return 400, {"error": str(e)}
+
+    async def _calculate(self, setups):
+        # LRU hits are answered on the loop; big batches and anything that
+        # touches the shared cache's SQLite file run in the default executor
+        loop = asyncio.get_running_loop()
+        if len(setups) > OFFLOAD_BATCH_SIZE:
+            # Keep the loop free for small requests while a big batch runs
+            return await loop.run_in_executor(None, calculate, setups, self.cache, self.shared)
+        request, results = lookup(setups, self.cache)
+        if all(r is not None for r in results):
+            return results
+        if self.shared is None:
+            return fill(request, results, self.cache)
+        return await loop.run_in_executor(None, fill, request, results, self.cache, self.shared)
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request_line = await reader.readline()
+                except (asyncio.LimitOverrunError, ValueError):
+                    await self._send(writer, 400, {"error": "Request line too long"}, keep_alive=False)
+                    break
+                if not request_line:
+                    break
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    await self._send(writer, 400, {"error": "Malformed request line"}, keep_alive=False)
+                    break
+
+                headers = {}
+                try:
+                    while True:
+                        line = await reader.readline()
+                        if line in (b"\r\n", b"\n", b""):
+                            break
+                        name, _, value = line.decode("latin-1").partition(":")
+                        headers[name.strip().lower()] = value.strip()
+                except (asyncio.LimitOverrunError, ValueError):
+                    # A line past the stream limit (64 KiB)
+                    await self._send(writer, 400, {"error": "Header line too long"}, keep_alive=False)
+                    break
+
+                try:
+                    length = int(headers.get("content-length", 0) or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    await self._send(writer, 400, {"error": "Invalid Content-Length"}, keep_alive=False)
+                    break
+                if length > MAX_BODY_BYTES:
+                    await self._send(writer, 413, {"error": "Body too large"}, keep_alive=False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+
+                keep_alive = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+                try:
+                    status, response = await self.route(method, target.split("?", 1)[0], body)
+                except Exception as e:  # Never drop the connection on a bug
+                    status, response = 500, {"error": f"{type(e).__name__}: {e}"}
+                await self._send(writer, status, response, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            pass
+        finally:
+            writer.close()
+
+    async def _send(self, writer, status, payload, keep_alive):
+        try:
+            body = json.dumps(payload, allow_nan=False).encode()
+        except ValueError as e:  # A non-finite number slipped into a result
+            status, body = 500, json.dumps({"error": f"Result is not valid JSON: {e}"}).encode()
+        head = (
+            f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+            "Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+async def serve(host="127.0.0.1", port=DEFAULT_PORT, cache_size=CACHE_SIZE, shared=True):
+    api = SpringRateAPI(cache_size, result_cache.default_cache() if shared else None)
+    server = await asyncio.start_server(api.handle, host, port)
+    print(f"Spring rate API on http://{host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve spring-rate calculations over HTTP/JSON.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--cache-size", type=int, default=CACHE_SIZE, help="Max cached setups")
+    parser.add_argument("--no-shared-cache", action="store_true",
+                        help="Don't use the cross-process result cache (SPRING_CACHE)")
+    args = parser.parse_args(argv)
+    asyncio.run(serve(args.host, args.port, args.cache_size, not args.no_shared_cache))
+
+if __name__ == "__main__":
+    main()
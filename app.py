@@ -1,131 +1,217 @@
+import numpy as np
 import streamlit as st
-import pandas as pd
+
+from spring_data import (
+    LB_TO_KG, KG_TO_LB, IN_TO_MM, MM_TO_IN, STONE_TO_KG,
+    CATEGORY_DATA, SKILL_MODIFIERS, SKILL_LEVELS, COUPLING_COEFFS,
+    SIZE_WEIGHT_MODS, BIKE_WEIGHT_EST, COMMON_STROKES,
+    SPRING_TYPES, PRELOAD_TURNS, DEFAULT_GEAR_KG, DEFAULT_UNSPRUNG_KG,
+)
+from spring_engine import (
+    estimate_unsprung, analyze_spring_compatibility,
+    preload_sag_pct, preload_status_tags,
+    standard_spring_options, option_fit_tags,
+)
+from sprindex import match_sprindex
+from tolerance import sag_tolerance, DEFAULT_TOLERANCES, SAG_BAND
+from sweep import sweep_grid, rate_sensitivity, chart_skill
+from ride_sim import simulate_ride, synthetic_track, read_track_csv, recommend_spring, sprung_mass_kg
+from kinematics import LeverageCurve, read_curve_csv
+from table_render import render_table, HIGHLIGHT_RECOMMENDED
+from calc_graph import CalcGraph
+import setup_store
+import reference_tables
+import frame_library
+import result_cache
+import instrumentation
 
 # ==========================================================
 # 1. CONFIGURATION & DATA CONSTANTS
 # ==========================================================
-st.set_page_config(page_title="MTB Spring Rate Calculator", page_icon="⚙️", layout="centered")
-
-# --- Constants ---
-LB_TO_KG = 0.453592
-KG_TO_LB = 2.20462
-IN_TO_MM = 25.4
-MM_TO_IN = 1/25.4
-STONE_TO_KG = 6.35029
-
-# Physics Tuning Constants
-PROGRESSIVE_CORRECTION_FACTOR = 0.97  # Reduces rate by 3% for progressive coils
-
-# --- Data Tables ---
-# NOTE: 'bias' here represents DYNAMIC ATTACK POSITION, not static seated weight.
-# Gravity bikes have higher dynamic rear load despite having steeper seat tubes.
-CATEGORY_DATA = {
-    "Downcountry": {
-        "travel": 115, "stroke": 45.0, "base_sag": 28,
-        "progression": 12, "lr_start": 2.75, "desc": "110–120 mm", "bike_mass_def_kg": 12.0,
-        "bias": 60 # XC stays relatively neutral
-    },
-    "Trail": {
-        "travel": 130, "stroke": 50.0, "base_sag": 30,
-        "progression": 15, "lr_start": 2.80, "desc": "120–140 mm", "bike_mass_def_kg": 13.5,
-        "bias": 63 
-    },
-    "All-Mountain": {
-        "travel": 145, "stroke": 55.0, "base_sag": 31,
-        "progression": 18, "lr_start": 2.90, "desc": "140–150 mm", "bike_mass_def_kg": 14.5,
-        "bias": 65
-    },
-    "Enduro": {
-        "travel": 160, "stroke": 62.5, "base_sag": 33, 
-        "progression": 22, "lr_start": 3.00, "desc": "150–170 mm", "bike_mass_def_kg": 15.11,
-        "bias": 67 # Adjusted to 67% (High dynamic load)
-    },
-    "Long Travel Enduro": {
-        "travel": 175, "stroke": 65.0, "base_sag": 34,
-        "progression": 25, "lr_start": 3.05, "desc": "170–180 mm", "bike_mass_def_kg": 16.5,
-        "bias": 69
-    },
-    "Enduro (Race focus)": {
-        "travel": 165, "stroke": 62.5, "base_sag": 32,
-        "progression": 26, "lr_start": 3.13, "desc": "160–170 mm", "bike_mass_def_kg": 15.8,
-        "bias": 68
-    },
-    "Downhill (DH)": {
-        "travel": 200, "stroke": 75.0, "base_sag": 35,
-        "progression": 30, "lr_start": 3.14, "desc": "180–210 mm", "bike_mass_def_kg": 17.5,
-        "bias": 72 # Adjusted to 72% (Dynamic descending load)
-    }
-}
-
-SKILL_MODIFIERS = {
-    "Just starting": {"bias": +4},
-    "Beginner":      {"bias": +2},
-    "Intermediate":  {"bias": 0},
-    "Advanced":      {"bias": -1},
-    "Racer":         {"bias": -2}
-}
-SKILL_LEVELS = list(SKILL_MODIFIERS.keys())
-
-# Coupling approximates how 'heavy' the rider's gear feels in the system dynamics
-COUPLING_COEFFS = {
-    "Downcountry": 0.80, "Trail": 0.75, "All-Mountain": 0.70,
-    "Enduro": 0.72, "Long Travel Enduro": 0.90, 
-    "Enduro (Race focus)": 0.78, "Downhill (DH)": 0.95
-}
-
-SIZE_WEIGHT_MODS = {"XS": -0.5, "S": -0.25, "M": 0.0, "L": 0.3, "XL": 0.6, "XXL": 0.95}
-
-BIKE_WEIGHT_EST = {
-    "Downcountry": {"Carbon": [12.2, 11.4, 10.4], "Aluminium": [13.8, 13.1, 12.5]},
-    "Trail":       {"Carbon": [14.1, 13.4, 12.8], "Aluminium": [15.4, 14.7, 14.0]},
-    "All-Mountain":{"Carbon": [15.0, 14.2, 13.5], "Aluminium": [16.2, 15.5, 14.8]},
-    "Enduro":      {"Carbon": [16.2, 15.5, 14.8], "Aluminium": [17.5, 16.6, 15.8]},
-    "Long Travel Enduro": {"Carbon": [16.8, 16.0, 15.2], "Aluminium": [18.0, 17.2, 16.5]},
-    "Enduro (Race focus)": {"Carbon": [16.0, 15.2, 14.5], "Aluminium": [17.2, 16.3, 15.5]},
-    "Downhill (DH)": {"Carbon": [17.8, 17.0, 16.2], "Aluminium": [19.5, 18.5, 17.5]}
-}
-
-SPRINDEX_DATA = {
-    "XC/Trail (55mm)": {"max_stroke": 55, "ranges": ["380-430", "430-500", "490-560", "550-610", "610-690", "650-760"]},
-    "Enduro (65mm)":   {"max_stroke": 65, "ranges": ["340-380", "390-430", "450-500", "500-550", "540-610", "610-700"]},
-    "DH (75mm)":       {"max_stroke": 75, "ranges": ["290-320", "340-370", "400-440", "450-490", "510-570", "570-630"]}
-}
-
-COMMON_STROKES = [37.5, 40.0, 42.5, 45.0, 47.5, 50.0, 52.5, 55.0, 57.5, 60.0, 62.5, 65.0, 70.0, 72.5, 75.0]
+# Opt-in per-section timing (SPRING_INSTRUMENT=1), see instrumentation.py.
+# "outputs" covers the whole Results fragment, including the nested
+# "calculations" and "rendering" sections.
+instrumentation.begin_run(st.session_state)
+with instrumentation.section("configuration"):
+    st.set_page_config(page_title="MTB Spring Rate Calculator", page_icon="⚙️", layout="centered")
+
+# --- Constants & Data Tables ---
+# Shared with the headless engine, see spring_data.py. The tables come from
+# spring_tables.json and hot-reload when it changes (reference_tables.py);
+# every cached result below is dropped on a reload.
+@st.cache_resource
+def watch_reference_tables():
+    reference_tables.on_reload(lambda tables: st.cache_data.clear())
+
+watch_reference_tables()
+reference_tables.current()
+if reference_tables.last_error():
+    st.warning(f"Reference tables not reloaded, still using the previous version: {reference_tables.last_error()}")
 
 # ==========================================================
-# 2. HELPER FUNCTIONS
+# 2. CACHED TABLES & CALCULATIONS
 # ==========================================================
-def estimate_unsprung(wheel_tier, frame_mat, has_inserts):
-    base = 1.0 
-    wheels = {"Light": 1.7, "Standard": 2.3, "Heavy": 3.0}[wheel_tier]
-    swingarm = 0.4 if frame_mat == "Carbon" else 0.7
-    inserts = 0.5 if has_inserts else 0.0
-    return base + wheels + swingarm + inserts
-
-def analyze_spring_compatibility(progression_pct, has_hbo):
-    analysis = {
-        "Linear": {"status": "", "msg": ""},
-        "Progressive": {"status": "", "msg": ""}
-    }
-    if progression_pct > 25:
-        analysis["Linear"]["status"] = "✅ Optimal"
-        analysis["Linear"]["msg"] = "Matches frame kinematics perfectly."
-        analysis["Progressive"]["status"] = "⚠️ Avoid"
-        analysis["Progressive"]["msg"] = "Risk of harsh 'Wall Effect' at bottom-out."
-    elif 12 <= progression_pct <= 25:
-        analysis["Linear"]["status"] = "✅ Compatible"
-        analysis["Linear"]["msg"] = "Use for a consistent, planted, and plush coil feel."
-        analysis["Progressive"]["status"] = "✅ Compatible"
-        analysis["Progressive"]["msg"] = "Use for more 'pop' and extra bottom-out resistance (Air-shock feel)."
-        if has_hbo:
-            analysis["Linear"]["msg"] += " (HBO handles the bottom-out)."
-    else:
-        analysis["Linear"]["status"] = "⚠️ Caution"
-        analysis["Linear"]["msg"] = "High risk of harsh bottom-outs unless shock has strong HBO."
-        analysis["Progressive"]["status"] = "✅ Optimal"
-        analysis["Progressive"]["msg"] = "Essential to compensate for the frame's lack of ramp-up."
-    return analysis
+# All physics lives in spring_engine.py so it can run without Streamlit.
+# The wrappers below memoize the table-derived labels and the pure
+# calculations across reruns and sessions; the calculations and tables
+# are also shared between worker processes via result_cache.py.
+
+# Curves are cached by their tabulated points, not by object identity
+CURVE_HASH = {LeverageCurve: lambda c: (c.shock.tobytes(), c.leverage.tobytes())}
+
+@st.cache_data
+def category_labels():
+    cat_options = list(CATEGORY_DATA.keys())
+    return cat_options, [f"{k} ({CATEGORY_DATA[k]['desc']})" for k in cat_options]
+
+@st.cache_data
+def spring_compatibility(progression_pct, has_hbo):
+    return analyze_spring_compatibility(progression_pct, has_hbo)
+
+@instrumentation.timed("calculations")
+@st.cache_data(max_entries=512, hash_funcs=CURVE_HASH)
+@result_cache.shared("app.calculate_setup")
+def calculate_setup(rider_kg, gear_kg, bike_kg, unsprung_kg, bias_pct, stroke_mm, travel_mm,
+                    target_sag, spring_type, category, lr_start, lr_end, curve):
+    # Same graph as the API and batch paths
+    g = CalcGraph(
+        rider_kg=rider_kg, gear_kg=gear_kg, bike_kg=bike_kg, unsprung_kg=unsprung_kg, bias_pct=bias_pct,
+        coupling=COUPLING_COEFFS[category], stroke_mm=stroke_mm, travel_mm=travel_mm, target_sag=target_sag,
+        spring_type=spring_type, lr_start=lr_start, lr_end=lr_end, curve=curve,
+    )
+    return {k: float(g[k]) for k in ["rear_load_lbs", "effective_lr", "sag_mm", "raw_rate", "rounded_rate"]}
+
+@instrumentation.timed("calculations")
+@st.cache_data(max_entries=512, hash_funcs=CURVE_HASH)
+@result_cache.shared("app.sprindex_match")
+def sprindex_match(raw_rate, stroke_mm, rear_load_lbs, effective_lr, curve):
+    spr = match_sprindex(raw_rate, stroke_mm, rear_load_lbs, effective_lr, curve=curve)
+    return {k: v.item() for k, v in spr.items()}
+
+@instrumentation.timed("rendering")
+@st.cache_data(max_entries=512, hash_funcs=CURVE_HASH)
+@result_cache.shared("app.spring_options_table")
+def spring_options_table(rear_load_lbs, effective_lr, center_rate, stroke_mm, curve, spring_type):
+    # Tables are cached as rendered HTML (see table_render.py, no pandas)
+    options = []
+    option_rates, option_sags = standard_spring_options(
+        rear_load_lbs, effective_lr, center_rate, stroke_mm, curve=curve, spring_type=spring_type
+    )
+    option_tags = option_fit_tags(option_rates, center_rate, option_sags)
+
+    for rate, option_sag_pct, tag in zip(option_rates, option_sags, option_tags):
+        if np.isnan(rate): continue
+        option_sag_mm = (option_sag_pct / 100) * stroke_mm
+
+        options.append({
+            "Spring Rate": f"{int(rate)} lbs",
+            "Resulting Sag (%)": f"{option_sag_pct:.1f}%",
+            "Travel Usage (mm)": f"{option_sag_mm:.1f} mm",
+            "Fit": tag
+        })
+
+    return render_table(options, highlight=HIGHLIGHT_RECOMMENDED)
+
+@instrumentation.timed("rendering")
+@st.cache_data(max_entries=512, hash_funcs=CURVE_HASH)
+@result_cache.shared("app.preload_table")
+def preload_table(rear_load_lbs, effective_lr, rate, stroke_mm, curve, spring_type):
+    preload_data = []
+    preload_sags = preload_sag_pct(rear_load_lbs, effective_lr, rate, stroke_mm, curve=curve, spring_type=spring_type)
+    preload_tags = preload_status_tags(preload_sags)
+
+    for turns, sag_pct_eff, status in zip(PRELOAD_TURNS, preload_sags, preload_tags):
+        preload_data.append({
+            "Turns": turns,
+            "Sag (%)": f"{sag_pct_eff:.1f}%",
+            "Sag (mm)": f"{(sag_pct_eff/100)*stroke_mm:.1f} mm",
+            "Status": status
+        })
+    return render_table(preload_data)
+
+@instrumentation.timed("calculations")
+@st.cache_data(max_entries=64, hash_funcs=CURVE_HASH)
+@result_cache.shared("app.tolerance_table")
+def tolerance_table(rider_kg, gear_kg, bike_kg, unsprung_kg, bias_pct, category, effective_lr, stroke_mm,
+                    rates, draws, tolerances, spring_type, curve):
+    mc = sag_tolerance(
+        rider_kg, gear_kg, bike_kg, unsprung_kg, bias_pct, COUPLING_COEFFS[category],
+        effective_lr, stroke_mm, rates, draws=draws, tolerances=dict(tolerances), spring_type=spring_type,
+        curve=curve,
+    )
+    band = f"Outside {SAG_BAND[0]:.0f}-{SAG_BAND[1]:.0f}%"
+    rows = []
+    for i, rate in enumerate(mc["rates"]):
+        rows.append({
+            "Spring Rate": f"{int(rate)} lbs",
+            "Median Sag": f"{mc['p50_sag_pct'][i]:.1f}%",
+            "90% Range": f"{mc['p05_sag_pct'][i]:.1f}-{mc['p95_sag_pct'][i]:.1f}%",
+            band: f"{mc['p_outside'][i] * 100:.1f}%",
+        })
+    best = int(np.argmin(mc["p_outside"]))
+    highlight = {"Spring Rate": lambda v: "background-color: #d4edda" if v == rows[best]["Spring Rate"] else ""}
+    return render_table(rows, highlight=highlight)
+
+def _heat(lo, hi):
+    # Cell colour from white (softest) to blue (stiffest) for the chart table
+    def colour(v):
+        t = 0.0 if hi == lo else (float(v.split()[0]) - lo) / (hi - lo)
+        return f"background-color: rgba(30, 100, 200, {0.05 + 0.45 * t:.2f})"
+    return colour
+
+@instrumentation.timed("calculations")
+@st.cache_data(max_entries=64, hash_funcs=CURVE_HASH)
+@result_cache.shared("app.spring_chart_table")
+def spring_chart_table(rider_kg, gear_kg, bike_kg, unsprung_kg, bias_pct, stroke_mm, travel_mm,
+                       spring_type, category, lr_start, lr_end, curve):
+    # Recommended rate for nearby rider masses (rows) x target sag (columns)
+    riders = np.round(rider_kg / 2.5) * 2.5 + np.arange(-15.0, 15.0 + 1e-9, 2.5)
+    riders = riders[riders > 0]
+    sags = np.arange(25.0, 35.0 + 1e-9, 1.0)
+    grid = sweep_grid(category, riders, [gear_kg], [bias_pct], sags, [stroke_mm], skills=[chart_skill(SKILL_LEVELS)],
+                      bike_kg=bike_kg, unsprung_kg=unsprung_kg, travel_mm=travel_mm, spring_type=spring_type,
+                      lr_start=lr_start, lr_end=lr_end, curve=curve)
+    rates = grid["recommended_rate"][:, 0, 0, 0, :, 0]
+    rows = [{"Rider (kg)": f"{r:g}", **{f"{s:g}%": f"{int(v)}" for s, v in zip(sags, rates[i])}}
+            for i, r in enumerate(riders)]
+    colour = _heat(np.nanmin(rates), np.nanmax(rates))
+    return render_table(rows, highlight={f"{s:g}%": colour for s in sags})
+
+@instrumentation.timed("calculations")
+@st.cache_data(max_entries=64, hash_funcs=CURVE_HASH)
+@result_cache.shared("app.sensitivity_table")
+def sensitivity_table(rider_kg, gear_kg, bike_kg, unsprung_kg, bias_pct, target_sag, stroke_mm, travel_mm,
+                      spring_type, category, lr_start, lr_end, curve):
+    setup = {"rider_kg": rider_kg, "gear_kg": gear_kg, "bike_kg": bike_kg, "unsprung_kg": unsprung_kg,
+             "bias_pct": bias_pct, "target_sag": target_sag, "stroke_mm": stroke_mm, "travel_mm": travel_mm}
+    rows = [{"Change": s["label"], "Rate Change": f"{s['delta_rate']:+.1f} lbs", "Rate Change (%)": f"{s['delta_pct']:+.1f}%"}
+            for s in rate_sensitivity(setup, category, spring_type, lr_start, lr_end, curve)]
+    return render_table(rows)
+
+@instrumentation.timed("calculations")
+@st.cache_data(max_entries=16, hash_funcs=CURVE_HASH)
+@result_cache.shared("app.ride_sim_table")
+def ride_sim_table(rear_load_lbs, unsprung_kg, rates, travel_mm, stroke_mm, speeds, preload_turns,
+                   lr_start, lr_end, curve, has_hbo, spring_type, track_length_m, track_seed, track_csv):
+    # track_csv: uploaded bytes, or None for the synthetic track
+    track = read_track_csv(track_csv) if track_csv else synthetic_track(track_length_m, seed=track_seed)
+    sim = simulate_ride(track, sprung_mass_kg(rear_load_lbs), unsprung_kg, rates, travel_mm, stroke_mm,
+                        speeds, preload_turns, lr_start, lr_end, curve, hbo=has_hbo, spring_type=spring_type)
+    best = recommend_spring(sim)
+    rows = []
+    for r, rate in enumerate(sim["rates"]):
+        for q, turns in enumerate(sim["preload_turns"]):
+            rows.append({
+                "Spring": f"{int(rate)} lbs +{turns:g}",
+                "Static Sag": f"{sim['static_sag_pct'][r, q]:.1f}%",
+                "Max Travel": f"{sim['max_travel_pct'][:, r, q].max():.0f}%",
+                "Mean Travel": f"{sim['mean_travel_pct'][:, r, q].mean():.0f}%",
+                "Bottom-outs": f"{sim['bottom_outs'][:, r, q].sum()}",
+                "Peak Shock Force": f"{sim['peak_shock_force_n'][:, r, q].max() / 1000:.1f} kN",
+            })
+    pick = rows[best[0] * len(sim["preload_turns"]) + best[1]]["Spring"]
+    highlight = {"Spring": lambda v: "background-color: #d4edda" if v == pick else ""}
+    return render_table(rows, highlight=highlight)
 
 # ==========================================================
 # 3. SESSION STATE & CALLBACKS
@@ -133,11 +219,26 @@ def analyze_spring_compatibility(progression_pct, has_hbo):
 if 'last_category' not in st.session_state:
     st.session_state.last_category = None
 
+# Counts full script runs; fragment-only reruns skip this line
+st.session_state.app_runs = st.session_state.get("app_runs", 0) + 1
+
 def reset_chassis():
     for key in ['bike_weight_man', 'rear_bias_slider']:
         if key in st.session_state:
             del st.session_state[key]
-    st.session_state.last_category = None 
+    st.session_state.last_category = None
+
+def publish(section, values):
+    # Each section is an st.fragment, so its widgets only rerun that section.
+    # When a fragment-only rerun changes what the section hands downstream,
+    # escalate to a full rerun so later sections pick the new values up.
+    previous = st.session_state.get(section)
+    fragment_rerun = st.session_state.get(f"{section}_run") == st.session_state.app_runs
+    st.session_state[section] = values
+    st.session_state[f"{section}_run"] = st.session_state.app_runs
+    if fragment_rerun and previous != values:
+        st.rerun()
+    return values
 
 # ==========================================================
 # 4. MAIN UI START
@@ -145,7 +246,7 @@ def reset_chassis():
 st.title("Pro MTB Spring Rate Calculator")
 
 # --- SETTINGS ---
-with st.expander("⚙️ Settings & Units", expanded=True):
+with instrumentation.section("configuration"), st.expander("⚙️ Settings & Units", expanded=True):
     col_u1, col_u2 = st.columns(2)
     with col_u1:
         unit_mass = st.radio("Mass Units", ["Global (kg)", "North America (lbs)", "UK Hybrid (st & kg)"])
@@ -155,376 +256,539 @@ with st.expander("⚙️ Settings & Units", expanded=True):
 # ==========================================================
 # 5. UI - RIDER
 # ==========================================================
-st.header("1. Rider Profile")
-col_r1, col_r2 = st.columns(2)
-
-with col_r1:
-    skill = st.selectbox("Rider Skill", SKILL_LEVELS, index=2)
-    
-with col_r2:
-    if unit_mass == "UK Hybrid (st & kg)":
-        stone = st.number_input("Rider Weight (st)", 5.0, 20.0, 11.0, 0.5)
-        lbs_rem = st.number_input("Rider Weight (+lbs)", 0.0, 13.9, 0.0, 1.0)
-        rider_kg = (stone * STONE_TO_KG) + (lbs_rem * LB_TO_KG)
-        st.caption(f"Total: {rider_kg:.1f} kg")
-    elif unit_mass == "North America (lbs)":
-        rider_in = st.number_input("Rider Weight (lbs)", 90.0, 280.0, 160.0, 1.0)
-        rider_kg = rider_in * LB_TO_KG
-    else:
-        # DEFAULT: Rider 68kg
-        rider_in = st.number_input("Rider Weight (kg)", 40.0, 130.0, 68.0, 0.5)
-        rider_kg = rider_in
+@st.fragment
+@instrumentation.timed("rider")
+def rider_section(unit_mass):
+    st.header("1. Rider Profile")
+    col_r1, col_r2 = st.columns(2)
+
+    with col_r1:
+        skill = st.selectbox("Rider Skill", SKILL_LEVELS, index=2)
+
+    with col_r2:
+        if unit_mass == "UK Hybrid (st & kg)":
+            stone = st.number_input("Rider Weight (st)", 5.0, 20.0, 11.0, 0.5)
+            lbs_rem = st.number_input("Rider Weight (+lbs)", 0.0, 13.9, 0.0, 1.0)
+            rider_kg = (stone * STONE_TO_KG) + (lbs_rem * LB_TO_KG)
+            st.caption(f"Total: {rider_kg:.1f} kg")
+        elif unit_mass == "North America (lbs)":
+            rider_in = st.number_input("Rider Weight (lbs)", 90.0, 280.0, 160.0, 1.0)
+            rider_kg = rider_in * LB_TO_KG
+        else:
+            # DEFAULT: Rider 68kg
+            rider_in = st.number_input("Rider Weight (kg)", 40.0, 130.0, 68.0, 0.5)
+            rider_kg = rider_in
+
+        gear_label = "Gear Weight (lbs)" if unit_mass == "North America (lbs)" else "Gear Weight (kg)"
+        # DEFAULT: Gear 4kg
+        gear_def = 5.0 if unit_mass == "North America (lbs)" else DEFAULT_GEAR_KG
+        gear_in = st.number_input(gear_label, 0.0, 25.0, gear_def, 0.5)
+        gear_kg = gear_in * LB_TO_KG if "lbs" in unit_mass else gear_in
 
-    gear_label = "Gear Weight (lbs)" if unit_mass == "North America (lbs)" else "Gear Weight (kg)"
-    # DEFAULT: Gear 4kg
-    gear_def = 5.0 if unit_mass == "North America (lbs)" else 4.0
-    gear_in = st.number_input(gear_label, 0.0, 25.0, gear_def, 0.5)
-    gear_kg = gear_in * LB_TO_KG if "lbs" in unit_mass else gear_in
+    return publish("rider", {"skill": skill, "rider_kg": rider_kg, "gear_kg": gear_kg})
 
 # ==========================================================
 # 6. UI - CHASSIS
 # ==========================================================
-st.header("2. Chassis Data")
-
-cat_options = list(CATEGORY_DATA.keys())
-cat_labels = [f"{k} ({CATEGORY_DATA[k]['desc']})" for k in cat_options]
-
-# DEFAULT: Enduro (Index 3)
-selected_idx = st.selectbox(
-    "Category", 
-    range(len(cat_options)), 
-    format_func=lambda x: cat_labels[x],
-    key='category_select',
-    index=3 
-)
-category = cat_options[selected_idx]
-defaults = CATEGORY_DATA[category]
-
-st.button("Reset Chassis to Category Defaults", on_click=reset_chassis)
-
-col_c1, col_c2 = st.columns(2)
-
-# --- Bike Weight ---
-with col_c1:
-    weight_mode = st.radio("Bike Weight Mode", ["Manual Input", "Estimate"], index=0, horizontal=True)
-    if weight_mode == "Estimate":
-        mat = st.selectbox("Frame Material", ["Carbon", "Aluminium"])
-        level = st.selectbox("Build Level", ["Entry-Level", "Mid-Level", "High-End"])
-        size = st.selectbox("Size", list(SIZE_WEIGHT_MODS.keys()), index=2)
-        
-        level_idx = {"Entry-Level": 0, "Mid-Level": 1, "High-End": 2}[level]
-        base_w = BIKE_WEIGHT_EST[category][mat][level_idx]
-        est_w = base_w + SIZE_WEIGHT_MODS[size]
-        
-        st.info(f"Estimated: {est_w:.2f} kg ({est_w * KG_TO_LB:.1f} lbs)")
-        bike_kg = est_w
-    else:
-        is_lbs = unit_mass == "North America (lbs)"
-        lbl = "Bike Weight (lbs)" if is_lbs else "Bike Weight (kg)"
-        
-        def_w_kg = defaults.get("bike_mass_def_kg", 14.5)
-        def_w_val = def_w_kg * KG_TO_LB if is_lbs else def_w_kg
-        min_w, max_w = (15.0, 66.0) if is_lbs else (7.0, 30.0)
-        
-        w_in = st.number_input(lbl, min_w, max_w, float(def_w_val), 0.1, key="bike_weight_man")
-        bike_kg = w_in * LB_TO_KG if is_lbs else w_in
-
-# --- Rear Bias ---
-with col_c2:
-    cat_def_bias = int(defaults["bias"])
-    skill_suggestion = SKILL_MODIFIERS[skill]["bias"]
-    
-    cl1, cl2 = st.columns([0.7, 0.3])
-    with cl1:
-        st.markdown("### Rear Bias")
-    with cl2:
-        if st.button("Reset", help=f"Reset to {cat_def_bias}%"):
-            st.session_state.rear_bias_slider = cat_def_bias
-            st.rerun()
-
-    if 'rear_bias_slider' not in st.session_state:
-        st.session_state.rear_bias_slider = cat_def_bias
-        
-    rear_bias_in = st.slider(
-        "Base Bias (%)", 
-        55, 85, 
-        key="rear_bias_slider",
-        label_visibility="collapsed"
+@st.fragment
+@instrumentation.timed("chassis")
+def chassis_section(unit_mass, skill):
+    st.header("2. Chassis Data")
+
+    cat_options, cat_labels = category_labels()
+
+    # DEFAULT: Enduro (Index 3)
+    selected_idx = st.selectbox(
+        "Category",
+        range(len(cat_options)),
+        format_func=lambda x: cat_labels[x],
+        key='category_select',
+        index=3
     )
-    
-    final_bias_calc = rear_bias_in
-    st.caption(f"Category Default: **{cat_def_bias}%** (Dynamic/Attack)")
-    if skill_suggestion != 0:
-        advice_sign = "+" if skill_suggestion > 0 else ""
-        st.info(f"💡 Because you selected **{skill}**, consider applying **{advice_sign}{skill_suggestion}%** bias.")
-    else:
-        st.caption(f"For **{skill}**, the default bias is typically appropriate.")
-    st.markdown(f"**Selected Bias:** :blue-background[{final_bias_calc}%]")
-
-# --- Unsprung Mass ---
-with col_c1:
-    unsprung_mode = st.toggle("Estimate Unsprung Mass", value=False)
-    if unsprung_mode:
-        u_tier = st.selectbox("Wheelset Tier", ["Light", "Standard", "Heavy"], index=1)
-        u_mat = st.selectbox("Rear Triangle", ["Carbon", "Aluminium"], index=1)
-        has_inserts = st.checkbox("Tyre Inserts installed?", value=False)
-        unsprung_kg = estimate_unsprung(u_tier, u_mat, has_inserts)
-        st.caption(f"Est: {unsprung_kg:.1f} kg")
-    else:
-        is_lbs = unit_mass == "North America (lbs)"
-        lbl_u = "Unsprung (lbs)" if is_lbs else "Unsprung (kg)"
-        # DEFAULT: 4.27 kg
-        u_def = 9.4 if is_lbs else 4.27
-        u_in = st.number_input(lbl_u, 0.0, 20.0, u_def, 0.01)
-        unsprung_kg = u_in * LB_TO_KG if is_lbs else u_in
+    category = cat_options[selected_idx]
+    defaults = CATEGORY_DATA[category]
 
-# ==========================================================
-# 7. SHOCK & KINEMATICS
-# ==========================================================
-st.header("3. Shock & Kinematics")
-col_k1, col_k2 = st.columns(2)
-
-def_travel = defaults["travel"] if unit_len == "Millimetres (mm)" else defaults["travel"] * MM_TO_IN
-def_stroke = defaults["stroke"] if unit_len == "Millimetres (mm)" else defaults["stroke"] * MM_TO_IN
-
-with col_k1:
-    t_lbl = "Rear Travel (mm)" if unit_len == "Millimetres (mm)" else "Rear Travel (in)"
-    travel_in = st.number_input(t_lbl, 0.0, 300.0, float(def_travel), 1.0)
-    
-    s_lbl = "Shock Stroke (mm)" if unit_len == "Millimetres (mm)" else "Shock Stroke (in)"
-    if unit_len == "Millimetres (mm)":
-        try:
-            def_idx = COMMON_STROKES.index(defaults["stroke"])
-        except:
-            def_idx = 7
-        stroke_in = st.selectbox(s_lbl, COMMON_STROKES, index=def_idx)
-    else:
-        stroke_in = st.number_input(s_lbl, 1.5, 4.0, float(def_stroke), 0.1)
-
-travel_mm = travel_in * IN_TO_MM if unit_len != "Millimetres (mm)" else travel_in
-stroke_mm = stroke_in * IN_TO_MM if unit_len != "Millimetres (mm)" else stroke_in
-
-# Calc variables
-calc_lr_start = 0.0
-calc_lr_end = 0.0
-use_advanced_calc = False
-
-with col_k2:
-    adv_kinematics = st.checkbox("Advanced Kinematics")
-    def_lr_start = float(defaults["lr_start"])
-    def_prog = float(defaults["progression"])
-    
-    if adv_kinematics:
-        use_advanced_calc = True
-        st.caption(f"Defaults for {category}")
-        k_input_mode = st.radio("Input Mode", ["Start & Progression %", "Start & End Rates"], horizontal=True)
-        lr_start = st.number_input("LR Start Rate", 1.5, 4.0, def_lr_start, 0.05)
-        
-        if k_input_mode == "Start & Progression %":
-            prog_pct = st.number_input("Progression (%)", -10.0, 60.0, def_prog, 1.0)
-            lr_end = lr_start * (1 - (prog_pct/100))
-            st.caption(f"Derived End Rate: {lr_end:.2f}")
+    st.button("Reset Chassis to Category Defaults", on_click=reset_chassis)
+
+    col_c1, col_c2 = st.columns(2)
+
+    # --- Bike Weight ---
+    with col_c1:
+        weight_mode = st.radio("Bike Weight Mode", ["Manual Input", "Estimate"], index=0, horizontal=True)
+        if weight_mode == "Estimate":
+            mat = st.selectbox("Frame Material", ["Carbon", "Aluminium"])
+            level = st.selectbox("Build Level", ["Entry-Level", "Mid-Level", "High-End"])
+            size = st.selectbox("Size", list(SIZE_WEIGHT_MODS.keys()), index=2)
+
+            level_idx = {"Entry-Level": 0, "Mid-Level": 1, "High-End": 2}[level]
+            base_w = BIKE_WEIGHT_EST[category][mat][level_idx]
+            est_w = base_w + SIZE_WEIGHT_MODS[size]
+
+            st.info(f"Estimated: {est_w:.2f} kg ({est_w * KG_TO_LB:.1f} lbs)")
+            bike_kg = est_w
         else:
-            def_end = lr_start * (1 - (def_prog/100))
-            lr_end = st.number_input("LR End Rate", 1.5, 4.0, def_end, 0.05)
-            prog_pct = ((lr_start - lr_end) / lr_start) * 100
-            st.caption(f"Calculated Progression: {prog_pct:.1f}%")
-
-        calc_lr_start = lr_start
-        calc_lr_end = lr_end
-        
-    else:
-        prog_pct = def_prog
-        mean_lr = travel_mm / stroke_mm
-        st.metric("Mean Leverage Ratio", f"{mean_lr:.2f}")
-    
-    has_hbo = st.checkbox("Shock has HBO (Hydraulic Bottom Out)?")
-
-# Springs You Can Use Display
-analysis = analyze_spring_compatibility(prog_pct, has_hbo)
-st.subheader("Springs You Can Use")
-for spring_type, info in analysis.items():
-    if "Avoid" in info["status"] or "Caution" in info["status"]:
-        st.markdown(f"❌ **{spring_type}**: {info['msg']}")
-    else:
-        st.markdown(f"**{info['status']} {spring_type}**: {info['msg']}")
+            is_lbs = unit_mass == "North America (lbs)"
+            lbl = "Bike Weight (lbs)" if is_lbs else "Bike Weight (kg)"
+
+            def_w_kg = defaults.get("bike_mass_def_kg", 14.5)
+            def_w_val = def_w_kg * KG_TO_LB if is_lbs else def_w_kg
+            min_w, max_w = (15.0, 66.0) if is_lbs else (7.0, 30.0)
+
+            w_in = st.number_input(lbl, min_w, max_w, float(def_w_val), 0.1, key="bike_weight_man")
+            bike_kg = w_in * LB_TO_KG if is_lbs else w_in
+
+    # --- Rear Bias ---
+    with col_c2:
+        cat_def_bias = int(defaults["bias"])
+        skill_suggestion = SKILL_MODIFIERS[skill]["bias"]
+
+        cl1, cl2 = st.columns([0.7, 0.3])
+        with cl1:
+            st.markdown("### Rear Bias")
+        with cl2:
+            if st.button("Reset", help=f"Reset to {cat_def_bias}%"):
+                st.session_state.rear_bias_slider = cat_def_bias
+                st.rerun()
+
+        if 'rear_bias_slider' not in st.session_state:
+            st.session_state.rear_bias_slider = cat_def_bias
 
-# Selection for Calculation
-spring_type_options = ["Standard Steel (Linear)", "Lightweight Steel/Ti", "Sprindex", "Progressive Coil"]
-spring_type_sel = st.selectbox("Select Spring for Calculation", spring_type_options, index=0)
-active_spring_type = spring_type_sel
+        rear_bias_in = st.slider(
+            "Base Bias (%)",
+            55, 85,
+            key="rear_bias_slider",
+            label_visibility="collapsed"
+        )
+
+        final_bias_calc = rear_bias_in
+        st.caption(f"Category Default: **{cat_def_bias}%** (Dynamic/Attack)")
+        if skill_suggestion != 0:
+            advice_sign = "+" if skill_suggestion > 0 else ""
+            st.info(f"💡 Because you selected **{skill}**, consider applying **{advice_sign}{skill_suggestion}%** bias.")
+        else:
+            st.caption(f"For **{skill}**, the default bias is typically appropriate.")
+        st.markdown(f"**Selected Bias:** :blue-background[{final_bias_calc}%]")
+
+    # --- Unsprung Mass ---
+    with col_c1:
+        unsprung_mode = st.toggle("Estimate Unsprung Mass", value=False)
+        if unsprung_mode:
+            u_tier = st.selectbox("Wheelset Tier", ["Light", "Standard", "Heavy"], index=1)
+            u_mat = st.selectbox("Rear Triangle", ["Carbon", "Aluminium"], index=1)
+            has_inserts = st.checkbox("Tyre Inserts installed?", value=False)
+            unsprung_kg = estimate_unsprung(u_tier, u_mat, has_inserts)
+            st.caption(f"Est: {unsprung_kg:.1f} kg")
+        else:
+            is_lbs = unit_mass == "North America (lbs)"
+            lbl_u = "Unsprung (lbs)" if is_lbs else "Unsprung (kg)"
+            # DEFAULT: 4.27 kg
+            u_def = 9.4 if is_lbs else DEFAULT_UNSPRUNG_KG
+            u_in = st.number_input(lbl_u, 0.0, 20.0, u_def, 0.01)
+            unsprung_kg = u_in * LB_TO_KG if is_lbs else u_in
+
+    return publish("chassis", {
+        "category": category, "bike_kg": bike_kg,
+        "bias": final_bias_calc, "unsprung_kg": unsprung_kg,
+    })
 
 # ==========================================================
-# 8. CALCULATIONS
+# 7. SHOCK & KINEMATICS
 # ==========================================================
-st.header("4. Setup Preferences")
-smart_default_sag = defaults["base_sag"]
-target_sag = st.slider(
-    "Target Sag (%)", 
-    min_value=20.0, max_value=40.0, 
-    value=float(smart_default_sag), 
-    step=0.5,
-    help="Default based on Bike Category. Adjust preference here."
-)
+# Frame library (frame_library.py): only the index is opened, on first use of
+# the "Frame Library" mode, and reopened when the library is rebuilt
+@st.cache_resource(show_spinner=False)
+def open_frame_library(stamp):
+    return frame_library.open_library()
+
+def fill_from_frame(travel_key, stroke_key, to_unit):
+    # Frame selectbox callback: show the chosen frame's travel and stroke in the inputs above
+    frame_key = st.session_state.get("frame_key")
+    if frame_key is not None:
+        frame = open_frame_library(frame_library.library_stamp()).get(frame_key)
+        st.session_state[travel_key] = frame["travel_mm"] * to_unit
+        st.session_state[stroke_key] = frame["stroke_mm"] * to_unit
+
+@st.fragment
+@instrumentation.timed("kinematics")
+def kinematics_section(unit_len, category):
+    st.header("3. Shock & Kinematics")
+    col_k1, col_k2 = st.columns(2)
+    defaults = CATEGORY_DATA[category]
+
+    def_travel = defaults["travel"] if unit_len == "Millimetres (mm)" else defaults["travel"] * MM_TO_IN
+    def_stroke = defaults["stroke"] if unit_len == "Millimetres (mm)" else defaults["stroke"] * MM_TO_IN
+
+    # Keyed per category and unit, so switching either starts from its defaults again;
+    # choosing a library frame writes its travel and stroke into these keys
+    travel_key, stroke_key = f"travel_in_{category}_{unit_len}", f"stroke_in_{category}_{unit_len}"
+    with col_k1:
+        t_lbl = "Rear Travel (mm)" if unit_len == "Millimetres (mm)" else "Rear Travel (in)"
+        travel_default = {} if travel_key in st.session_state else {"value": float(def_travel)}
+        travel_in = st.number_input(t_lbl, 0.0, 300.0, step=1.0, key=travel_key, **travel_default)
+
+        s_lbl = "Shock Stroke (mm)" if unit_len == "Millimetres (mm)" else "Shock Stroke (in)"
+        if unit_len == "Millimetres (mm)":
+            strokes = list(COMMON_STROKES)
+            if st.session_state.get(stroke_key) not in (None, *strokes):
+                strokes = sorted(strokes + [st.session_state[stroke_key]])  # A frame's non-standard stroke
+            try:
+                def_idx = strokes.index(defaults["stroke"])
+            except:
+                def_idx = 7
+            stroke_default = {} if stroke_key in st.session_state else {"index": def_idx}
+            stroke_in = st.selectbox(s_lbl, strokes, key=stroke_key, **stroke_default)
+        else:
+            stroke_default = {} if stroke_key in st.session_state else {"value": float(def_stroke)}
+            stroke_in = st.number_input(s_lbl, 1.5, 4.0, step=0.1, key=stroke_key, **stroke_default)
+
+    travel_mm = travel_in * IN_TO_MM if unit_len != "Millimetres (mm)" else travel_in
+    stroke_mm = stroke_in * IN_TO_MM if unit_len != "Millimetres (mm)" else stroke_in
+
+    # Calc variables
+    calc_lr_start = 0.0
+    calc_lr_end = 0.0
+    use_advanced_calc = False
+    leverage_curve_sel = None  # Measured LeverageCurve, overrides travel/stroke when set
+    frame_key = None  # Library key when the curve comes from the frame library
+
+    with col_k2:
+        adv_kinematics = st.checkbox("Advanced Kinematics")
+        def_lr_start = float(defaults["lr_start"])
+        def_prog = float(defaults["progression"])
+
+        if adv_kinematics:
+            use_advanced_calc = True
+            st.caption(f"Defaults for {category}")
+            input_modes = ["Start & Progression %", "Start & End Rates", "Measured Curve"]
+            if frame_library.library_stamp() is not None:
+                input_modes.append("Frame Library")
+            k_input_mode = st.radio("Input Mode", input_modes, horizontal=True)
+
+            if k_input_mode == "Frame Library":
+                library = open_frame_library(frame_library.library_stamp())
+                query = st.text_input("Search Frames", placeholder="Brand or model")
+                same_category = st.checkbox(f"Only {category} frames", value=True)
+                matches = library.search(query, category=category if same_category else None)
+                frame_key = st.selectbox(f"Frame Model ({len(matches)} shown of {len(library)})", matches,
+                                         index=None, placeholder="Choose a frame", key="frame_key",
+                                         on_change=fill_from_frame,
+                                         args=(travel_key, stroke_key, 1.0 if unit_len == "Millimetres (mm)" else MM_TO_IN))
+                if frame_key is not None:
+                    frame = library.get(frame_key)
+                    leverage_curve_sel = frame["curve"]
+                    if frame["category"] != category:
+                        st.caption(f"{frame_key} is listed as {frame['category']}")
+            if k_input_mode == "Measured Curve":
+                curve_file = st.file_uploader(
+                    "Leverage Curve (CSV)", type="csv",
+                    help="Columns: wheel_travel_mm and either shock_stroke_mm or leverage_ratio"
+                )
+                if curve_file is not None:
+                    try:
+                        leverage_curve_sel = read_curve_csv(curve_file)
+                    except ValueError as e:
+                        st.error(f"Could not read curve: {e}")
+            if k_input_mode in ("Measured Curve", "Frame Library"):
+                if leverage_curve_sel is not None:
+                    lr_start = float(leverage_curve_sel.leverage[0])
+                    lr_end = float(leverage_curve_sel.leverage[-1])
+                    prog_pct = leverage_curve_sel.progression_pct
+                    travel_mm, stroke_mm = leverage_curve_sel.travel, leverage_curve_sel.stroke
+                    st.caption(f"Curve: {travel_mm:.0f} mm travel / {stroke_mm:.1f} mm stroke, "
+                               f"LR {lr_start:.2f} → {lr_end:.2f} ({prog_pct:.1f}% progression)")
+                else:
+                    lr_start = def_lr_start
+                    prog_pct = def_prog
+                    lr_end = lr_start * (1 - (prog_pct/100))
+                    st.caption("Upload a curve to use it; category defaults apply until then."
+                               if k_input_mode == "Measured Curve" else
+                               "Choose a frame to use its curve; category defaults apply until then.")
+            else:
+                lr_start = st.number_input("LR Start Rate", 1.5, 4.0, def_lr_start, 0.05)
+
+            if k_input_mode == "Start & Progression %":
+                prog_pct = st.number_input("Progression (%)", *reference_tables.PROGRESSION_RANGE, def_prog, 1.0)
+                lr_end = lr_start * (1 - (prog_pct/100))
+                st.caption(f"Derived End Rate: {lr_end:.2f}")
+            elif k_input_mode == "Start & End Rates":
+                def_end = lr_start * (1 - (def_prog/100))
+                lr_end = st.number_input("LR End Rate", 1.5, 4.0, def_end, 0.05)
+                prog_pct = ((lr_start - lr_end) / lr_start) * 100
+                st.caption(f"Calculated Progression: {prog_pct:.1f}%")
 
-if use_advanced_calc:
-    total_drop = calc_lr_start - calc_lr_end
-    effective_lr = calc_lr_start - (total_drop * (target_sag / 100))
-else:
-    effective_lr = travel_mm / stroke_mm
+            calc_lr_start = lr_start
+            calc_lr_end = lr_end
 
-coupling = COUPLING_COEFFS[category]
-eff_rider_kg = rider_kg + (gear_kg * coupling)
-system_kg = eff_rider_kg + bike_kg
-rear_load_kg = (system_kg * (final_bias_calc / 100)) - unsprung_kg
-rear_load_lbs = rear_load_kg * KG_TO_LB
+        else:
+            prog_pct = def_prog
+            mean_lr = travel_mm / stroke_mm
+            st.metric("Mean Leverage Ratio", f"{mean_lr:.2f}")
+
+        has_hbo = st.checkbox("Shock has HBO (Hydraulic Bottom Out)?")
+
+    # Springs You Can Use Display
+    analysis = spring_compatibility(prog_pct, has_hbo)
+    st.subheader("Springs You Can Use")
+    for spring_type, info in analysis.items():
+        if "Avoid" in info["status"] or "Caution" in info["status"]:
+            st.markdown(f"❌ **{spring_type}**: {info['msg']}")
+        else:
+            st.markdown(f"**{info['status']} {spring_type}**: {info['msg']}")
 
-sag_mm = stroke_mm * (target_sag / 100)
-raw_rate = (rear_load_lbs * effective_lr) / (sag_mm * MM_TO_IN)
+    # Selection for Calculation
+    spring_type_sel = st.selectbox("Select Spring for Calculation", SPRING_TYPES, index=0)
 
-if active_spring_type == "Progressive Coil":
-    raw_rate = raw_rate * PROGRESSIVE_CORRECTION_FACTOR
+    return publish("kinematics", {
+        "travel_mm": travel_mm, "stroke_mm": stroke_mm,
+        "lr_start": calc_lr_start if use_advanced_calc else None,
+        "lr_end": calc_lr_end if use_advanced_calc else None,
+        "curve": leverage_curve_sel, "frame": frame_key, "spring_type": spring_type_sel, "has_hbo": has_hbo,
+    })
 
 # ==========================================================
-# 9. OUTPUTS
+# 8. CALCULATIONS & 9. OUTPUTS
 # ==========================================================
-st.divider()
-st.header("Results")
-
-res_c1, res_c2 = st.columns(2)
-res_c1.metric("Ideal Spring Rate", f"{int(raw_rate)} lbs/in", help="Exact calculated rate for target sag")
-res_c2.metric("Target Sag", f"{target_sag:.1f}% ({sag_mm:.1f} mm)")
-
-# Initialize default tuning variable
-final_rate_for_tuning = int(round(raw_rate / 25) * 25) # Default standard
-
-# --- CONDITIONAL DISPLAY LOGIC ---
-if active_spring_type == "Sprindex":
-    st.subheader("Sprindex Recommendation")
-    
-    family = None
-    if stroke_mm <= 55: family = "XC/Trail (55mm)"
-    elif stroke_mm <= 65: family = "Enduro (65mm)"
-    elif stroke_mm <= 75: family = "DH (75mm)"
-    
-    if family:
-        st.markdown(f"**Compatible Family:** {family}")
-        
-        ranges = SPRINDEX_DATA[family]["ranges"]
-        found_match = False
-        gap_neighbors = []
-        
-        for i, r_str in enumerate(ranges):
-            low, high = map(int, r_str.split("-"))
-            if low <= raw_rate <= high:
-                st.success(f"✅ **Perfect Fit:** {r_str} lbs/in")
-                # Round to nearest 5 for tuning
-                spr_rounded = int(round(raw_rate / 5) * 5)
-                st.caption(f"Your ideal rate ({int(raw_rate)}) falls within this adjustable range.")
-                final_rate_for_tuning = spr_rounded
-                found_match = True
-                break
-            
-            if i > 0:
-                prev_low, prev_high = map(int, ranges[i-1].split("-"))
-                if prev_high < raw_rate < low:
-                    gap_neighbors = [(ranges[i-1], prev_high), (r_str, low)]
-        
-        if not found_match and gap_neighbors:
-            # Safely unpack
-            lower_range_str, lower_limit_val = gap_neighbors[0]
-            upper_range_str, upper_limit_val = gap_neighbors[1]
-            
-            st.warning(f"⚠️ Your rate ({int(raw_rate)} lbs) falls in a gap between Sprindex ranges.")
-            
-            # User Selection for Gap Handling
-            gap_choice = st.radio(
-                "Choose your preferred option to see Tuning details:",
-                [f"Option A: {lower_range_str} (Maxed at {lower_limit_val} lbs)", 
-                 f"Option B: {upper_range_str} (Min setting at {upper_limit_val} lbs)"]
-            )
-            
-            if "Option A" in gap_choice:
-                final_rate_for_tuning = lower_limit_val
-                chosen_sag = (rear_load_lbs * effective_lr) / (lower_limit_val * MM_TO_IN) / stroke_mm * 100
-                st.info(f"**Selected Option A:** {lower_range_str}")
-                st.markdown(f"Resulting Sag: **{chosen_sag:.1f}%**")
-                st.caption("Feel: Plusher, more grip.")
-                
-            else:
-                final_rate_for_tuning = upper_limit_val
-                chosen_sag = (rear_load_lbs * effective_lr) / (upper_limit_val * MM_TO_IN) / stroke_mm * 100
-                st.info(f"**Selected Option B:** {upper_range_str}")
-                st.markdown(f"Resulting Sag: **{chosen_sag:.1f}%**")
-                st.caption("Feel: More support, race feel.")
+# The Target Sag slider and the Sprindex gap choice live in this fragment,
+# so moving them only recomputes and redraws Results and Fine Tuning.
+@st.fragment
+@instrumentation.timed("outputs")
+def results_section(rider, chassis, kin):
+    category = chassis["category"]
+    stroke_mm = kin["stroke_mm"]
+    leverage_curve_sel = kin["curve"]
+    active_spring_type = kin["spring_type"]
+
+    st.header("4. Setup Preferences")
+    smart_default_sag = CATEGORY_DATA[category]["base_sag"]
+    target_sag = st.slider(
+        "Target Sag (%)",
+        min_value=20.0, max_value=40.0,
+        value=float(smart_default_sag),
+        step=0.5,
+        help="Default based on Bike Category. Adjust preference here."
+    )
 
-        elif not found_match:
-             st.error("Calculated rate is outside standard Sprindex ranges.")
-             final_rate_for_tuning = int(raw_rate) # Fallback
+    results = calculate_setup(
+        rider["rider_kg"], rider["gear_kg"], chassis["bike_kg"], chassis["unsprung_kg"], chassis["bias"],
+        stroke_mm, kin["travel_mm"], target_sag, active_spring_type, category,
+        kin["lr_start"], kin["lr_end"], leverage_curve_sel,
+    )
+    effective_lr = results["effective_lr"]
+    rear_load_lbs = results["rear_load_lbs"]
+    sag_mm = results["sag_mm"]
+    raw_rate = results["raw_rate"]
 
-    else:
-        st.error(f"Shock stroke ({stroke_mm}mm) exceeds Sprindex maximums.")
-        final_rate_for_tuning = int(raw_rate)
+    st.divider()
+    st.header("Results")
 
-else:
-    # --- STANDARD DISPLAY ---
-    st.subheader("Available Spring Options")
-    st.caption("Select the spring that best fits your preference range.")
+    res_c1, res_c2 = st.columns(2)
+    res_c1.metric("Ideal Spring Rate", f"{int(raw_rate)} lbs/in", help="Exact calculated rate for target sag")
+    res_c2.metric("Target Sag", f"{target_sag:.1f}% ({sag_mm:.1f} mm)")
 
-    options = []
-    base_step = 25
-    center_rate = int(round(raw_rate / base_step) * base_step)
-    final_rate_for_tuning = center_rate # Standard logic
-    rates_to_check = [center_rate - base_step, center_rate, center_rate + base_step]
-
-    for rate in rates_to_check:
-        if rate <= 0: continue
-        resulting_sag_mm = (rear_load_lbs * effective_lr) / (rate * MM_TO_IN) 
-        resulting_sag_pct = (resulting_sag_mm / stroke_mm) * 100
-        
-        tag = ""
-        if rate == center_rate: tag = "✅ Recommended"
-        elif resulting_sag_pct > 35: tag = "⚠️ Too Soft"
-        elif resulting_sag_pct < 25: tag = "⚠️ Too Stiff"
-        else: tag = "Alternative"
+    # Initialize default tuning variable
+    final_rate_for_tuning = int(round(raw_rate / 25) * 25) # Default standard
+    sim_rates = None # Sprindex gap options, for the ride simulation
+    sprindex_option = "A"
 
-        options.append({
-            "Spring Rate": f"{rate} lbs",
-            "Resulting Sag (%)": f"{resulting_sag_pct:.1f}%",
-            "Travel Usage (mm)": f"{resulting_sag_mm:.1f} mm",
-            "Fit": tag
-        })
+    # --- CONDITIONAL DISPLAY LOGIC ---
+    if active_spring_type == "Sprindex":
+        st.subheader("Sprindex Recommendation")
 
-    df_options = pd.DataFrame(options)
-    st.dataframe(
-        df_options.style.apply(lambda x: ['background-color: #d4edda' if 'Recommended' in v else '' for v in x], subset=['Fit']), 
-        hide_index=True, 
-        use_container_width=True
-    )
+        spr = sprindex_match(raw_rate, stroke_mm, rear_load_lbs, effective_lr, leverage_curve_sel)
+        family = spr["family"]
+        spr_status = spr["status"]
 
-st.subheader("Fine Tuning (Preload)")
-st.caption(f"Effect of preload on the **{final_rate_for_tuning} lbs** spring:")
-
-preload_data = []
-
-for turns in [0, 0.5, 1.0, 1.5, 2.0, 2.5, 3.0]:
-    preload_mm = turns * 1.0 
-    preload_in = preload_mm * MM_TO_IN
-    sag_in_eff = (rear_load_lbs * effective_lr / final_rate_for_tuning) - preload_in
-    sag_pct_eff = (sag_in_eff / (stroke_mm * MM_TO_IN)) * 100
-    
-    status = "✅"
-    if turns >= 3.0: status = "⚠️ Excessive"
-    elif sag_pct_eff < 25: status = "⚠️ Too Stiff"
-    
-    preload_data.append({
-        "Turns": turns,
-        "Sag (%)": f"{sag_pct_eff:.1f}%",
-        "Sag (mm)": f"{(sag_pct_eff/100)*stroke_mm:.1f} mm",
-        "Status": status
-    })
+        if family:
+            st.markdown(f"**Compatible Family:** {family}")
+
+            if spr_status == "fit":
+                st.success(f"✅ **Perfect Fit:** {spr['fit_range']} lbs/in")
+                # Round to nearest 5 for tuning
+                st.caption(f"Your ideal rate ({int(raw_rate)}) falls within this adjustable range.")
+                final_rate_for_tuning = int(spr["tuning_rate"])
+
+            elif spr_status == "gap":
+                lower_range_str, lower_limit_val = spr["option_a_range"], int(spr["option_a"])
+                upper_range_str, upper_limit_val = spr["option_b_range"], int(spr["option_b"])
+
+                st.warning(f"⚠️ Your rate ({int(raw_rate)} lbs) falls in a gap between Sprindex ranges.")
+
+                # User Selection for Gap Handling
+                gap_choice = st.radio(
+                    "Choose your preferred option to see Tuning details:",
+                    [f"Option A: {lower_range_str} (Maxed at {lower_limit_val} lbs)",
+                     f"Option B: {upper_range_str} (Min setting at {upper_limit_val} lbs)"]
+                )
+
+                sim_rates = (float(lower_limit_val), float(upper_limit_val))
+                if "Option A" in gap_choice:
+                    final_rate_for_tuning = lower_limit_val
+                    chosen_sag = spr["option_a_sag_pct"]
+                    st.info(f"**Selected Option A:** {lower_range_str}")
+                    st.markdown(f"Resulting Sag: **{chosen_sag:.1f}%**")
+                    st.caption("Feel: Plusher, more grip.")
+
+                else:
+                    final_rate_for_tuning = upper_limit_val
+                    sprindex_option = "B"
+                    chosen_sag = spr["option_b_sag_pct"]
+                    st.info(f"**Selected Option B:** {upper_range_str}")
+                    st.markdown(f"Resulting Sag: **{chosen_sag:.1f}%**")
+                    st.caption("Feel: More support, race feel.")
 
-st.dataframe(pd.DataFrame(preload_data), hide_index=True)
+            else:
+                 st.error("Calculated rate is outside standard Sprindex ranges.")
+                 final_rate_for_tuning = int(raw_rate) # Fallback
+
+            if spr_status != "fit" and spr["longer_family"]:
+                st.caption(f"A longer-stroke family also covers your rate: {spr['longer_family']} {spr['longer_range']} lbs/in")
+
+        else:
+            st.error(f"Shock stroke ({stroke_mm}mm) exceeds Sprindex maximums.")
+            final_rate_for_tuning = int(raw_rate)
+
+    else:
+        # --- STANDARD DISPLAY ---
+        st.subheader("Available Spring Options")
+        st.caption("Select the spring that best fits your preference range.")
+
+        center_rate = int(results["rounded_rate"])
+        final_rate_for_tuning = center_rate # Standard logic
+        st.html(spring_options_table(rear_load_lbs, effective_lr, center_rate, stroke_mm, leverage_curve_sel,
+                                     active_spring_type))
+
+    st.subheader("Fine Tuning (Preload)")
+    st.caption(f"Effect of preload on the **{final_rate_for_tuning} lbs** spring:")
+    st.html(preload_table(rear_load_lbs, effective_lr, final_rate_for_tuning, stroke_mm, leverage_curve_sel,
+                          active_spring_type))
+
+    # --- WHAT-IF COMPARISON (opt-in) ---
+    # One calculation graph per column, kept in session state: editing a what-if
+    # input only recomputes the nodes downstream of it
+    st.subheader("What-if Comparison")
+    if st.toggle("Compare what-if setups", key="whatif_enabled"):
+        base_inputs = {
+            "rider_kg": rider["rider_kg"], "gear_kg": rider["gear_kg"], "bike_kg": chassis["bike_kg"],
+            "unsprung_kg": chassis["unsprung_kg"], "bias_pct": chassis["bias"], "coupling": COUPLING_COEFFS[category],
+            "stroke_mm": stroke_mm, "travel_mm": kin["travel_mm"], "target_sag": target_sag,
+            "spring_type": active_spring_type, "lr_start": kin["lr_start"], "lr_end": kin["lr_end"],
+            "curve": leverage_curve_sel, "sprindex_option": sprindex_option,
+        }
+        for i, col in enumerate(st.columns(3)):
+            col.markdown(f"**Setup {'ABC'[i]}**")
+            overrides = {
+                "rider_kg": col.number_input("Rider (kg)", 20.0, 200.0, float(rider["rider_kg"]), 0.5, key=f"whatif_rider_{i}"),
+                "bias_pct": col.number_input("Rear Bias (%)", 40.0, 90.0, float(chassis["bias"]), 0.5, key=f"whatif_bias_{i}"),
+                "target_sag": col.number_input("Target Sag (%)", 20.0, 40.0, float(target_sag), 0.5, key=f"whatif_sag_{i}"),
+            }
+            turns = col.selectbox("Preload (turns)", PRELOAD_TURNS, key=f"whatif_turns_{i}")
+            graph = st.session_state.setdefault(f"whatif_graph_{i}", CalcGraph(**base_inputs))
+            graph.set(**{**base_inputs, **overrides, "preload_turns": (turns,)})
+            rate = float(graph["final_rate_for_tuning"])
+            col.metric("Ideal Spring Rate", f"{int(graph['raw_rate'])} lbs/in")
+            col.metric("Spring", f"{int(rate)} lbs", f"{int(rate - final_rate_for_tuning):+d} lbs vs current")
+            col.metric("Sag with Preload", f"{float(graph['preload_sag_pct'][0]):.1f}%")
+            col.caption(f"Recomputed: {', '.join(graph.recomputed) or 'nothing'}")
+
+    # --- SAVE TO THE CUSTOMER STORE ---
+    with st.expander("Save Setup"):
+        sv1, sv2, sv3 = st.columns(3)
+        customer = sv1.text_input("Customer")
+        bike_model = sv2.text_input("Bike Model")
+        fitted_turns = sv3.selectbox("Preload Fitted (turns)", PRELOAD_TURNS)
+        # Library frames are stored by key and re-sized from the library; an uploaded curve has no key
+        uploaded_curve = leverage_curve_sel is not None and kin["frame"] is None
+        if uploaded_curve:
+            st.caption("Setups sized from an uploaded leverage curve can't be stored; clear the curve or pick "
+                       "the frame from the Frame Library to save.")
+        if st.button("Save", disabled=not customer.strip() or uploaded_curve):
+            conn = setup_store.connect()
+            setup_id = setup_store.save_setup(conn, {
+                "customer": customer.strip(), "bike_model": bike_model.strip(), "category": category,
+                "spring_type": active_spring_type, "rider_kg": rider["rider_kg"], "gear_kg": rider["gear_kg"],
+                "bike_kg": chassis["bike_kg"], "unsprung_kg": chassis["unsprung_kg"], "bias_pct": chassis["bias"],
+                "stroke_mm": stroke_mm, "travel_mm": kin["travel_mm"], "sag_pct": target_sag,
+                "lr_start": kin["lr_start"], "lr_end": kin["lr_end"], "frame": kin["frame"],
+                "spring_rate": final_rate_for_tuning, "preload_turns": fitted_turns,
+            })
+            conn.close()
+            st.success(f"Saved as setup #{setup_id} in {setup_store.DEFAULT_STORE}")
+
+    # --- SPRING CHART & SENSITIVITY (opt-in) ---
+    st.subheader("Spring Chart & Sensitivity")
+    if st.toggle("Show spring chart and sensitivity", key="chart_enabled"):
+        chart_args = (rider["rider_kg"], rider["gear_kg"], chassis["bike_kg"], chassis["unsprung_kg"], chassis["bias"])
+        kin_args = (stroke_mm, kin["travel_mm"], active_spring_type, category, kin["lr_start"], kin["lr_end"], leverage_curve_sel)
+        st.caption("Recommended rate by rider mass (rows) and target sag (columns), everything else as set above:")
+        st.html(spring_chart_table(*chart_args, *kin_args))
+        st.caption("How much the ideal rate moves for one step of each input:")
+        st.html(sensitivity_table(*chart_args, target_sag, *kin_args))
+
+    # --- MONTE CARLO TOLERANCE (opt-in, so normal reruns stay cheap) ---
+    st.subheader("Tolerance Analysis")
+    if st.toggle("Simulate input & spring tolerances", key="mc_enabled",
+                 help="Samples bike/unsprung mass estimates, rear bias, gear coupling and coil rate tolerance"):
+        tc1, tc2, tc3 = st.columns(3)
+        bike_sd = tc1.number_input("Bike Mass ± (kg, SD)", 0.0, 5.0, DEFAULT_TOLERANCES["bike_kg"][1], 0.1)
+        unsprung_sd = tc1.number_input("Unsprung ± (kg, SD)", 0.0, 3.0, DEFAULT_TOLERANCES["unsprung_kg"][1], 0.1)
+        bias_sd = tc2.number_input("Rear Bias ± (%, SD)", 0.0, 10.0, DEFAULT_TOLERANCES["bias_pct"][1], 0.5)
+        coupling_sd = tc2.number_input("Coupling ± (SD)", 0.0, 0.3, DEFAULT_TOLERANCES["coupling"][1], 0.01)
+        rate_tol = tc3.number_input("Spring Rate ± (%)", 0.0, 15.0, DEFAULT_TOLERANCES["rate_pct"][1], 0.5)
+        draws = tc3.selectbox("Draws", [100_000, 1_000_000, 5_000_000], index=1, format_func=lambda n: f"{n:,}")
+
+        if active_spring_type == "Sprindex":
+            mc_rates = (float(final_rate_for_tuning),)
+        else:
+            mc_rates = tuple(r for r in standard_spring_options(
+                rear_load_lbs, effective_lr, center_rate, stroke_mm, curve=leverage_curve_sel
+            )[0].tolist() if not np.isnan(r))
+        tolerances = (
+            ("bike_kg", ("normal", bike_sd)), ("unsprung_kg", ("normal", unsprung_sd)),
+            ("bias_pct", ("normal", bias_sd)), ("coupling", ("normal", coupling_sd)),
+            ("rate_pct", ("uniform", rate_tol)),
+        )
+        st.html(tolerance_table(
+            rider["rider_kg"], rider["gear_kg"], chassis["bike_kg"], chassis["unsprung_kg"], chassis["bias"],
+            category, effective_lr, stroke_mm, mc_rates, draws, tolerances, active_spring_type, leverage_curve_sel,
+        ))
+        st.caption("Highlighted: the spring most likely to stay inside the sag band. Rate tolerance is uniform, the rest normal.")
+
+    # --- RIDE SIMULATION (opt-in) ---
+    st.subheader("Ride Simulation")
+    if st.toggle("Simulate a ride", key="sim_enabled",
+                 help="Rear quarter-bike model over a terrain profile, per candidate spring and speed"):
+        sc1, sc2, sc3 = st.columns(3)
+        track_file = sc1.file_uploader("Terrain CSV (distance_m, elevation_m)", type=["csv"])
+        track_length = sc1.number_input("Synthetic Track (m)", 200, 10_000, 2000, 100, disabled=track_file is not None)
+        track_seed = sc1.number_input("Track Seed", 0, 9999, 0, disabled=track_file is not None)
+        speeds = sc2.multiselect("Speeds (m/s)", [3.0, 5.0, 8.0, 11.0, 14.0], default=[5.0, 8.0, 11.0])
+        preloads = sc3.multiselect("Preload (turns)", list(PRELOAD_TURNS), default=[PRELOAD_TURNS[0]])
+        if active_spring_type != "Sprindex":
+            sim_rates = tuple(r for r in standard_spring_options(
+                rear_load_lbs, effective_lr, center_rate, stroke_mm, curve=leverage_curve_sel
+            )[0].tolist() if not np.isnan(r))
+        elif sim_rates is None:
+            # Sprindex fit: the chosen setting and its neighbours in 5 lb steps (gap: options A and B)
+            sim_rates = tuple(float(final_rate_for_tuning + d) for d in (-10, -5, 0, 5, 10))
+        if not speeds or not preloads:
+            st.warning("Pick at least one speed and one preload setting.")
+        else:
+            try:
+                st.html(ride_sim_table(
+                    rear_load_lbs, chassis["unsprung_kg"], sim_rates, kin["travel_mm"], stroke_mm,
+                    tuple(speeds), tuple(preloads), kin["lr_start"], kin["lr_end"], leverage_curve_sel,
+                    kin["has_hbo"], active_spring_type, float(track_length), int(track_seed),
+                    track_file.getvalue() if track_file is not None else None,
+                ))
+                st.caption("Highlighted: the softest setup that never bottoms out (or bottoms out least). "
+                           "No rider legs in the model: compare springs with it, don't read the forces literally.")
+            except ValueError as e:
+                st.error(f"Could not read terrain: {e}")
+
+rider = rider_section(unit_mass)
+chassis = chassis_section(unit_mass, rider["skill"])
+kin = kinematics_section(unit_len, chassis["category"])
+results_section(rider, chassis, kin)
 
 st.info("""
 **Disclaimers:**
@@ -532,3 +796,5 @@ st.info("""
 * **Stroke Compatibility:** Ensure spring stroke > shock stroke to avoid coil bind.
 * **Diameter:** Check spring ID compatibility with your specific shock body.
 """)
+
+instrumentation.end_run()
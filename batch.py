@@ -0,0 +1,141 @@
+import argparse
+import importlib.util
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from setups import normalize_setups, size_setups
+
+# ==========================================================
+# BATCH SIZING CLI
+# Streams rider rows from CSV/Parquet in fixed-size chunks and writes
+# one result row per input row, in input order.
+#
+#   python batch.py riders.csv results.csv --chunk-rows 50000 --workers 8
+#
+# Input columns are described in setups.py (rider_kg and category are
+# required; everything else falls back to the UI defaults).
+# ==========================================================
+
+DEFAULT_CHUNK_ROWS = 50_000
+
+# ==========================================================
+# 1. CHUNK SIZING
+# ==========================================================
+def size_chunk(chunk):
+    setup = normalize_setups({c: chunk[c].to_numpy() for c in chunk.columns}, len(chunk))
+    sized = size_setups(setup)
+    is_sprindex = sized["is_sprindex"]
+    rates, sags, tags = sized["option_rates"], sized["option_sags"], sized["option_tags"]
+    spr = sized["sprindex"]
+
+    out = chunk.copy()
+    out["effective_lr"] = sized["effective_lr"]
+    out["rear_load_lbs"] = sized["rear_load_lbs"]
+    out["raw_rate"] = sized["raw_rate"]
+    out["recommended_rate"] = sized["recommended_rate"]
+    out["resulting_sag_pct"] = sized["resulting_sag_pct"]
+    for i, label in [(0, "softer"), (2, "stiffer")]:
+        out[f"{label}_rate"] = np.where(is_sprindex, np.nan, rates[:, i])
+        out[f"{label}_sag_pct"] = np.where(is_sprindex, np.nan, sags[:, i])
+        out[f"{label}_fit"] = np.where(is_sprindex | np.isnan(rates[:, i]), "", tags[:, i])
+    for key in ["family", "status", "fit_range", "option_a", "option_a_range", "option_a_sag_pct",
+                "option_b", "option_b_range", "option_b_sag_pct", "longer_family", "longer_range"]:
+        blank = "" if spr[key].dtype == object or spr[key].dtype.kind == "U" else np.nan
+        out[f"sprindex_{key}"] = np.where(is_sprindex, spr[key], blank)
+    return out
+
+# ==========================================================
+# 2. STREAMING I/O
+# ==========================================================
+def _is_parquet(path):
+    return path.lower().endswith((".parquet", ".pq"))
+
+def require_parquet(*paths):
+    # pyarrow is optional; fail before any work when a Parquet path needs it
+    if any(p and _is_parquet(p) for p in paths) and importlib.util.find_spec("pyarrow") is None:
+        raise RuntimeError("Parquet files need pyarrow (pip install pyarrow), or use .csv")
+
+def read_chunks(path, chunk_rows=DEFAULT_CHUNK_ROWS):
+    require_parquet(path)
+    if _is_parquet(path):
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunk_rows)
+
+class ChunkWriter:
+    # Appends result chunks to CSV or Parquet without holding earlier chunks
+    def __init__(self, path):
+        require_parquet(path)
+        self.path = path
+        self._parquet = None
+        self._first = True
+
+    def write(self, df):
+        if _is_parquet(self.path):
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if self._parquet is None:
+                self._parquet = pq.ParquetWriter(self.path, table.schema)
+            self._parquet.write_table(table.cast(self._parquet.schema))
+        else:
+            df.to_csv(self.path, mode="w" if self._first else "a", header=self._first, index=False)
+        self._first = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        if self._parquet is not None:
+            self._parquet.close()
+
+# ==========================================================
+# 3. PIPELINE
+# ==========================================================
+def run_batch(in_path, out_path, chunk_rows=DEFAULT_CHUNK_ROWS, workers=1):
+    rows = 0
+    with ChunkWriter(out_path) as writer:
+        if workers <= 1:
+            for chunk in read_chunks(in_path, chunk_rows):
+                writer.write(size_chunk(chunk))
+                rows += len(chunk)
+            return rows
+
+        # Keep a bounded window of in-flight chunks so memory stays flat,
+        # and always drain the oldest first so output order matches input.
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = deque()
+            for chunk in read_chunks(in_path, chunk_rows):
+                pending.append(pool.submit(size_chunk, chunk))
+                rows += len(chunk)
+                if len(pending) >= workers * 2:
+                    writer.write(pending.popleft().result())
+            while pending:
+                writer.write(pending.popleft().result())
+    return rows
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Size springs for a CSV/Parquet file of riders.")
+    parser.add_argument("input", help="Rider file (.csv or .parquet)")
+    parser.add_argument("output", help="Result file (.csv or .parquet)")
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS, help="Rows per chunk")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Worker processes (0 = all cores)")
+    args = parser.parse_args(argv)
+
+    workers = args.workers or os.cpu_count() or 1
+    try:
+        require_parquet(args.input, args.output)
+    except RuntimeError as e:
+        parser.error(str(e))
+    rows = run_batch(args.input, args.output, args.chunk_rows, workers)
+    print(f"Sized {rows} riders -> {args.output}")
+
+if __name__ == "__main__":
+    main()
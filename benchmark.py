@@ -0,0 +1,278 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+import numpy as np
+
+from spring_data import (
+    CATEGORY_DATA, COUPLING_COEFFS, DEFAULT_GEAR_KG, DEFAULT_UNSPRUNG_KG,
+    MM_TO_IN, PRELOAD_TURNS, PRELOAD_MM_PER_TURN,
+)
+from spring_engine import compute_spring_rates, preload_sag_pct
+from sprindex import match_sprindex
+from setups import normalize_setups, size_setups
+
+# ==========================================================
+# BENCHMARK SUITE
+# Repeatable timings for the calculation kernel, batch sizing and the
+# Streamlit rerun latency, written as JSON and compared with a stored
+# baseline. Exits non-zero when anything regresses past the threshold.
+#
+#   python benchmark.py --save-baseline            # record on this machine
+#   python benchmark.py                            # compare against it
+#   python benchmark.py --suite micro ui --batch-sizes 1000 100000
+#
+# Baselines are machine specific: record one per kiosk / CI runner.
+# ==========================================================
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+DEFAULT_BATCH_SIZES = [1_000, 100_000, 10_000_000]
+BATCH_CHUNK_ROWS = 100_000
+REGRESSION_THRESHOLD = 1.25  # 25% slower (or 25% less throughput) than baseline
+SUITES = ["micro", "batch", "ui"]
+
+# The app's default setup (Enduro, 68 kg rider)
+DEFAULT_SETUP = {
+    "rider_kg": 68.0, "gear_kg": DEFAULT_GEAR_KG, "bike_kg": CATEGORY_DATA["Enduro"]["bike_mass_def_kg"],
+    "unsprung_kg": DEFAULT_UNSPRUNG_KG, "bias_pct": CATEGORY_DATA["Enduro"]["bias"],
+    "stroke_mm": CATEGORY_DATA["Enduro"]["stroke"], "travel_mm": CATEGORY_DATA["Enduro"]["travel"],
+    "target_sag": CATEGORY_DATA["Enduro"]["base_sag"], "coupling": COUPLING_COEFFS["Enduro"],
+}
+
+# ==========================================================
+# 1. TIMING HELPERS
+# ==========================================================
+def _time_call(fn, repeat=15, number=None):
+    # Best-of-repeat seconds per call; number is auto-scaled to ~50 ms per sample
+    if number is None:
+        number, t = 1, 0.0
+        while t < 0.05:
+            start = time.perf_counter()
+            for _ in range(number):
+                fn()
+            t = time.perf_counter() - start
+            if t < 0.05:
+                number *= 10
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - start) / number)
+    return min(samples)
+
+def _result(value, unit, better="lower", **extra):
+    return {"value": value, "unit": unit, "better": better, **extra}
+
+# ==========================================================
+# 2. MICROBENCHMARKS
+# ==========================================================
+def bench_micro():
+    s = DEFAULT_SETUP
+    args = (s["rider_kg"], s["gear_kg"], s["bike_kg"], s["unsprung_kg"], s["bias_pct"],
+            s["stroke_mm"], s["travel_mm"], s["target_sag"], "Standard Steel (Linear)", s["coupling"])
+    n = 100_000
+    rng = np.random.default_rng(0)
+    riders = rng.uniform(45, 120, n)
+    vec_args = (riders,) + args[1:]
+    res = compute_spring_rates(*vec_args, turns=())
+    load = res["rear_load_lbs"]
+    lr = np.broadcast_to(res["effective_lr"], load.shape)
+    rates = np.round(res["raw_rate"] / 25) * 25
+
+    def preload_loop():
+        # The per-turn Python loop the app used before vectorizing
+        rl, elr, rate = float(load[0]), float(lr[0]), float(rates[0])
+        for turns in PRELOAD_TURNS:
+            preload_in = turns * PRELOAD_MM_PER_TURN * MM_TO_IN
+            sag_in_eff = (rl * elr / rate) - preload_in
+            (sag_in_eff / (s["stroke_mm"] * MM_TO_IN)) * 100
+
+    out = {
+        "micro.spring_rate.scalar": _result(_time_call(lambda: compute_spring_rates(*args)), "s/call"),
+        "micro.spring_rate.100k": _result(_time_call(lambda: compute_spring_rates(*vec_args, turns=()), repeat=5), "s/call"),
+        "micro.preload.scalar": _result(_time_call(lambda: preload_sag_pct(load[0], lr[0], rates[0], s["stroke_mm"])), "s/call"),
+        "micro.preload.loop": _result(_time_call(preload_loop), "s/call"),
+        "micro.preload.100k": _result(_time_call(lambda: preload_sag_pct(load, lr, rates, s["stroke_mm"]), repeat=5), "s/call"),
+        "micro.sprindex.scalar": _result(_time_call(lambda: match_sprindex(res["raw_rate"][0], s["stroke_mm"])), "s/call"),
+        "micro.sprindex.100k": _result(_time_call(lambda: match_sprindex(res["raw_rate"], s["stroke_mm"], load, lr), repeat=5), "s/call"),
+    }
+    return out
+
+# ==========================================================
+# 3. BATCH THROUGHPUT
+# ==========================================================
+def _rider_columns(n, seed):
+    rng = np.random.default_rng(seed)
+    categories = np.array(list(CATEGORY_DATA), dtype=object)
+    return {
+        "rider_kg": rng.uniform(45, 120, n),
+        "category": categories[rng.integers(0, len(categories), n)],
+        "sag_pct": rng.uniform(25, 35, n),
+    }
+
+def bench_batch(sizes=DEFAULT_BATCH_SIZES):
+    # In-memory normalize + size, chunked like batch.py; file I/O excluded
+    out = {}
+    for n in sizes:
+        elapsed = 0.0
+        for start in range(0, n, BATCH_CHUNK_ROWS):
+            rows = min(BATCH_CHUNK_ROWS, n - start)
+            columns = _rider_columns(rows, start)
+            t0 = time.perf_counter()
+            size_setups(normalize_setups(columns, rows))
+            elapsed += time.perf_counter() - t0
+        out[f"batch.size_setups.{n}"] = _result(n / elapsed, "rows/s", better="higher", seconds=elapsed)
+    return out
+
+# ==========================================================
+# 4. UI RERUN LATENCY
+# ==========================================================
+def _gap_sag():
+    # A Target Sag slider value that lands the default setup in a Sprindex gap
+    s = DEFAULT_SETUP
+    for sag in np.arange(20.0, 40.01, 0.5):
+        res = compute_spring_rates(s["rider_kg"], s["gear_kg"], s["bike_kg"], s["unsprung_kg"], s["bias_pct"],
+                                   s["stroke_mm"], s["travel_mm"], sag, "Sprindex", s["coupling"], turns=())
+        if match_sprindex(res["raw_rate"], s["stroke_mm"])["status"] == "gap":
+            return float(sag)
+    raise RuntimeError("No Sprindex gap reachable from the default setup")
+
+def _widget(items, label):
+    return next(w for w in items if w.label == label)
+
+def _timed_run(widget_action, at, samples):
+    from streamlit import cache_data
+    cache_data.clear()  # Nothing left from earlier rounds: every sample computes
+    t0 = time.perf_counter()
+    widget_action().run()
+    samples.append(time.perf_counter() - t0)
+    if at.exception:
+        raise RuntimeError(f"app raised: {[e.value for e in at.exception]}")
+
+def bench_ui(rounds=10):
+    # AppTest.run() reruns the whole script, so these are full-rerun
+    # latencies: the app's st.fragment partial reruns are not measured here.
+    # The shared result cache is off (no spring_cache.db hits or writes) and
+    # st.cache_data is cleared before each sample, so every rerun computes.
+    from streamlit import cache_data
+    from streamlit.testing.v1 import AppTest
+
+    previous = os.environ.get("SPRING_CACHE")
+    os.environ["SPRING_CACHE"] = "off"
+    try:
+        cache_data.clear()
+        at = AppTest.from_file(APP_PATH, default_timeout=60)
+        t0 = time.perf_counter()
+        at.run()
+        first = time.perf_counter() - t0
+
+        sag_samples, category_samples, gap_samples = [], [], []
+        sag_values = [30.0, 31.0, 32.0, 33.0, 34.0]
+        categories = list(range(len(CATEGORY_DATA)))
+        for i in range(rounds):
+            _timed_run(lambda: _widget(at.slider, "Target Sag (%)").set_value(sag_values[i % len(sag_values)]),
+                       at, sag_samples)
+        for i in range(rounds):
+            _timed_run(lambda: at.selectbox(key="category_select").set_value(categories[(i + 1) % len(categories)]),
+                       at, category_samples)
+
+        # Back to Enduro + Sprindex, in a gap, then flip between options A and B
+        at.selectbox(key="category_select").set_value(3).run()
+        _widget(at.selectbox, "Select Spring for Calculation").set_value("Sprindex").run()
+        _widget(at.slider, "Target Sag (%)").set_value(_gap_sag()).run()
+        for i in range(rounds):
+            radio = _widget(at.radio, "Choose your preferred option to see Tuning details:")
+            _timed_run(lambda: radio.set_value(radio.options[(i + 1) % 2]), at, gap_samples)
+    finally:
+        if previous is None:
+            os.environ.pop("SPRING_CACHE", None)
+        else:
+            os.environ["SPRING_CACHE"] = previous
+
+    return {
+        "ui.first_run": _result(first, "s"),
+        "ui.rerun.target_sag": _result(statistics.median(sag_samples), "s", worst=max(sag_samples)),
+        "ui.rerun.category": _result(statistics.median(category_samples), "s", worst=max(category_samples)),
+        "ui.rerun.sprindex_gap": _result(statistics.median(gap_samples), "s", worst=max(gap_samples)),
+    }
+
+# ==========================================================
+# 5. BASELINE COMPARISON
+# ==========================================================
+def compare(results, baseline, threshold=REGRESSION_THRESHOLD):
+    # ratio > 1 means worse than baseline, whichever direction is "better"
+    report = {}
+    for name, r in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        if r["better"] == "lower":
+            ratio = r["value"] / base["value"]
+        else:
+            ratio = base["value"] / r["value"]
+        report[name] = {"ratio": ratio, "regressed": ratio > threshold}
+    return report
+
+def run_suites(suites, batch_sizes):
+    results = {}
+    if "micro" in suites:
+        results.update(bench_micro())
+    if "batch" in suites:
+        results.update(bench_batch(batch_sizes))
+    if "ui" in suites:
+        results.update(bench_ui())
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the engine, batch sizing and UI reruns.")
+    parser.add_argument("--suite", nargs="+", choices=SUITES, default=SUITES)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=DEFAULT_BATCH_SIZES)
+    parser.add_argument("--out", help="Write results JSON here")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline JSON to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the baseline")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                        help="Flag results this many times worse than baseline")
+    args = parser.parse_args(argv)
+
+    results = run_suites(args.suite, args.batch_sizes)
+    doc = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "results": results,
+    }
+
+    regressions = []
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        doc["comparison"] = compare(results, baseline, args.threshold)
+        regressions = [k for k, c in doc["comparison"].items() if c["regressed"]]
+
+    for name, r in results.items():
+        c = doc.get("comparison", {}).get(name)
+        vs = f"  x{c['ratio']:.2f} vs baseline{'  REGRESSED' if c['regressed'] else ''}" if c else ""
+        shown = f"{r['value']:,.0f} rows/s" if r["unit"] == "rows/s" else f"{r['value'] * 1e3:.3f} ms"
+        print(f"{name:32s} {shown:>18s}{vs}")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(doc, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(doc, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+    sys.exit(1 if regressions else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+import inspect
+
+import numpy as np
+
+from spring_data import PRELOAD_TURNS, KG_TO_LB, DEFAULT_GEAR_KG, DEFAULT_UNSPRUNG_KG, DEFAULT_SPRING_TYPE
+import spring_engine as engine
+from sprindex import match_sprindex
+from kinematics import LeverageCurve
+from spring_models import spring_codes
+
+# ==========================================================
+# CALCULATION GRAPH
+# The sizing chain as explicit memoized nodes:
+#
+#   rider_kg, gear_kg, coupling -> eff_rider_kg -> system_kg -> rear_load_kg
+#     -> rear_load_lbs -> raw_rate -> final_rate_for_tuning -> preload_sag_pct
+#   stroke_mm, target_sag -> sag_mm -> raw_rate ...
+#
+# Each node is a plain function whose parameter names are its inputs, so
+# the edges are read off the signatures. Setting an input drops only the
+# cached values downstream of it; reading a node computes whatever is
+# missing and records it in graph.recomputed. Inputs may be scalars or
+# arrays (a whole roster), like the engine functions the nodes call.
+#
+#   g = CalcGraph(rider_kg=68, bike_kg=16.5, bias_pct=65, coupling=0.6, ...)
+#   g["final_rate_for_tuning"]
+#   g.set(target_sag=30); g["preload_sag_pct"]; g.recomputed
+#   what_if = g.fork(rider_kg=75)   # shares everything upstream-independent
+# ==========================================================
+
+INPUT_DEFAULTS = {
+    "rider_kg": None, "gear_kg": DEFAULT_GEAR_KG, "bike_kg": None, "unsprung_kg": DEFAULT_UNSPRUNG_KG,
+    "bias_pct": None, "coupling": None, "stroke_mm": None, "travel_mm": None, "target_sag": None,
+    "spring_type": DEFAULT_SPRING_TYPE, "lr_start": None, "lr_end": None, "curve": None,
+    "preload_turns": tuple(PRELOAD_TURNS),
+    "sprindex_option": "A",  # Which neighbour to tune on when the rate falls in a Sprindex gap
+}
+
+NODES = {}
+
+def node(fn):
+    NODES[fn.__name__] = (fn, list(inspect.signature(fn).parameters))
+    return fn
+
+# ==========================================================
+# 1. NODES
+# ==========================================================
+@node
+def shock_stroke_mm(stroke_mm, curve):
+    # A leverage curve brings its own stroke
+    return np.asarray(stroke_mm if curve is None else curve.stroke, dtype=float)
+
+@node
+def eff_rider_kg(rider_kg, gear_kg, coupling):
+    return engine.eff_rider_kg(rider_kg, gear_kg, coupling)
+
+@node
+def system_kg(eff_rider_kg, bike_kg):
+    return eff_rider_kg + np.asarray(bike_kg, dtype=float)
+
+@node
+def rear_load_kg(system_kg, bias_pct, unsprung_kg):
+    return engine.rear_load_kg(system_kg, bias_pct, unsprung_kg)
+
+@node
+def rear_load_lbs(rear_load_kg):
+    return rear_load_kg * KG_TO_LB
+
+@node
+def effective_lr(travel_mm, shock_stroke_mm, lr_start, lr_end, target_sag, curve):
+    if curve is not None:
+        return curve.leverage_at(engine.sag_mm(shock_stroke_mm, target_sag))
+    return engine.effective_leverage(travel_mm, shock_stroke_mm, lr_start, lr_end, target_sag)
+
+@node
+def sag_mm(shock_stroke_mm, target_sag):
+    return engine.sag_mm(shock_stroke_mm, target_sag)
+
+@node
+def spring_code(spring_type):
+    # Which force curve each row uses (spring_models.py), looked up once per batch
+    return spring_codes(spring_type)
+
+@node
+def raw_rate(rear_load_lbs, effective_lr, sag_mm, spring_code, shock_stroke_mm):
+    return engine.rate_for_sag_mm(rear_load_lbs, effective_lr, sag_mm, spring_code, shock_stroke_mm)
+
+@node
+def rounded_rate(raw_rate, spring_type):
+    return engine.round_rate(raw_rate, spring_type)
+
+@node
+def sprindex(raw_rate, shock_stroke_mm, rear_load_lbs, effective_lr, curve):
+    return match_sprindex(raw_rate, shock_stroke_mm, rear_load_lbs, effective_lr, curve=curve)
+
+@node
+def final_rate_for_tuning(spring_type, rounded_rate, raw_rate, sprindex, sprindex_option):
+    # Same rules as the page: Sprindex tunes on its matched setting (option A or B in
+    # a gap), everything else on the 25 lbs step
+    is_sprindex = np.asarray(spring_type) == "Sprindex"
+    if not is_sprindex.any():
+        return rounded_rate
+    pick_b = (sprindex["status"] == "gap") & (np.asarray(sprindex_option) == "B")
+    tuning = np.where(pick_b, sprindex["option_b"], sprindex["tuning_rate"])
+    return np.where(is_sprindex, tuning, rounded_rate)
+
+@node
+def resulting_sag_pct(rear_load_lbs, effective_lr, final_rate_for_tuning, shock_stroke_mm, curve, spring_code):
+    return engine.resulting_sag_pct(rear_load_lbs, effective_lr, final_rate_for_tuning, shock_stroke_mm, curve,
+                                    spring_code)
+
+@node
+def spring_options(rear_load_lbs, effective_lr, rounded_rate, shock_stroke_mm, curve, spring_code):
+    # (rates, sags), each (..., 3): softer / recommended / stiffer
+    return engine.standard_spring_options(rear_load_lbs, effective_lr, rounded_rate, shock_stroke_mm, curve=curve,
+                                          spring_type=spring_code)
+
+@node
+def preload_sag_pct(rear_load_lbs, effective_lr, final_rate_for_tuning, shock_stroke_mm, preload_turns, curve,
+                    spring_code):
+    return engine.preload_sag_pct(rear_load_lbs, effective_lr, final_rate_for_tuning, shock_stroke_mm,
+                                  preload_turns, curve, spring_code)
+
+@node
+def preload_status(preload_sag_pct, preload_turns):
+    return engine.preload_status_tags(preload_sag_pct, preload_turns)
+
+# Every input and node -> the nodes that (transitively) read it, in evaluation order
+DESCENDANTS = {name: [] for name in list(INPUT_DEFAULTS) + list(NODES)}
+for _name, (_, _deps) in NODES.items():
+    for _dep in _deps:
+        for _up in [_dep] + [u for u, down in DESCENDANTS.items() if _dep in down]:
+            if _name not in DESCENDANTS[_up]:
+                DESCENDANTS[_up].append(_name)
+
+def _same(a, b):
+    if a is b:
+        return True
+    if isinstance(a, LeverageCurve) or isinstance(b, LeverageCurve):
+        return (isinstance(a, LeverageCurve) and isinstance(b, LeverageCurve)
+                and np.array_equal(a.shock, b.shock) and np.array_equal(a.leverage, b.leverage))
+    if a is None or b is None:
+        return False
+    a, b = np.asarray(a), np.asarray(b)
+    if a.shape != b.shape:
+        return False
+    if a.dtype.kind in "fc" and b.dtype.kind in "fc":
+        return bool(np.array_equal(a, b, equal_nan=True))
+    return bool(np.array_equal(a, b))
+
+# ==========================================================
+# 2. GRAPH
+# ==========================================================
+class CalcGraph:
+    def __init__(self, **inputs):
+        unknown = set(inputs) - set(INPUT_DEFAULTS)
+        if unknown:
+            raise ValueError(f"Unknown inputs: {sorted(unknown)}")
+        self.inputs = {**INPUT_DEFAULTS, **inputs}
+        self._values = {}
+        self.recomputed = []   # Nodes computed since the last set()
+        self.counts = {}       # Lifetime computations per node
+
+    def set(self, **inputs):
+        # Returns the cached nodes that were dropped
+        unknown = set(inputs) - set(INPUT_DEFAULTS)
+        if unknown:
+            raise ValueError(f"Unknown inputs: {sorted(unknown)}")
+        dropped = []
+        for name, value in inputs.items():
+            if _same(self.inputs[name], value):
+                continue
+            self.inputs[name] = value
+            for down in DESCENDANTS[name]:
+                if down in self._values:
+                    del self._values[down]
+                    dropped.append(down)
+        self.recomputed = []
+        return dropped
+
+    def get(self, name):
+        if name in self.inputs:
+            return self.inputs[name]
+        if name in self._values:
+            return self._values[name]
+        fn, deps = NODES[name]
+        value = fn(*[self.get(d) for d in deps])
+        self._values[name] = value
+        self.recomputed.append(name)
+        self.counts[name] = self.counts.get(name, 0) + 1
+        return value
+
+    __getitem__ = get
+
+    def evaluate(self, *names):
+        return {n: self.get(n) for n in (names or NODES)}
+
+    def is_cached(self, name):
+        return name in self._values
+
+    def fork(self, **inputs):
+        # A what-if copy: shares the cached values, then invalidates what the overrides touch
+        other = CalcGraph(**self.inputs)
+        other._values = dict(self._values)
+        other.set(**inputs)
+        return other
@@ -0,0 +1,229 @@
+import argparse
+import csv
+import json
+import os
+import uuid
+
+import numpy as np
+
+from kinematics import leverage_curve
+
+# ==========================================================
+# FRAME KINEMATICS LIBRARY
+# Real frame models (brand, model, category, travel, stroke and the
+# measured leverage curve) stored column-wise in a directory:
+#
+#   index.npz     one row per frame: brand, model, category, travel_mm,
+#                 stroke_mm, curve kind, offset / length into the samples,
+#                 plus the samples file name and row count
+#   samples.<build>.npy
+#                 every curve's (wheel_mm, value) points back to back,
+#                 float32, memory-mapped so a frame reads only its rows
+#
+# Each build writes a new samples file and then swaps in the index that
+# names it, so a reader always pairs an index with its own samples; the
+# row count is checked on open.
+#
+#   python frame_library.py build manifest.csv frames/
+#   python frame_library.py search frames/ "megatower" --category Enduro
+#   python frame_library.py show frames/ "Santa Cruz Megatower"
+#
+# The manifest has brand, model, category and curve_file columns; each
+# curve file is a CSV in the app's Measured Curve format. Nothing is read
+# until the library is opened, and opening reads only the index; get() is a
+# dict lookup plus one memory-mapped slice.
+# ==========================================================
+
+DEFAULT_PATH = os.environ.get("SPRING_FRAMES") or os.path.join(os.path.dirname(os.path.abspath(__file__)), "frames")
+INDEX_FILE = "index.npz"
+SAMPLES_FILE = "samples.{build}.npy"
+FORMAT_VERSION = 2
+CURVE_KINDS = ["leverage", "stroke"]  # What the value column of samples.npy holds
+
+# ==========================================================
+# 1. BUILDING
+# ==========================================================
+def frame_key(brand, model):
+    return f"{brand} {model}".strip()
+
+def build_library(frames, path):
+    # frames: iterable of dicts with brand, model, category, wheel_mm and
+    # either leverage or shock_mm. The index is written aside and swapped in.
+    cols = {k: [] for k in ["brand", "model", "category", "travel_mm", "stroke_mm", "kind", "offset", "length"]}
+    chunks, offset, seen = [], 0, set()
+    for f in frames:
+        key = frame_key(f["brand"], f["model"])
+        if key in seen:
+            raise ValueError(f"Duplicate frame {key!r}")
+        seen.add(key)
+        kind = "leverage" if f.get("leverage") is not None else "stroke"
+        values = f["leverage"] if kind == "leverage" else f["shock_mm"]
+        # Validates the samples and gives the frame's real travel and stroke
+        curve = leverage_curve(f["wheel_mm"], **{"leverage" if kind == "leverage" else "shock_mm": values})
+        points = np.column_stack([np.asarray(f["wheel_mm"], dtype=np.float32), np.asarray(values, dtype=np.float32)])
+        for k, v in [("brand", f["brand"]), ("model", f["model"]), ("category", f["category"]),
+                     ("travel_mm", curve.travel), ("stroke_mm", curve.stroke), ("kind", CURVE_KINDS.index(kind)),
+                     ("offset", offset), ("length", len(points))]:
+            cols[k].append(v)
+        chunks.append(points)
+        offset += len(points)
+
+    os.makedirs(path, exist_ok=True)
+    samples = np.concatenate(chunks) if chunks else np.empty((0, 2), dtype=np.float32)
+    # No index names this file until the swap below, so it needs no temp name
+    samples_file = SAMPLES_FILE.format(build=uuid.uuid4().hex[:12])
+    tmp_index = os.path.join(path, f".{INDEX_FILE}.tmp")
+    with open(os.path.join(path, samples_file), "wb") as fh:
+        np.save(fh, samples)
+    with open(tmp_index, "wb") as fh:
+        np.savez(fh, version=FORMAT_VERSION, samples_file=samples_file, samples_rows=len(samples),
+                 brand=np.array(cols["brand"], dtype=str), model=np.array(cols["model"], dtype=str),
+                 category=np.array(cols["category"], dtype=str),
+                 travel_mm=np.array(cols["travel_mm"], dtype=float), stroke_mm=np.array(cols["stroke_mm"], dtype=float),
+                 kind=np.array(cols["kind"], dtype=np.int8),
+                 offset=np.array(cols["offset"], dtype=np.int64), length=np.array(cols["length"], dtype=np.int32))
+    os.replace(tmp_index, os.path.join(path, INDEX_FILE))
+    # Earlier builds' samples: open libraries keep their mapping (where the OS
+    # refuses, the file goes with the next build)
+    prefix, suffix = SAMPLES_FILE.split("{build}")
+    for name in os.listdir(path):
+        if name.startswith(prefix) and name.endswith(suffix) and name != samples_file:
+            try:
+                os.remove(os.path.join(path, name))
+            except OSError:
+                pass
+    return len(cols["brand"])
+
+def read_manifest(manifest):
+    # brand, model, category, curve_file (relative to the manifest)
+    base = os.path.dirname(os.path.abspath(manifest))
+    with open(manifest, newline="") as fh:
+        for row in csv.DictReader(fh):
+            curve_path = os.path.join(base, row["curve_file"])
+            table = np.genfromtxt(curve_path, delimiter=",", names=True, dtype=float)
+            names = table.dtype.names or ()
+            value = next((n for n in ["shock_stroke_mm", "leverage_ratio"] if n in names), None)
+            if "wheel_travel_mm" not in names or value is None:
+                raise ValueError(f"{curve_path}: needs wheel_travel_mm and shock_stroke_mm or leverage_ratio columns")
+            yield {"brand": row["brand"], "model": row["model"], "category": row["category"],
+                   "wheel_mm": table["wheel_travel_mm"],
+                   "shock_mm" if value == "shock_stroke_mm" else "leverage": table[value]}
+
+# ==========================================================
+# 2. LOOKUP
+# ==========================================================
+class FrameLibrary:
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        for attempt in range(3):
+            with np.load(os.path.join(path, INDEX_FILE)) as index:
+                if int(index["version"]) != FORMAT_VERSION:
+                    raise ValueError(f"Frame library format {int(index['version'])}, expected {FORMAT_VERSION}; "
+                                     "rebuild it")
+                samples_file, rows = str(index["samples_file"]), int(index["samples_rows"])
+                self.index = {k: index[k] for k in index.files if k not in ("version", "samples_file", "samples_rows")}
+            try:
+                self.samples = np.load(os.path.join(path, samples_file), mmap_mode="r")
+                break
+            except FileNotFoundError:
+                # A rebuild swapped the index and removed these samples in between
+                if attempt == 2:
+                    raise
+        if self.samples.shape != (rows, 2):
+            raise ValueError(f"Frame library samples {samples_file} do not match the index; rebuild it")
+        self.keys = [frame_key(b, m) for b, m in zip(self.index["brand"], self.index["model"])]
+        self._row = {k: i for i, k in enumerate(self.keys)}
+        self._search_text = np.char.lower(np.char.add(np.char.add(self.index["brand"], " "), self.index["model"]))
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, key):
+        return key in self._row
+
+    def brands(self):
+        return sorted(set(self.index["brand"].tolist()))
+
+    def search(self, query="", brand=None, category=None, limit=50):
+        # Every word of query must appear in "brand model" (case-insensitive)
+        hit = np.ones(len(self.keys), dtype=bool)
+        for word in query.lower().split():
+            hit &= np.char.find(self._search_text, word) >= 0
+        if brand:
+            hit &= self.index["brand"] == brand
+        if category:
+            hit &= self.index["category"] == category
+        rows = np.flatnonzero(hit)[:limit] if limit else np.flatnonzero(hit)
+        return [self.keys[i] for i in rows]
+
+    def get(self, key):
+        i = self._row[key]
+        start, n = int(self.index["offset"][i]), int(self.index["length"][i])
+        points = np.array(self.samples[start:start + n], dtype=float)
+        kind = CURVE_KINDS[int(self.index["kind"][i])]
+        values = {"leverage": points[:, 1]} if kind == "leverage" else {"shock_mm": points[:, 1]}
+        return {
+            "key": key,
+            "brand": str(self.index["brand"][i]),
+            "model": str(self.index["model"][i]),
+            "category": str(self.index["category"][i]),
+            "travel_mm": float(self.index["travel_mm"][i]),
+            "stroke_mm": float(self.index["stroke_mm"][i]),
+            "curve": leverage_curve(points[:, 0], **values),
+        }
+
+def open_library(path=DEFAULT_PATH):
+    # None when there is no library at path
+    if not os.path.exists(os.path.join(path, INDEX_FILE)):
+        return None
+    return FrameLibrary(path)
+
+def library_stamp(path=DEFAULT_PATH):
+    # Changes whenever the library is rebuilt; for cache keys. Every build
+    # swaps in a new index file, so its inode changes even within one mtime tick.
+    try:
+        st = os.stat(os.path.join(path, INDEX_FILE))
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_mtime_ns)
+
+# ==========================================================
+# 3. CLI
+# ==========================================================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build and query the frame kinematics library.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_build = sub.add_parser("build", help="Build a library from a manifest CSV")
+    p_build.add_argument("manifest", help="Columns: brand, model, category, curve_file")
+    p_build.add_argument("path", nargs="?", default=DEFAULT_PATH)
+    p_search = sub.add_parser("search", help="Find frames by name")
+    p_search.add_argument("path")
+    p_search.add_argument("query", nargs="?", default="")
+    p_search.add_argument("--brand")
+    p_search.add_argument("--category")
+    p_search.add_argument("--limit", type=int, default=50)
+    p_show = sub.add_parser("show", help="Print one frame's kinematics")
+    p_show.add_argument("path")
+    p_show.add_argument("key", help='"Brand Model"')
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        n = build_library(read_manifest(args.manifest), args.path)
+        print(f"Built {args.path} with {n} frames")
+        return
+    lib = FrameLibrary(args.path)
+    if args.command == "search":
+        for key in lib.search(args.query, args.brand, args.category, args.limit):
+            i = lib._row[key]
+            print(f"{key:40s} {lib.index['category'][i]:20s} {lib.index['travel_mm'][i]:5.0f} mm / "
+                  f"{lib.index['stroke_mm'][i]:.1f} mm")
+    else:
+        if args.key not in lib:
+            parser.error(f"No frame {args.key!r}")
+        frame = lib.get(args.key)
+        curve = frame["curve"]
+        print(json.dumps({k: v for k, v in frame.items() if k != "curve"}, indent=2))
+        print(f"LR {curve.leverage[0]:.2f} -> {curve.leverage[-1]:.2f} ({curve.progression_pct:.1f}% progression)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+import cProfile
+import functools
+import io
+import json
+import os
+import pstats
+import threading
+import time
+import urllib.request
+import uuid
+
+# ==========================================================
+# RERUN INSTRUMENTATION (opt-in)
+# Times each numbered section of app.py per rerun, counts reruns per
+# session and exports the timings. Off unless SPRING_INSTRUMENT is set;
+# when off every hook is a shared no-op.
+#
+#   SPRING_INSTRUMENT=1                  enable
+#   SPRING_INSTRUMENT_FORMAT=jsonl|prom  one JSON line per rerun (default), or
+#                                        Prometheus text with running totals
+#   SPRING_INSTRUMENT_OUT=<path or URL>  default spring_metrics.jsonl / .prom next to this module;
+#                                        http(s) URLs are POSTed to in the background
+#   SPRING_PROFILE_RUN=<n>               cProfile the n-th full rerun of the process
+#   SPRING_PROFILE_OUT=<path>            default spring_rerun.prof next to this module (+ .txt summary)
+#
+# Fragment-only reruns (see app.py) are recorded as kind "fragment"
+# with just the sections that actually ran.
+# ==========================================================
+
+ENABLED = os.environ.get("SPRING_INSTRUMENT", "").lower() not in ("", "0", "false", "no")
+FORMAT = os.environ.get("SPRING_INSTRUMENT_FORMAT", "jsonl")
+OUT = (os.environ.get("SPRING_INSTRUMENT_OUT")
+       or os.path.join(os.path.dirname(os.path.abspath(__file__)), f"spring_metrics.{FORMAT}"))
+PROFILE_RUN = int(os.environ.get("SPRING_PROFILE_RUN", "0") or 0)
+PROFILE_OUT = (os.environ.get("SPRING_PROFILE_OUT")
+               or os.path.join(os.path.dirname(os.path.abspath(__file__)), "spring_rerun.prof"))
+
+SESSION_KEY = "_instrument_session"
+RERUNS_KEY = "_instrument_reruns"
+
+_local = threading.local()
+_lock = threading.Lock()
+_totals = {"sections": {}, "reruns": {}, "sessions": set(), "full_runs": 0}
+
+# ==========================================================
+# 1. RUN RECORDS
+# ==========================================================
+class _Noop:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NOOP = _Noop()
+
+class _Run:
+    def __init__(self, state, kind):
+        self.session = state.setdefault(SESSION_KEY, uuid.uuid4().hex[:12])
+        state[RERUNS_KEY] = state.get(RERUNS_KEY, 0) + 1
+        self.rerun = state[RERUNS_KEY]
+        self.kind = kind
+        self.sections = {}
+        self.start = time.perf_counter()
+        self.profiler = None
+
+class _Section:
+    def __init__(self, name):
+        self.name = name
+        self.implicit = False
+
+    def __enter__(self):
+        if getattr(_local, "run", None) is None:
+            # A fragment rerun skips the top of the script, so it opens its own record
+            import streamlit as st
+            begin_run(st.session_state, kind="fragment")
+            self.implicit = True
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        run = _local.run
+        run.sections[self.name] = run.sections.get(self.name, 0.0) + time.perf_counter() - self.t0
+        if self.implicit:
+            end_run(interrupted=exc_type is not None)
+        return False
+
+def section(name):
+    # with instrumentation.section("rider"): ...
+    return _Section(name) if ENABLED else _NOOP
+
+def timed(name):
+    # Decorator form of section(); returns the function untouched when disabled
+    def wrap(fn):
+        if not ENABLED:
+            return fn
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            with _Section(name):
+                return fn(*args, **kwargs)
+        return inner
+    return wrap
+
+def begin_run(state, kind="full"):
+    if not ENABLED:
+        return
+    if getattr(_local, "run", None) is not None:
+        # Previous run on this thread never reached end_run (st.rerun / stop)
+        end_run(interrupted=True)
+    run = _local.run = _Run(state, kind)
+    if kind == "full":
+        with _lock:
+            _totals["full_runs"] += 1
+            profile = _totals["full_runs"] == PROFILE_RUN
+        if profile:
+            run.profiler = cProfile.Profile()
+            run.profiler.enable()
+
+def end_run(interrupted=False):
+    run = getattr(_local, "run", None)
+    if not ENABLED or run is None:
+        return
+    _local.run = None
+    total = time.perf_counter() - run.start
+    if run.profiler is not None:
+        run.profiler.disable()
+        _dump_profile(run.profiler)
+
+    record = {
+        "ts": time.time(), "session": run.session, "rerun": run.rerun, "kind": run.kind,
+        "interrupted": interrupted, "total_s": total, "sections_s": run.sections,
+    }
+    with _lock:
+        _totals["sessions"].add(run.session)
+        _totals["reruns"][run.kind] = _totals["reruns"].get(run.kind, 0) + 1
+        for name, seconds in run.sections.items():
+            s = _totals["sections"].setdefault(name, [0.0, 0])
+            s[0] += seconds
+            s[1] += 1
+        payload = prometheus_text() if FORMAT == "prom" else json.dumps(record) + "\n"
+        if not OUT.startswith(("http://", "https://")):
+            _write(payload)
+            return
+    # Never hold up a rerun on the network
+    threading.Thread(target=_post, args=(payload,), daemon=True).start()
+
+# ==========================================================
+# 2. EXPORT
+# ==========================================================
+def prometheus_text():
+    # Caller holds _lock
+    lines = [
+        "# HELP spring_section_seconds Time spent in each app.py section per rerun",
+        "# TYPE spring_section_seconds summary",
+    ]
+    for name, (seconds, count) in sorted(_totals["sections"].items()):
+        lines.append(f'spring_section_seconds_sum{{section="{name}"}} {seconds:.6f}')
+        lines.append(f'spring_section_seconds_count{{section="{name}"}} {count}')
+    lines += ["# HELP spring_reruns_total Script reruns by kind", "# TYPE spring_reruns_total counter"]
+    for kind, count in sorted(_totals["reruns"].items()):
+        lines.append(f'spring_reruns_total{{kind="{kind}"}} {count}')
+    lines += ["# HELP spring_sessions_seen Sessions that have rerun at least once", "# TYPE spring_sessions_seen gauge",
+              f"spring_sessions_seen {len(_totals['sessions'])}"]
+    return "\n".join(lines) + "\n"
+
+def _write(payload):
+    # Caller holds _lock
+    if FORMAT == "prom":
+        # Textfile-collector style: replace the whole file atomically
+        tmp = f"{OUT}.tmp{os.getpid()}"
+        with open(tmp, "w") as f:
+            f.write(payload)
+        os.replace(tmp, OUT)
+    else:
+        with open(OUT, "a") as f:
+            f.write(payload)
+
+def _post(payload):
+    content_type = "text/plain; version=0.0.4" if FORMAT == "prom" else "application/x-ndjson"
+    req = urllib.request.Request(OUT, data=payload.encode(), headers={"Content-Type": content_type}, method="POST")
+    try:
+        urllib.request.urlopen(req, timeout=2).close()
+    except OSError:
+        pass  # Metrics are best effort
+
+def _dump_profile(profiler):
+    profiler.dump_stats(PROFILE_OUT)
+    text = io.StringIO()
+    pstats.Stats(profiler, stream=text).sort_stats("cumulative").print_stats(40)
+    with open(f"{PROFILE_OUT}.txt", "w") as f:
+        f.write(text.getvalue())
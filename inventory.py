@@ -0,0 +1,527 @@
+import argparse
+import heapq
+
+import numpy as np
+import pandas as pd
+
+from spring_data import DEFAULT_SPRING_TYPE
+from spring_engine import compute_spring_rates, resulting_sag_pct
+from spring_models import equivalent_mm, compression_mm, spring_codes
+from setups import normalize_setups, _to_float, _to_str
+from batch import read_chunks, require_parquet, ChunkWriter
+
+# ==========================================================
+# SPRING INVENTORY OPTIMIZER
+# Assigns real stock springs to a whole list of riders at once.
+#
+#   python inventory.py riders.csv catalog.csv assignments.csv --stock-out left.csv
+#
+# Catalog columns: rate_lbs, stroke_mm, quantity (required);
+#                  sku, id_mm, spring_type (optional).
+# Rider columns: the setups.py columns, plus optional spring_id_mm
+# (inner diameter the shock takes; blank = any).
+#
+# A spring is compatible when its type matches, its inner diameter
+# matches (a blank ID on either side matches anything) and its stroke is
+# at least the shock stroke (shorter springs coil-bind). The cost of a
+# spring is |resulting sag - target sag|, with the resulting sag read
+# through the spring's force curve (spring_models.py), so progressive
+# springs are costed at the sag they really give.
+#
+# Stock is split into pools of identical (type, ID, stroke); springs of
+# the same rate in a pool are one stock node. Each rider is offered the
+# NEIGHBOR_RATES stock rates either side of its exact rate in every pool
+# it fits (a binary search on the pool's sorted rates). When those offers
+# leave riders without a spring while stock is left over, the group is
+# offered again with every node in its pools, so riders that use up the
+# close rates never strand another rider next to unused stock. Pools that share a rider are solved together as a
+# min-cost assignment over those offers: as many riders as the compatible
+# stock allows get a spring, and among those assignments the total
+# |sag error| is the smallest possible. Riders whose every offered
+# spring is past --max-sag-error are left out.
+#
+# The solve first finds how many riders can be served at all, which
+# splits each group into riders short of stock (every spring offered to
+# them goes out) and the rest (every one of them gets a spring); both
+# parts are then placed by successive shortest paths over the stock
+# nodes (_place_stock, _place_riders).
+# ==========================================================
+
+NEIGHBOR_RATES = 4  # Stock rates first offered either side of a rider's exact rate, per pool
+ID_TOLERANCE_MM = 0.05
+STROKE_TOLERANCE_MM = 0.05
+INF = float("inf")
+
+STATUS_ASSIGNED = "assigned"
+STATUS_NO_STOCK = "no compatible spring"
+STATUS_SOLD_OUT = "compatible stock sold out"
+STATUS_TOLERANCE = "outside sag tolerance"
+
+# ==========================================================
+# 1. CATALOG
+# ==========================================================
+def normalize_catalog(columns, n):
+    for name in ("rate_lbs", "stroke_mm", "quantity"):
+        if columns.get(name) is None:
+            raise ValueError("Catalog needs rate_lbs, stroke_mm and quantity")
+    catalog = {
+        "sku": _to_str(columns.get("sku"), n, ""),
+        "spring_type": _to_str(columns.get("spring_type"), n, DEFAULT_SPRING_TYPE),
+        "rate_lbs": _to_float(columns["rate_lbs"], n),
+        "stroke_mm": _to_float(columns["stroke_mm"], n),
+        "id_mm": _to_float(columns.get("id_mm"), n),
+        "quantity": np.nan_to_num(_to_float(columns["quantity"], n)).astype(int),
+    }
+    unnamed = catalog["sku"] == ""
+    catalog["sku"][unnamed] = [f"row-{i}" for i in np.flatnonzero(unnamed)]
+    if np.isnan(catalog["rate_lbs"]).any() or np.isnan(catalog["stroke_mm"]).any():
+        raise ValueError("rate_lbs and stroke_mm must be numeric for every catalog row")
+    return catalog
+
+def build_pools(catalog):
+    # One pool per (type, ID, stroke); SKU rows inside sorted by rate
+    in_stock = np.flatnonzero((catalog["quantity"] > 0) & (catalog["rate_lbs"] > 0))
+    id_key = np.where(np.isnan(catalog["id_mm"]), -1.0, np.round(catalog["id_mm"], 1))
+    groups = {}
+    for row in in_stock:
+        key = (catalog["spring_type"][row], float(id_key[row]), float(catalog["stroke_mm"][row]))
+        groups.setdefault(key, []).append(row)
+
+    pools = []
+    # Shortest adequate stroke first, so ties go to the least oversized spring
+    for (spring_type, id_mm, stroke_mm), rows in sorted(groups.items(), key=lambda kv: kv[0][2]):
+        rows = np.array(rows)[np.argsort(catalog["rate_lbs"][rows], kind="stable")]
+        pools.append({
+            "spring_type": spring_type,
+            "id_mm": np.nan if id_mm < 0 else id_mm,
+            "stroke_mm": stroke_mm,
+            "rows": rows,
+            "rates": catalog["rate_lbs"][rows],
+        })
+    return pools
+
+def _stock_nodes(pools, catalog, pool_ids):
+    # Rows of equal rate in a pool are interchangeable: one node each, capacity = their stock
+    nodes = {"pool": [], "rate": [], "cap": [], "rows": []}
+    for p in pool_ids:
+        rates = pools[p]["rates"]
+        for rate in np.unique(rates):
+            rows = pools[p]["rows"][rates == rate]
+            nodes["pool"].append(p)
+            nodes["rate"].append(rate)
+            nodes["cap"].append(int(catalog["quantity"][rows].sum()))
+            nodes["rows"].append(rows)
+    nodes["pool"] = np.array(nodes["pool"])
+    nodes["rate"] = np.array(nodes["rate"], dtype=float)
+    return nodes
+
+# ==========================================================
+# 2. ASSIGNMENT
+# ==========================================================
+def _compatibility(pools, setup, spring_id_mm):
+    # (riders x pools) boolean matrix
+    n = len(setup["rider_kg"])
+    compat = np.zeros((n, len(pools)), dtype=bool)
+    for p, pool in enumerate(pools):
+        id_ok = np.isnan(spring_id_mm) | np.isnan(pool["id_mm"]) | (np.abs(spring_id_mm - pool["id_mm"]) <= ID_TOLERANCE_MM)
+        compat[:, p] = (
+            (setup["spring_type"] == pool["spring_type"])
+            & (pool["stroke_mm"] + STROKE_TOLERANCE_MM >= setup["stroke_mm"])
+            & id_ok
+        )
+    return compat
+
+def _components(compat):
+    # Pools linked by a rider who fits both are solved together; everything else is independent
+    parent = list(range(compat.shape[1]))
+
+    def find(p):
+        while parent[p] != p:
+            parent[p] = parent[parent[p]]
+            p = parent[p]
+        return p
+
+    for pattern in np.unique(compat[compat.any(axis=1)], axis=0):
+        ps = np.flatnonzero(pattern)
+        for p in ps[1:]:
+            parent[find(p)] = find(ps[0])
+    groups = {}
+    for p in range(compat.shape[1]):
+        groups.setdefault(find(p), []).append(p)
+    return list(groups.values())
+
+def _offers(nodes, pool_ids, fits, riders, exact_rate, reach=NEIGHBOR_RATES):
+    # (len(riders), width) stock nodes offered to each rider: the reach nodes
+    # either side of its exact rate in every pool it fits, found by binary
+    # search on the pool's sorted rates. -1 pads the rows.
+    blocks = []
+    window = np.arange(-reach, reach)
+    for p_local, p in enumerate(pool_ids):
+        start, stop = np.searchsorted(nodes["pool"], [p, p + 1])
+        pos = np.searchsorted(nodes["rate"][start:stop], exact_rate[riders])
+        idx = pos[:, None] + window
+        ok = fits[riders, p_local][:, None] & (idx >= 0) & (idx < stop - start)
+        blocks.append(np.where(ok, start + idx, -1))
+    offers = np.concatenate(blocks, axis=1)
+    # Valid offers first, then trim the padding every row shares
+    offers = np.take_along_axis(offers, np.argsort(offers < 0, axis=1, kind="stable"), axis=1)
+    return offers[:, :max(int((offers >= 0).sum(axis=1).max()), 1)]
+
+def _max_matching(adj, cap, order):
+    # Most riders placed, ignoring cost. Each rider in turn (similar rates
+    # together) takes its first node with room, then every rider left over
+    # searches breadth first for a path to room through full nodes whose riders
+    # can move on. A search that fails marks every node it reached dead: placing
+    # other riders only uses up room, so none can open behind them.
+    match = [-1] * len(adj)
+    room = list(cap)
+    holders = [set() for _ in cap]
+    for x in order:
+        for k in adj[x]:
+            if room[k]:
+                room[k] -= 1
+                match[x] = k
+                holders[k].add(x)
+                break
+    dead = [False] * len(cap)
+    for x in order:
+        if match[x] >= 0:
+            continue
+        parent = {k: (-1, x) for k in adj[x] if not dead[k]}  # node -> (node the rider left, rider)
+        queue = list(parent)
+        end = -1
+        i = 0
+        while i < len(queue) and end < 0:
+            u = queue[i]
+            i += 1
+            for y in holders[u]:
+                for k in adj[y]:
+                    if not dead[k] and k not in parent:
+                        parent[k] = (u, y)
+                        if room[k]:
+                            end = k
+                            break
+                        queue.append(k)
+                if end >= 0:
+                    break
+        if end < 0:
+            for k in queue:
+                dead[k] = True
+            continue
+        room[end] -= 1
+        k = end
+        while k >= 0:
+            u, y = parent[k]
+            if u >= 0:
+                holders[u].discard(y)
+            holders[k].add(y)
+            match[y] = k
+            k = u
+    return match, holders
+
+def _short_of_stock(adj, match, holders):
+    # Riders reachable from an unplaced rider by moving placed riders along, and
+    # the nodes they're offered. Those nodes are sold out in every maximum
+    # placement and only ever go to those riders; every other rider is placed in
+    # every maximum placement (Dulmage-Mendelsohn), so the two parts are solved
+    # apart: spring by spring here, rider by rider elsewhere.
+    riders = {x for x, k in enumerate(match) if k < 0}
+    nodes = set()
+    stack = list(riders)
+    while stack:
+        for k in adj[stack.pop()]:
+            if k not in nodes:
+                nodes.add(k)
+                for y in holders[k]:
+                    if y not in riders:
+                        riders.add(y)
+                        stack.append(y)
+    return riders, nodes
+
+def _place_stock(by_node, units, node_of, cost_of):
+    # Every spring in units (one node id per spring) onto its own rider, at the
+    # least total cost; by_node[k] is (cost, rider) cheapest first. Successive
+    # shortest paths over the nodes: a spring of node v takes a free rider, or a
+    # rider from node j, which then needs another rider, and so on. Potentials h
+    # keep the moves' reduced costs non-negative (free riders at 0, nodes at or
+    # below), so each spring is one Dijkstra, cut off at the cheapest free rider
+    # found so far. moves[v][j] holds the riders at j that v is offered to, keyed
+    # by what moving them costs, so a node's moves are read one per node j rather
+    # than one per rider; riders that have moved on are dropped as they surface.
+    h = [0.0] * len(by_node)
+    offered = {}
+    for v, pairs in enumerate(by_node):
+        for c, x in pairs:
+            offered.setdefault(x, []).append((c, v))
+    moves = [{} for _ in by_node]  # v -> {j: heap of (c_xv - c_xj, x, c_xv)}
+    first_free = [0] * len(by_node)  # Riders are never freed, so this only moves on
+
+    def seat(x, k, c):
+        node_of[x], cost_of[x] = k, c
+        for cv, v in offered[x]:
+            if v != k:
+                heapq.heappush(moves[v].setdefault(k, []), (cv - c, x, cv))
+
+    for start in units:
+        dist = {start: -h[start]}
+        pred = {}  # node -> (node its rider moved to, rider, its cost there)
+        heap = [(-h[start], start)]
+        done = set()
+        best, end = INF, None
+        while heap and heap[0][0] < best:
+            d, v = heapq.heappop(heap)
+            if v in done:
+                continue
+            done.add(v)
+            base = d + h[v]
+            pairs = by_node[v]
+            i = first_free[v]
+            while i < len(pairs) and node_of[pairs[i][1]] >= 0:
+                i += 1
+            first_free[v] = i
+            if i < len(pairs) and base + pairs[i][0] < best:
+                best, end = base + pairs[i][0], (pairs[i][1], v, pairs[i][0])
+            gone = []
+            for j, riders in moves[v].items():
+                if j in done:
+                    continue
+                while riders and node_of[riders[0][1]] != j:
+                    heapq.heappop(riders)
+                if not riders:
+                    gone.append(j)
+                    continue
+                gap, x, c = riders[0]
+                nd = base + gap - h[j]
+                if nd < best and nd < dist.get(j, INF):
+                    dist[j] = nd
+                    pred[j] = (v, x, c)
+                    heapq.heappush(heap, (nd, j))
+            for j in gone:
+                del moves[v][j]
+
+        for k in done:
+            h[k] += dist[k] - best
+        x, k, c = end
+        seat(x, k, c)
+        while k != start:
+            k, x, c = pred[k]
+            seat(x, k, c)
+
+def _place_riders(adj, room, riders, node_of, cost_of):
+    # Every rider in riders into a node with room, at the least total cost: the
+    # mirror image of _place_stock, with adj[x] as (cost, node) cheapest first. A
+    # rider takes a node with room, or a full node whose rider moves on to
+    # another, and so on; nodes with room stay at potential 0, full nodes at or
+    # below. moves[u][k] holds the riders at u offered k, as in _place_stock, and
+    # a new rider's offers past its cheapest node with room are never worth taking.
+    room = list(room)
+    h = [0.0] * len(room)
+    moves = [{} for _ in room]  # u -> {k: heap of (c_yk - c_yu, y, c_yk)}
+
+    def seat(y, k, c):
+        node_of[y], cost_of[y] = k, c
+        for ck, j in adj[y]:
+            if j != k:
+                heapq.heappush(moves[k].setdefault(j, []), (ck - c, y, ck))
+
+    for x in riders:
+        dist = {}
+        pred = {}  # node -> (node the rider left or -1, rider, its cost here)
+        heap = []
+        best, end = INF, None
+        for c, k in adj[x]:
+            dist[k] = c - h[k]
+            pred[k] = (-1, x, c)
+            if room[k]:
+                best, end = c, k
+                break
+            heapq.heappush(heap, (c - h[k], k))
+        done = set()
+        while heap and heap[0][0] < best:
+            d, u = heapq.heappop(heap)
+            if u in done:
+                continue
+            done.add(u)
+            base = d + h[u]
+            gone = []
+            for k, members in moves[u].items():
+                if k in done:
+                    continue
+                while members and node_of[members[0][1]] != u:
+                    heapq.heappop(members)
+                if not members:
+                    gone.append(k)
+                    continue
+                gap, y, c = members[0]
+                nd = base + gap - h[k]
+                if nd < best and nd < dist.get(k, INF):
+                    dist[k] = nd
+                    pred[k] = (u, y, c)
+                    if room[k]:
+                        best, end = nd, k
+                    else:
+                        heapq.heappush(heap, (nd, k))
+            for k in gone:
+                del moves[u][k]
+
+        for k in done:
+            h[k] += dist[k] - best
+        room[end] -= 1
+        k = end
+        while k >= 0:
+            prev, y, c = pred[k]
+            seat(y, k, c)
+            k = prev
+
+def assign_springs(setup, catalog, spring_id_mm=None, max_sag_error=None):
+    n = len(setup["rider_kg"])
+    spring_id_mm = np.full(n, np.nan) if spring_id_mm is None else np.asarray(spring_id_mm, dtype=float)
+    res = compute_spring_rates(
+        setup["rider_kg"], setup["gear_kg"], setup["bike_kg"], setup["unsprung_kg"], setup["bias_pct"],
+        setup["stroke_mm"], setup["travel_mm"], setup["sag_pct"], setup["spring_type"], setup["coupling"],
+        lr_start=setup["lr_start"], lr_end=setup["lr_end"], turns=(),
+    )
+    # Linear-equivalent sag is inversely proportional to rate: sag(rate) = sag_per_rate / rate,
+    # and the real sag is that mapped through the spring's force curve (spring_models.py),
+    # so sag error falls towards the exact rate and rises past it.
+    stroke_mm, spring_type, target = setup["stroke_mm"], setup["spring_type"], setup["sag_pct"]
+    codes = spring_codes(spring_type)
+    sag_per_rate = resulting_sag_pct(res["rear_load_lbs"], res["effective_lr"], 1.0, stroke_mm)
+    equivalent_target = equivalent_mm(stroke_mm * target / 100, stroke_mm, codes) / stroke_mm * 100
+    exact_rate = sag_per_rate / equivalent_target
+
+    def sag_at(rs, rate):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            linear_mm = stroke_mm[rs] * sag_per_rate[rs] / rate / 100
+            return compression_mm(linear_mm, stroke_mm[rs], codes[rs]) / stroke_mm[rs] * 100
+
+    pools = build_pools(catalog)
+    compat = _compatibility(pools, setup, spring_id_mm)
+    tolerance = np.inf if max_sag_error is None else max_sag_error
+    sku_row = np.full(n, -1)
+    status = np.where(compat.any(axis=1), STATUS_TOLERANCE, STATUS_NO_STOCK).astype(object)
+
+    for pool_ids in _components(compat):
+        nodes = _stock_nodes(pools, catalog, pool_ids)
+        fits = compat[:, pool_ids]
+        riders = np.flatnonzero(fits.any(axis=1))
+        if not len(riders):
+            continue
+
+        # Riders left over with stock to spare may only be short of reach:
+        # then offer every node in the pools instead
+        widest = int(np.bincount(nodes["pool"]).max())
+        reach = NEIGHBOR_RATES
+        while True:
+            offers = _offers(nodes, pool_ids, fits, riders, exact_rate, reach)
+            rate = nodes["rate"][np.maximum(offers, 0)]
+            cost = np.abs(sag_at(riders[:, None], rate) - target[riders, None])
+            cost[(offers < 0) | ~(cost <= tolerance)] = np.inf
+            served = np.isfinite(cost).any(axis=1)
+            if not served.any():
+                break
+            # Each rider's offers as (cost, node), cheapest first
+            order = np.argsort(cost[served], axis=1, kind="stable")
+            cost = np.take_along_axis(cost[served], order, axis=1)
+            offers = np.take_along_axis(offers[served], order, axis=1)
+            adj = [list(zip(c[:m], k[:m])) for c, k, m in
+                   zip(cost.tolist(), offers.tolist(), np.isfinite(cost).sum(axis=1).tolist())]
+            targets = [[k for _, k in pairs] for pairs in adj]
+            order = np.argsort(exact_rate[riders[served]], kind="stable").tolist()
+            match, holders = _max_matching(targets, nodes["cap"], order)
+            placed = sum(k >= 0 for k in match)
+            if placed == len(match) or placed == sum(nodes["cap"]) or reach >= widest:
+                break
+            reach = widest
+        riders = riders[served]
+        if not len(riders):
+            continue
+
+        status[riders] = STATUS_SOLD_OUT
+        short_riders, short_nodes = _short_of_stock(targets, match, holders)
+        node_of = [-1] * len(riders)
+        cost_of = [0.0] * len(riders)
+
+        # Where stock runs short every spring goes out: place springs onto riders
+        by_node = [[] for _ in nodes["cap"]]
+        for x in short_riders:
+            for c, k in adj[x]:
+                by_node[k].append((c, x))
+        for pairs in by_node:
+            pairs.sort()
+        _place_stock(by_node, [k for k in sorted(short_nodes) for _ in range(nodes["cap"][k])], node_of, cost_of)
+        # Everywhere else every rider gets one: place riders into the stock
+        rest = [[(c, k) for c, k in pairs if k not in short_nodes] for pairs in adj]
+        room = [0 if k in short_nodes else cap for k, cap in enumerate(nodes["cap"])]
+        _place_riders(rest, room, [x for x in range(len(riders)) if x not in short_riders], node_of, cost_of)
+
+        # Hand out each node's SKU rows in catalog order
+        node_of = np.array(node_of)
+        for k, rows in enumerate(nodes["rows"]):
+            stock = [r for r in rows for _ in range(int(catalog["quantity"][r]))]
+            for i, row in zip(riders[node_of == k].tolist(), stock):
+                sku_row[i] = row
+                status[i] = STATUS_ASSIGNED
+
+    assigned = sku_row >= 0
+    rate = np.where(assigned, catalog["rate_lbs"][sku_row], np.nan)
+    sag = sag_at(np.arange(n), rate)
+    remaining = catalog["quantity"].copy()
+    np.subtract.at(remaining, sku_row[assigned], 1)
+    return {
+        "sku_row": sku_row,
+        "sku": np.where(assigned, catalog["sku"][sku_row], ""),
+        "spring_rate": rate,
+        "spring_stroke_mm": np.where(assigned, catalog["stroke_mm"][sku_row], np.nan),
+        "spring_id_mm": np.where(assigned, catalog["id_mm"][sku_row], np.nan),
+        "exact_rate": exact_rate,
+        "assigned_sag_pct": sag,
+        "sag_error_pct": sag - target,
+        "status": status,
+        "remaining": remaining,
+        "total_abs_sag_error": float(np.nansum(np.abs(sag - target))),
+    }
+
+# ==========================================================
+# 3. CLI
+# ==========================================================
+def _read_all(path):
+    return pd.concat(read_chunks(path), ignore_index=True)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Assign stock springs from a catalog to a list of riders.")
+    parser.add_argument("riders", help="Rider file (.csv or .parquet)")
+    parser.add_argument("catalog", help="Spring catalog (.csv or .parquet)")
+    parser.add_argument("output", help="Assignment file (.csv or .parquet)")
+    parser.add_argument("--stock-out", help="Write the catalog with quantity_left here")
+    parser.add_argument("--max-sag-error", type=float, default=None,
+                        help="Leave riders unassigned rather than exceed this sag error (%% points)")
+    args = parser.parse_args(argv)
+    try:
+        require_parquet(args.riders, args.catalog, args.output, args.stock_out)
+    except RuntimeError as e:
+        parser.error(str(e))
+
+    riders = _read_all(args.riders)
+    catalog_df = _read_all(args.catalog)
+    setup = normalize_setups({c: riders[c].to_numpy() for c in riders.columns}, len(riders))
+    catalog = normalize_catalog({c: catalog_df[c].to_numpy() for c in catalog_df.columns}, len(catalog_df))
+    spring_id = riders["spring_id_mm"].to_numpy(dtype=float) if "spring_id_mm" in riders else None
+    result = assign_springs(setup, catalog, spring_id, args.max_sag_error)
+
+    out = riders.copy()
+    for key in ["exact_rate", "sku", "spring_rate", "spring_stroke_mm", "spring_id_mm",
+                "assigned_sag_pct", "sag_error_pct", "status"]:
+        out[f"assigned_{key}" if key == "spring_id_mm" else key] = result[key]
+    with ChunkWriter(args.output) as writer:
+        writer.write(out)
+    if args.stock_out:
+        with ChunkWriter(args.stock_out) as writer:
+            writer.write(catalog_df.assign(quantity_left=result["remaining"]))
+
+    n_assigned = int((result["status"] == STATUS_ASSIGNED).sum())
+    print(f"Assigned {n_assigned}/{len(riders)} riders, "
+          f"total |sag error| {result['total_abs_sag_error']:.1f} %-points -> {args.output}")
+
+if __name__ == "__main__":
+    main()
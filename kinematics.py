@@ -0,0 +1,127 @@
+import io
+from functools import lru_cache
+
+import numpy as np
+
+from spring_data import MM_TO_IN
+from spring_models import equivalent_mm
+
+# ==========================================================
+# LEVERAGE-CURVE KINEMATICS
+# A frame's real leverage curve, sampled either as shock stroke vs wheel
+# travel or as leverage ratio vs wheel travel. Everything the solvers
+# need is tabulated once per curve and the curve objects are cached, so
+# sweeping many riders over one frame is a handful of np.interp calls.
+# ==========================================================
+
+CURVE_SAMPLES = 1024
+SOLVER_TOL_MM = 1e-6
+
+# ==========================================================
+# 1. CURVE
+# ==========================================================
+class LeverageCurve:
+    def __init__(self, wheel_mm, shock_mm, leverage):
+        # Dense, shock-ascending tables: shock (mm) -> wheel (mm), leverage ratio
+        self.shock = np.asarray(shock_mm, dtype=float)
+        self.wheel = np.asarray(wheel_mm, dtype=float)
+        self.leverage = np.asarray(leverage, dtype=float)
+        if np.any(np.diff(self.shock) <= 0) or np.any(self.leverage <= 0):
+            raise ValueError("Leverage curve must have positive leverage and strictly increasing shock stroke")
+        self.stroke = float(self.shock[-1])
+        self.travel = float(self.wheel[-1])
+
+    @classmethod
+    def from_leverage(cls, wheel_mm, leverage, samples=CURVE_SAMPLES):
+        # Shock stroke is the cumulative integral of 1/LR over wheel travel
+        wheel_mm, leverage = _sorted_samples(wheel_mm, leverage)
+        wheel = np.linspace(0.0, wheel_mm[-1], samples)
+        lr = np.interp(wheel, wheel_mm, leverage)
+        inv = 1.0 / lr
+        shock = np.concatenate([[0.0], np.cumsum(0.5 * (inv[1:] + inv[:-1]) * np.diff(wheel))])
+        return cls(wheel, shock, lr)
+
+    @classmethod
+    def from_stroke(cls, wheel_mm, shock_mm, samples=CURVE_SAMPLES):
+        # Leverage is the slope of each sampled segment, placed at its midpoint
+        wheel_mm, shock_mm = _sorted_samples(wheel_mm, shock_mm)
+        seg_lr = np.diff(wheel_mm) / np.diff(shock_mm)
+        seg_mid = 0.5 * (wheel_mm[1:] + wheel_mm[:-1])
+        wheel = np.linspace(0.0, wheel_mm[-1], samples)
+        shock = np.interp(wheel, wheel_mm, shock_mm)
+        return cls(wheel, shock, np.interp(wheel, seg_mid, seg_lr))
+
+    @property
+    def progression_pct(self):
+        return (self.leverage[0] - self.leverage[-1]) / self.leverage[0] * 100
+
+    def leverage_at(self, shock_mm):
+        return np.interp(shock_mm, self.shock, self.leverage)
+
+    def sag_mm(self, rear_load, rate, preload_mm=0.0, spring_type=None):
+        # Solves rate * (s + preload) = W * LR(s) for shock sag s by vectorized
+        # bisection (s + preload through the spring's force curve, see
+        # spring_models.py); every argument broadcasts, so riders x rates x
+        # preloads is one call. Returns 0 if preload holds the load and the
+        # full stroke if the spring bottoms out.
+        rear_load, rate, preload_mm = np.broadcast_arrays(
+            np.asarray(rear_load, dtype=float), np.asarray(rate, dtype=float),
+            np.asarray(preload_mm, dtype=float))
+
+        def excess(s):
+            return rate * equivalent_mm(s + preload_mm, self.stroke, spring_type) * MM_TO_IN - rear_load * self.leverage_at(s)
+
+        lo = np.zeros(rear_load.shape)
+        hi = np.full(rear_load.shape, self.stroke)
+        for _ in range(int(np.ceil(np.log2(self.stroke / SOLVER_TOL_MM)))):
+            mid = 0.5 * (lo + hi)
+            below = excess(mid) < 0
+            lo = np.where(below, mid, lo)
+            hi = np.where(below, hi, mid)
+        sag = 0.5 * (lo + hi)
+        sag = np.where(excess(0.0) >= 0, 0.0, sag)
+        sag = np.where(excess(self.stroke) < 0, self.stroke, sag)
+        return np.where(np.isnan(rate) | np.isnan(rear_load), np.nan, sag)
+
+    def sag_pct(self, rear_load, rate, preload_mm=0.0, spring_type=None):
+        return self.sag_mm(rear_load, rate, preload_mm, spring_type) / self.stroke * 100
+
+def _sorted_samples(x, y):
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    order = np.argsort(x)
+    x, y = x[order], y[order]
+    if len(x) < 2 or x[0] != 0:
+        raise ValueError("Leverage curve needs at least two samples starting at 0 mm wheel travel")
+    return x, y
+
+# ==========================================================
+# 2. CACHED CONSTRUCTION
+# ==========================================================
+@lru_cache(maxsize=64)
+def _cached_curve(wheel_mm, values, kind):
+    if kind == "leverage":
+        return LeverageCurve.from_leverage(wheel_mm, values)
+    return LeverageCurve.from_stroke(wheel_mm, values)
+
+def leverage_curve(wheel_mm, shock_mm=None, leverage=None):
+    # Identical sample points return the same cached curve object
+    if (shock_mm is None) == (leverage is None):
+        raise ValueError("Pass exactly one of shock_mm or leverage")
+    kind, values = ("stroke", shock_mm) if leverage is None else ("leverage", leverage)
+    return _cached_curve(tuple(map(float, wheel_mm)), tuple(map(float, values)), kind)
+
+def read_curve_csv(source):
+    # Columns: wheel_travel_mm plus shock_stroke_mm or leverage_ratio
+    if hasattr(source, "read"):
+        # getvalue() so Streamlit uploads can be re-read on every rerun
+        data = source.getvalue() if hasattr(source, "getvalue") else source.read()
+        source = io.StringIO(data.decode() if isinstance(data, bytes) else data)
+    table = np.genfromtxt(source, delimiter=",", names=True, dtype=float)
+    names = table.dtype.names or ()
+    if "wheel_travel_mm" not in names:
+        raise ValueError("Curve CSV needs a wheel_travel_mm column")
+    if "shock_stroke_mm" in names:
+        return leverage_curve(table["wheel_travel_mm"], shock_mm=table["shock_stroke_mm"])
+    if "leverage_ratio" in names:
+        return leverage_curve(table["wheel_travel_mm"], leverage=table["leverage_ratio"])
+    raise ValueError("Curve CSV needs a shock_stroke_mm or leverage_ratio column")
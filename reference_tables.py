@@ -0,0 +1,245 @@
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+# ==========================================================
+# REFERENCE DATA TABLES
+# The category, skill, coupling, frame size, bike weight, Sprindex and
+# stroke tables live in a versioned JSON file (spring_tables.json). It
+# is validated once per load and compiled into integer-indexed NumPy
+# arrays, so batch paths turn category names into codes once and look
+# every rider up by index.
+#
+#   SPRING_TABLES=<path>     data file (default: spring_tables.json here)
+#   SPRING_REGION=<name>     also load <data file stem>.<name>.json, whose
+#                            size_weight_mods / bike_weight_est replace the base ones
+#
+#   python reference_tables.py --check                 # validate before shipping
+#   python reference_tables.py --check --region eu
+#
+# current() re-stats the files at most every RELOAD_CHECK_S and reloads
+# when they change, so running processes (app, API, batch workers) pick
+# up edits without a restart. A file that fails validation is reported
+# and the previous tables stay in use.
+# ==========================================================
+
+SCHEMA_VERSION = 1
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "spring_tables.json")
+RELOAD_CHECK_S = 1.0
+
+CATEGORY_FIELDS = ["travel", "stroke", "base_sag", "progression", "lr_start", "bike_mass_def_kg", "bias"]
+PROGRESSION_RANGE = (-10.0, 60.0)  # % (negative = regressive); the app's Progression input bounds
+FRAME_MATERIALS = ["Carbon", "Aluminium"]
+PRICE_TIERS = 3
+TABLE_KEYS = ["category_data", "skill_modifiers", "coupling_coeffs", "size_weight_mods",
+              "bike_weight_est", "sprindex_data", "common_strokes"]
+REGIONAL_KEYS = ["size_weight_mods", "bike_weight_est"]
+
+_lock = threading.Lock()
+_state = {"tables": None, "stamp": None, "checked": 0.0, "error": None}
+_callbacks = []
+
+# ==========================================================
+# 1. VALIDATION
+# ==========================================================
+def _number(value, where, positive=False):
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or value != value:
+        raise ValueError(f"{where}: expected a number, got {value!r}")
+    if positive and value <= 0:
+        raise ValueError(f"{where}: must be positive, got {value!r}")
+    return float(value)
+
+def validate(doc):
+    # Raises ValueError naming the first bad entry
+    if doc.get("schema") != SCHEMA_VERSION:
+        raise ValueError(f"schema: expected {SCHEMA_VERSION}, got {doc.get('schema')!r}")
+    if not isinstance(doc.get("version"), str) or not doc["version"]:
+        raise ValueError("version: expected a non-empty string")
+    missing = [k for k in TABLE_KEYS if k not in doc]
+    if missing:
+        raise ValueError(f"Missing tables: {missing}")
+
+    categories = doc["category_data"]
+    if not categories:
+        raise ValueError("category_data: no categories")
+    for name, d in categories.items():
+        for field in CATEGORY_FIELDS:
+            _number(d.get(field), f"category_data.{name}.{field}", positive=field != "progression")
+        if not PROGRESSION_RANGE[0] <= d["progression"] <= PROGRESSION_RANGE[1]:
+            raise ValueError(f"category_data.{name}.progression: must be within {PROGRESSION_RANGE}, "
+                             f"got {d['progression']!r}")
+        if not isinstance(d.get("desc"), str):
+            raise ValueError(f"category_data.{name}.desc: expected a string")
+        if not 0 < d["bias"] < 100 or not 0 < d["base_sag"] < 100:
+            raise ValueError(f"category_data.{name}: bias and base_sag are percentages")
+
+    for table in ["coupling_coeffs", "bike_weight_est"]:
+        if set(doc[table]) != set(categories):
+            raise ValueError(f"{table}: categories {sorted(doc[table])} don't match category_data")
+    for name, c in doc["coupling_coeffs"].items():
+        _number(c, f"coupling_coeffs.{name}")
+    for name, by_material in doc["bike_weight_est"].items():
+        if set(by_material) != set(FRAME_MATERIALS):
+            raise ValueError(f"bike_weight_est.{name}: expected materials {FRAME_MATERIALS}")
+        for material, weights in by_material.items():
+            if len(weights) != PRICE_TIERS:
+                raise ValueError(f"bike_weight_est.{name}.{material}: expected {PRICE_TIERS} price tiers")
+            for i, w in enumerate(weights):
+                _number(w, f"bike_weight_est.{name}.{material}[{i}]", positive=True)
+
+    for name, m in doc["skill_modifiers"].items():
+        _number(m.get("bias"), f"skill_modifiers.{name}.bias")
+    for name, m in doc["size_weight_mods"].items():
+        _number(m, f"size_weight_mods.{name}")
+
+    for name, fam in doc["sprindex_data"].items():
+        _number(fam.get("max_stroke"), f"sprindex_data.{name}.max_stroke", positive=True)
+        bounds = []
+        for r in fam.get("ranges", []):
+            try:
+                lo, hi = (int(v) for v in r.split("-"))
+            except (AttributeError, ValueError):
+                raise ValueError(f"sprindex_data.{name}: bad range {r!r}, expected 'low-high'") from None
+            if lo >= hi:
+                raise ValueError(f"sprindex_data.{name}: range {r!r} is empty")
+            bounds.append((lo, hi))
+        # The matcher binary-searches both edges (ranges may overlap)
+        if not bounds or np.any(np.diff(bounds, axis=0) < 0):
+            raise ValueError(f"sprindex_data.{name}: ranges must be non-empty with both edges ascending")
+
+    strokes = [_number(s, f"common_strokes[{i}]", positive=True) for i, s in enumerate(doc["common_strokes"])]
+    if not strokes or np.any(np.diff(strokes) <= 0):
+        raise ValueError("common_strokes: must be non-empty and strictly ascending")
+    return doc
+
+# ==========================================================
+# 2. COMPILATION
+# ==========================================================
+def compile_tables(doc, region=None, sources=()):
+    # Display-string dicts -> integer-indexed arrays (raw dicts kept for the UI)
+    categories = list(doc["category_data"])
+    skills = list(doc["skill_modifiers"])
+    sizes = list(doc["size_weight_mods"])
+    weights = np.array([[doc["bike_weight_est"][c][m] for m in FRAME_MATERIALS] for c in categories], dtype=float)
+    return {
+        "version": doc["version"],
+        # Content hash: changes on any edit, bumped version or not (result_cache keys on it)
+        "fingerprint": hashlib.sha1(json.dumps(doc, sort_keys=True).encode()).hexdigest(),
+        "region": region,
+        "sources": list(sources),
+        "raw": {k: doc[k] for k in TABLE_KEYS},
+        "category_names": categories,
+        "category_index": {c: i for i, c in enumerate(categories)},
+        "category": {f: np.array([doc["category_data"][c][f] for c in categories], dtype=float)
+                     for f in CATEGORY_FIELDS},
+        "coupling": np.array([doc["coupling_coeffs"][c] for c in categories], dtype=float),
+        "skill_names": skills,
+        "skill_bias": np.array([doc["skill_modifiers"][s]["bias"] for s in skills], dtype=float),
+        "size_names": sizes,
+        "size_mods": np.array([doc["size_weight_mods"][s] for s in sizes], dtype=float),
+        "bike_weight": weights,  # (category, FRAME_MATERIALS, price tier)
+        "common_strokes": np.array(doc["common_strokes"], dtype=float),
+    }
+
+def category_codes(tables, names):
+    # Names -> indices into the compiled arrays; one dict lookup per distinct name
+    uniq, inverse = np.unique(np.asarray(names, dtype=object).astype(str), return_inverse=True)
+    index = tables["category_index"]
+    unknown = sorted(set(uniq) - set(index))
+    if unknown:
+        raise ValueError(f"Unknown categories: {unknown}")
+    return np.array([index[u] for u in uniq], dtype=np.intp)[inverse]
+
+# ==========================================================
+# 3. LOADING & HOT RELOAD
+# ==========================================================
+def _paths(path=None, region=None):
+    path = path or os.environ.get("SPRING_TABLES") or DEFAULT_PATH
+    region = region if region is not None else os.environ.get("SPRING_REGION") or None
+    overlay = f"{os.path.splitext(path)[0]}.{region}.json" if region else None
+    return path, region, overlay
+
+def _stamp(paths):
+    return tuple(os.stat(p).st_mtime_ns if os.path.exists(p) else None for p in paths if p)
+
+def load_tables(path=None, region=None):
+    path, region, overlay = _paths(path, region)
+    with open(path, encoding="utf-8") as f:
+        doc = json.load(f)
+    sources = [path]
+    if overlay:
+        with open(overlay, encoding="utf-8") as f:
+            regional = json.load(f)
+        extra = set(regional) - set(REGIONAL_KEYS) - {"version"}
+        if extra:
+            raise ValueError(f"{overlay}: only {REGIONAL_KEYS} can be regional, found {sorted(extra)}")
+        doc = {**doc, **{k: regional[k] for k in REGIONAL_KEYS if k in regional}}
+        if "version" in regional:
+            doc["version"] = f"{doc['version']}+{region}.{regional['version']}"
+        sources.append(overlay)
+    return compile_tables(validate(doc), region, sources)
+
+def on_reload(callback):
+    # callback(tables) runs after every successful (re)load, including the first.
+    # It runs under the reload lock, on whichever thread noticed the change, so
+    # anything it refreshes in place must stay readable from other threads
+    # (see spring_data._refresh).
+    if callback not in _callbacks:
+        _callbacks.append(callback)
+
+def reload(force=True):
+    # Returns the tables in use; keeps the old ones if the new files are invalid
+    path, region, overlay = _paths()
+    stamp = _stamp([path, overlay])
+    with _lock:
+        _state["checked"] = time.monotonic()
+        if not force and stamp == _state["stamp"] and _state["tables"] is not None:
+            return _state["tables"]
+        try:
+            tables = load_tables(path, region)
+        except (OSError, ValueError) as e:
+            if _state["tables"] is None:
+                raise
+            _state["error"] = f"{type(e).__name__}: {e}"
+            _state["stamp"] = stamp  # Don't retry a bad file until it changes again
+            return _state["tables"]
+        _state.update(tables=tables, stamp=stamp, error=None)
+        for callback in list(_callbacks):
+            callback(tables)
+        return tables
+
+def current():
+    tables = _state["tables"]
+    if tables is None or time.monotonic() - _state["checked"] >= RELOAD_CHECK_S:
+        return reload(force=False)
+    return tables
+
+def last_error():
+    return _state["error"]
+
+# ==========================================================
+# 4. CLI
+# ==========================================================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Validate and summarize the reference data tables.")
+    parser.add_argument("path", nargs="?", help="Data file (default: SPRING_TABLES or spring_tables.json)")
+    parser.add_argument("--region", help="Regional overlay to apply")
+    parser.add_argument("--check", action="store_true", help="Exit non-zero if the tables don't validate")
+    args = parser.parse_args(argv)
+    try:
+        tables = load_tables(args.path, args.region)
+    except (OSError, ValueError) as e:
+        print(f"Invalid: {e}")
+        raise SystemExit(1 if args.check else 0)
+    print(f"Tables {tables['version']} from {', '.join(tables['sources'])}")
+    print(f"{len(tables['category_names'])} categories, {len(tables['skill_names'])} skill levels, "
+          f"{len(tables['size_names'])} sizes, {len(tables['raw']['sprindex_data'])} Sprindex families, "
+          f"{len(tables['common_strokes'])} strokes")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,317 @@
+import atexit
+import functools
+import hashlib
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+import reference_tables
+from spring_data import SPRING_MODELS, END_COIL_FRACTION, END_COIL_SEAT_PCT
+
+# ==========================================================
+# SHARED RESULT CACHE
+# A file-backed cache (SQLite, WAL) that every Streamlit session, API
+# worker and process on the host reads and writes, so identical setups
+# (most customers sit on a category default) are computed and rendered
+# once per deployment instead of once per process.
+#
+#   SPRING_CACHE=<path>            cache file (default spring_cache.db here); "off" disables
+#   SPRING_CACHE_MAX_MB=<n>        size bound, default 256
+#   SPRING_CACHE_TTL_S=<n>         entry lifetime, default 7 days
+#
+# Keys are a hash of the namespace, the canonical inputs (metric units,
+# floats rounded to CANONICAL_DECIMALS), the reference-table fingerprint,
+# the spring force-curve models and a hash of the source of every module
+# here, so a table reload, a model change or a code change (the engine,
+# table_render.py, the app's formatting) never serves an old answer or
+# stale markup. Values are JSON. Every EVICT_EVERY_PUTS
+# writes, eviction drops expired entries, then least recently used ones
+# until the file is back under its size bound; recency is only rewritten
+# when an entry is older than TOUCH_AFTER_S, so most hits stay
+# read-only. Hit/miss counters are kept per process and added to the
+# shared totals every few seconds.
+# ==========================================================
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "spring_cache.db")
+MAX_BYTES = int(float(os.environ.get("SPRING_CACHE_MAX_MB", 256)) * 1024 * 1024)
+TTL_S = float(os.environ.get("SPRING_CACHE_TTL_S", 7 * 24 * 3600))
+CANONICAL_DECIMALS = 6
+TOUCH_AFTER_S = 60.0
+EVICT_EVERY_PUTS = 256
+FLUSH_COUNTERS_S = 5.0
+MANY_CHUNK = 500  # Keys per SELECT in get_many (SQLite caps bound parameters)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    namespace TEXT NOT NULL,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_entries_last_used ON entries (last_used);
+CREATE TABLE IF NOT EXISTS counters (
+    namespace TEXT PRIMARY KEY,
+    hits INTEGER NOT NULL DEFAULT 0,
+    misses INTEGER NOT NULL DEFAULT 0,
+    evictions INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+# ==========================================================
+# 1. KEYS
+# ==========================================================
+def _canonical(value):
+    if value is None or isinstance(value, (bool, str)):
+        return value
+    if isinstance(value, (int, float, np.integer, np.floating)):
+        v = float(value)
+        return None if math.isnan(v) else round(v, CANONICAL_DECIMALS)
+    if isinstance(value, bytes):
+        return {"sha1": hashlib.sha1(value).hexdigest()}
+    if isinstance(value, np.ndarray):
+        return [_canonical(v) for v in value.tolist()]
+    if isinstance(value, dict):
+        return {str(k): _canonical(v) for k, v in sorted(value.items())}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    if hasattr(value, "shock") and hasattr(value, "leverage"):
+        # LeverageCurve: identified by its tabulated points
+        return {"curve": hashlib.sha1(value.shock.tobytes() + value.leverage.tobytes()).hexdigest()}
+    raise TypeError(f"Can't build a cache key from {type(value).__name__}")
+
+# The force-curve models are code constants, so they are hashed once per process
+MODELS_FINGERPRINT = hashlib.sha1(json.dumps(
+    [SPRING_MODELS, END_COIL_FRACTION, END_COIL_SEAT_PCT], sort_keys=True).encode()).hexdigest()
+
+def code_fingerprint(directory=os.path.dirname(os.path.abspath(__file__))):
+    # Source of every module in directory (tests aside): cached values are
+    # whatever this code produced, so any edit to it starts new keys
+    digest = hashlib.sha1()
+    for name in sorted(os.listdir(directory)):
+        if name.endswith(".py") and not name.startswith("test_"):
+            with open(os.path.join(directory, name), "rb") as f:
+                digest.update(name.encode() + b"\0" + f.read())
+    return digest.hexdigest()
+
+CODE_FINGERPRINT = code_fingerprint()
+
+def key_context():
+    # What every key of this moment shares: the table fingerprint
+    return {"fingerprint": reference_tables.current()["fingerprint"]}
+
+def _key(namespace, context, args, kwargs):
+    doc = [CODE_FINGERPRINT, namespace, context["fingerprint"], MODELS_FINGERPRINT,
+           _canonical(args), _canonical(kwargs)]
+    return hashlib.sha1(json.dumps(doc, separators=(",", ":")).encode()).hexdigest()
+
+def cache_key(namespace, *args, **kwargs):
+    return _key(namespace, key_context(), args, kwargs)
+
+def cache_keys(namespace, rows, context=None):
+    # cache_key(namespace, row) for every row, reading the context once
+    context = key_context() if context is None else context
+    return [_key(namespace, context, (row,), {}) for row in rows]
+
+# ==========================================================
+# 2. STORE
+# ==========================================================
+class SharedCache:
+    def __init__(self, path=DEFAULT_PATH, max_bytes=MAX_BYTES, ttl_s=TTL_S):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl_s = ttl_s
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._pending = {}  # namespace -> [hits, misses, evictions] not yet written
+        self._flushed = time.monotonic()
+        self._puts = 0
+        self.hits = self.misses = self.evictions = 0  # This process
+
+    def _conn(self):
+        # One connection per thread and per process (sqlite3 connections can't cross either)
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def _count(self, namespace, slot, n=1):
+        with self._lock:
+            self._pending.setdefault(namespace, [0, 0, 0])[slot] += n
+            due = time.monotonic() - self._flushed >= FLUSH_COUNTERS_S
+        if due:
+            self.flush_counters()
+
+    def flush_counters(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._flushed = time.monotonic()
+        if pending:
+            self._conn().executemany(
+                "INSERT INTO counters (namespace, hits, misses, evictions) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(namespace) DO UPDATE SET hits = hits + excluded.hits, "
+                "misses = misses + excluded.misses, evictions = evictions + excluded.evictions",
+                [(ns, *c) for ns, c in pending.items()],
+            )
+
+    def get(self, namespace, key):
+        now = time.time()
+        row = self._conn().execute("SELECT value, created, last_used FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None or now - row[1] > self.ttl_s:
+            self.misses += 1
+            self._count(namespace, 1)
+            return None
+        if now - row[2] > TOUCH_AFTER_S:
+            self._conn().execute("UPDATE entries SET last_used = ? WHERE key = ?", (now, key))
+        self.hits += 1
+        self._count(namespace, 0)
+        return json.loads(row[0])
+
+    def get_many(self, namespace, keys):
+        # {key: value} for the live entries among keys, in a few SELECTs instead of one per key
+        now = time.time()
+        conn = self._conn()
+        found, touch = {}, []
+        for start in range(0, len(keys), MANY_CHUNK):
+            chunk = keys[start:start + MANY_CHUNK]
+            rows = conn.execute(
+                f"SELECT key, value, created, last_used FROM entries WHERE key IN ({','.join('?' * len(chunk))})",
+                chunk,
+            )
+            for key, value, created, last_used in rows:
+                if now - created > self.ttl_s:
+                    continue
+                found[key] = json.loads(value)
+                if now - last_used > TOUCH_AFTER_S:
+                    touch.append((now, key))
+        if touch:
+            conn.executemany("UPDATE entries SET last_used = ? WHERE key = ?", touch)
+        hits = sum(1 for k in set(keys) if k in found)
+        misses = len(set(keys)) - hits
+        self.hits += hits
+        self.misses += misses
+        if hits:
+            self._count(namespace, 0, hits)
+        if misses:
+            self._count(namespace, 1, misses)
+        return found
+
+    def put(self, namespace, key, value):
+        text = json.dumps(value, separators=(",", ":"))
+        now = time.time()
+        self._conn().execute(
+            "INSERT OR REPLACE INTO entries (key, namespace, value, size, created, last_used) VALUES (?, ?, ?, ?, ?, ?)",
+            (key, namespace, text, len(text), now, now),
+        )
+        with self._lock:
+            self._puts += 1
+            due = self._puts % EVICT_EVERY_PUTS == 0
+        if due:
+            self.evict()
+
+    def put_many(self, namespace, items):
+        # items: (key, value) pairs, written in one transaction
+        now = time.time()
+        rows = []
+        for key, value in items:
+            text = json.dumps(value, separators=(",", ":"))
+            rows.append((key, namespace, text, len(text), now, now))
+        if not rows:
+            return
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "INSERT OR REPLACE INTO entries (key, namespace, value, size, created, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        with self._lock:
+            before = self._puts
+            self._puts += len(rows)
+            due = self._puts // EVICT_EVERY_PUTS > before // EVICT_EVERY_PUTS
+        if due:
+            self.evict()
+
+    def evict(self):
+        conn = self._conn()
+        dropped = conn.execute("DELETE FROM entries WHERE created < ?", (time.time() - self.ttl_s,)).rowcount
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total > self.max_bytes:
+            # Oldest first until 10% under the bound, so eviction doesn't run on every put
+            target = total - int(self.max_bytes * 0.9)
+            doomed, freed = [], 0
+            for key, size in conn.execute("SELECT key, size FROM entries ORDER BY last_used"):
+                doomed.append((key,))
+                freed += size
+                if freed >= target:
+                    break
+            conn.executemany("DELETE FROM entries WHERE key = ?", doomed)
+            dropped += len(doomed)
+        if dropped:
+            self.evictions += dropped
+            self._count("*", 2, dropped)
+        return dropped
+
+    def stats(self):
+        self.flush_counters()
+        conn = self._conn()
+        entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        shared = {ns: {"hits": h, "misses": m, "evictions": e}
+                  for ns, h, m, e in conn.execute("SELECT namespace, hits, misses, evictions FROM counters")}
+        hits = sum(c["hits"] for c in shared.values())
+        misses = sum(c["misses"] for c in shared.values())
+        return {
+            "path": self.path, "entries": entries, "bytes": size, "max_bytes": self.max_bytes,
+            "hits": hits, "misses": misses, "hit_rate": hits / (hits + misses) if hits + misses else None,
+            "evictions": sum(c["evictions"] for c in shared.values()),
+            "process": {"hits": self.hits, "misses": self.misses, "evictions": self.evictions},
+            "namespaces": shared,
+        }
+
+    def clear(self):
+        self._conn().execute("DELETE FROM entries")
+
+_default = {}
+
+def default_cache():
+    # None when SPRING_CACHE=off
+    path = os.environ.get("SPRING_CACHE", DEFAULT_PATH)
+    if path.lower() in ("off", "0", "none", ""):
+        return None
+    if path not in _default:
+        _default[path] = SharedCache(path)
+        atexit.register(_default[path].flush_counters)
+    return _default[path]
+
+def shared(namespace):
+    # Decorator: look up the shared cache before calling fn(*args) and store what it returns.
+    # fn's arguments must be plain values (or LeverageCurves) and its result JSON-able.
+    def wrap(fn):
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            cache = default_cache()
+            if cache is None:
+                return fn(*args, **kwargs)
+            key = cache_key(namespace, *args, **kwargs)
+            value = cache.get(namespace, key)
+            if value is None:
+                value = fn(*args, **kwargs)
+                cache.put(namespace, key, value)
+            return value
+        return inner
+    return wrap
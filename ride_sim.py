@@ -0,0 +1,389 @@
+import argparse
+import io
+
+import numpy as np
+
+from spring_data import (
+    CATEGORY_DATA, COUPLING_COEFFS, LB_TO_KG,
+    PRELOAD_MM_PER_TURN, DEFAULT_GEAR_KG, DEFAULT_UNSPRUNG_KG, DEFAULT_SPRING_TYPE, SPRING_TYPES,
+)
+from spring_engine import compute_spring_rates, standard_spring_options
+from spring_models import equivalent_mm
+from kinematics import LeverageCurve
+
+# ==========================================================
+# RIDE SIMULATION
+# A quarter-bike model (rear sprung mass on the shock, unsprung wheel on
+# the tyre) integrated over a terrain profile, for every candidate
+# spring x preload x speed at once.
+#
+#   python ride_sim.py --rider-kg 68 --category Enduro --speeds 5 8 11 --hbo
+#
+# The suspension force at the wheel comes from the leverage curve
+# (spring force at the shock / LR), tabulated on a uniform wheel-travel
+# grid per candidate so each step is a gather and a lerp. A damper at a
+# fixed damping ratio, an optional HBO zone near bottom-out and stiff
+# end stops complete the shock; the tyre only pushes, so the wheel can
+# leave the ground off drops.
+#
+# Time stepping is sequential, so the track is cut into short segments
+# that are integrated side by side as extra rows. Each segment starts
+# from static sag a warm-up distance early, and only its own stretch is
+# scored. The suspension forgets its start state within the warm-up.
+# ==========================================================
+
+G = 9.80665
+LBF_IN_TO_N_M = 4.4482216152605 / 0.0254
+
+TRACK_DX_M = 0.01
+WHEEL_RADIUS_M = 0.37                # 29" wheel with tyre
+DEFAULT_SPEEDS = [5.0, 8.0, 11.0]   # m/s
+DEFAULT_DT = 0.001                   # s
+SEGMENT_S = 2.0
+WARMUP_S = 1.0
+REARM_PCT = 90.0                     # a new bottom-out only counts after dropping below this
+
+SIM_DEFAULTS = {
+    "damping_ratio": 0.3,        # of critical, at sag
+    "tyre_rate_n_mm": 120.0,     # MTB rear tyre at trail pressure
+    "tyre_damping_ns_m": 150.0,
+    "hbo_zone_pct": 15.0,        # last % of travel where HBO acts
+    "hbo_damping_mult": 4.0,     # extra compression damping at full travel
+    "stop_rate_n_mm": 2000.0,    # bump stop / top-out
+}
+
+# ==========================================================
+# 1. TERRAIN
+# ==========================================================
+def synthetic_track(length_m=2000.0, roots_per_100m=6.0, drops_per_km=5.0, seed=0, dx=TRACK_DX_M):
+    # Rolling ground with half-sine roots and step-down drops; elevation in m
+    rng = np.random.default_rng(seed)
+    x = np.arange(0.0, length_m + dx / 2, dx)
+    y = np.zeros_like(x)
+    for _ in range(4):
+        wavelength, amp = rng.uniform(15, 60), rng.uniform(0.05, 0.25)
+        y += amp * np.sin(2 * np.pi * x / wavelength + rng.uniform(0, 2 * np.pi))
+
+    for pos in rng.uniform(0, length_m, int(length_m / 100 * roots_per_100m)):
+        height, width = rng.uniform(0.02, 0.08), rng.uniform(0.08, 0.25)
+        inside = (x >= pos) & (x <= pos + width)
+        y[inside] += height * np.sin(np.pi * (x[inside] - pos) / width)
+
+    for pos in rng.uniform(0, length_m, int(length_m / 1000 * drops_per_km)):
+        height, ramp = rng.uniform(0.1, 0.35), 0.05
+        t = np.clip((x - pos) / ramp, 0.0, 1.0)
+        y -= height * 0.5 * (1 - np.cos(np.pi * t))
+    return x, y
+
+def read_track_csv(source):
+    # Columns: distance_m, elevation_m
+    if hasattr(source, "read"):
+        data = source.getvalue() if hasattr(source, "getvalue") else source.read()
+        source = io.StringIO(data.decode() if isinstance(data, bytes) else data)
+    table = np.genfromtxt(source, delimiter=",", names=True, dtype=float)
+    names = table.dtype.names or ()
+    if "distance_m" not in names or "elevation_m" not in names:
+        raise ValueError("Track CSV needs distance_m and elevation_m columns")
+    order = np.argsort(table["distance_m"])
+    return table["distance_m"][order], table["elevation_m"][order]
+
+def _uniform_track(distance_m, elevation_m, dx=TRACK_DX_M, wheel_radius=WHEEL_RADIUS_M):
+    # Resample, then follow the path of the wheel centre: a wheel cannot drop
+    # into gaps or climb sharp edges narrower than itself
+    x = np.arange(distance_m[0], distance_m[-1] + dx / 2, dx)
+    y = np.interp(x, distance_m, elevation_m)
+    half = int(wheel_radius / dx)
+    u = np.arange(-half, half + 1) * dx
+    lift = np.sqrt(np.maximum(wheel_radius ** 2 - u ** 2, 0.0)) - wheel_radius
+    padded = np.pad(y, half, mode="edge")
+    centre = np.full_like(y, -np.inf)
+    for k, h in enumerate(lift):  # One pass per wheel offset; no window matrix
+        np.maximum(centre, padded[k:k + len(y)] + h, out=centre)
+    return x[0], centre, np.gradient(centre, dx)
+
+# ==========================================================
+# 2. KINEMATICS TABLES
+# ==========================================================
+def _kinematics(travel_mm, stroke_mm, lr_start=None, lr_end=None, curve=None, samples=512):
+    # Uniform wheel-travel grid (m) with shock stroke (m) and leverage ratio
+    if curve is None:
+        if lr_start is None or np.isnan(lr_start):
+            lr_start = lr_end = travel_mm / stroke_mm
+        # Same convention as the engine: LR falls linearly with shock stroke used
+        shock = np.linspace(0.0, stroke_mm, samples)
+        lr = lr_start - (lr_start - lr_end) * shock / stroke_mm
+        wheel = np.concatenate([[0.0], np.cumsum(0.5 * (lr[1:] + lr[:-1]) * np.diff(shock))])
+        curve = LeverageCurve(wheel, shock, lr)
+    wheel = np.linspace(0.0, curve.travel, samples)
+    shock = np.interp(wheel, curve.wheel, curve.shock)
+    lr = np.interp(wheel, curve.wheel, curve.leverage)
+    return wheel / 1000, shock / 1000, lr
+
+def _static_travel(force_tab, wheel, load_n):
+    # First wheel position where the spring holds the load, per candidate
+    above = force_tab >= load_n
+    j = np.argmax(above, axis=1)
+    held = above.any(axis=1)
+    j0 = np.maximum(j - 1, 0)
+    f0, f1 = force_tab[np.arange(len(j)), j0], force_tab[np.arange(len(j)), j]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        frac = np.where(f1 > f0, (load_n - f0) / (f1 - f0), 0.0)
+    x = wheel[j0] + np.clip(frac, 0, 1) * (wheel[j] - wheel[j0])
+    return np.where(~held, wheel[-1], np.where(j == 0, 0.0, x))
+
+# ==========================================================
+# 3. INTEGRATOR
+# ==========================================================
+def simulate_ride(track, sprung_kg, unsprung_kg, rates, travel_mm, stroke_mm, speeds=DEFAULT_SPEEDS,
+                  preload_turns=(0.0,), lr_start=None, lr_end=None, curve=None, hbo=False, spring_type=None,
+                  dt=DEFAULT_DT, segment_s=SEGMENT_S, warmup_s=WARMUP_S, **params):
+    # track: (distance_m, elevation_m). Results have shape (speeds, rates, preloads).
+    p = {**SIM_DEFAULTS, **params}
+    rates = np.atleast_1d(np.asarray(rates, dtype=float))
+    preload_m = np.atleast_1d(np.asarray(preload_turns, dtype=float)) * PRELOAD_MM_PER_TURN / 1000
+    speeds = np.atleast_1d(np.asarray(speeds, dtype=float))
+    ms, mu = float(sprung_kg), float(unsprung_kg)
+
+    # --- Candidates: spring force at the wheel on the travel grid ---
+    wheel, shock, lr = _kinematics(travel_mm, stroke_mm, lr_start, lr_end, curve)
+    travel, n_grid = wheel[-1], len(wheel)
+    k_shock = np.repeat(rates * LBF_IN_TO_N_M, len(preload_m))
+    preload = np.tile(preload_m, len(rates))
+    # Spring compression is shock stroke + preload, through the spring's force curve
+    compression_mm = (shock[None, :] + preload[:, None]) * 1000
+    force_tab = k_shock[:, None] * equivalent_mm(compression_mm, shock[-1] * 1000, spring_type) / 1000 / lr[None, :]
+    x_eq = _static_travel(force_tab, wheel, ms * G)
+    lr_eq = np.interp(x_eq, wheel, lr)
+    c_damp = 2 * p["damping_ratio"] * np.sqrt(k_shock / lr_eq ** 2 * ms)
+    n_cand = len(k_shock)
+
+    # --- Rows: every (speed, segment) integrates side by side, one column per candidate ---
+    x0, y_tab, grad_tab = _uniform_track(*track)
+    length = (len(y_tab) - 1) * TRACK_DX_M
+    row_speed, row_start = [], []
+    for v in speeds:
+        starts = np.arange(0.0, length, v * segment_s)
+        row_speed.append(np.full(len(starts), v))
+        row_start.append(starts)
+    seg_speed, seg_start = np.concatenate(row_speed), np.concatenate(row_start)
+    seg_first = np.cumsum([0] + [len(s) for s in row_speed[:-1]])
+    n_seg = len(seg_speed)
+    rows = (n_seg, n_cand)
+
+    # Force table as [force, slope, LR, pad] per candidate and grid point, packed
+    # into 32-byte records so each step reads all three with a single gather.
+    # The last point has zero slope, so full travel needs no index clamp.
+    record = np.dtype((np.void, 32))
+    slope = np.diff(force_tab, axis=1, append=force_tab[:, -1:])
+    lr_cell = np.broadcast_to(np.append(lr[:-1], lr[-2]), force_tab.shape)
+    table = np.stack([force_tab, slope, lr_cell, np.zeros_like(force_tab)], axis=-1)
+    table = np.ascontiguousarray(table).view(record).ravel()
+
+    # Per-candidate constants laid out per row: broadcasting along the short
+    # candidate axis costs more than the arrays themselves
+    base = np.repeat((np.arange(n_cand) * n_grid)[None, :], n_seg, axis=0)
+    c_row = np.repeat(c_damp[None, :], n_seg, axis=0)
+    x_hbo = travel * (1 - p["hbo_zone_pct"] / 100)
+    hbo_row = c_row * p["hbo_damping_mult"] / (travel - x_hbo)
+    rearm = travel * REARM_PCT / 100
+    k_t, c_t = p["tyre_rate_n_mm"] * 1000, p["tyre_damping_ns_m"]
+    k_stop = p["stop_rate_n_mm"] * 1000
+    c_stop = 2 * np.sqrt(k_stop * mu)
+    tyre0 = (ms + mu) * G / k_t
+    inv_dx_w, inv_dx_g = (n_grid - 1) / travel, 1 / TRACK_DX_M
+    last_g = len(y_tab) - 2
+
+    # State: wheel travel and its rate, wheel height and speed
+    pos0 = seg_start - seg_speed * warmup_s
+    g0 = np.clip((pos0 - x0) * inv_dx_g, 0, last_g)
+    x = np.repeat(x_eq[None, :], n_seg, axis=0)
+    zu = np.repeat(np.interp(g0, np.arange(len(y_tab)), y_tab)[:, None], n_cand, axis=1)
+    xd, vu = np.zeros(rows), np.zeros(rows)
+
+    max_x = np.zeros(rows)
+    sum_x = np.zeros(rows)
+    n_scored = np.zeros(n_seg)
+    bottoms = np.zeros(rows, dtype=int)
+    peak_wheel = np.zeros(rows)
+    peak_shock = np.zeros(rows)
+    prev_bottom = np.zeros(rows, dtype=bool)
+
+    # Work buffers, reused every step
+    xc, wi, frac, f, f_shock, f_tyre, tyre, tmp, tmp2 = (np.empty(rows) for _ in range(9))
+    w_idx = np.empty(rows, dtype=np.intp)
+    cell = np.empty(rows, dtype=record)
+    cell_f, cell_slope, cell_lr = (cell.view(np.float64).reshape(rows + (4,))[..., i] for i in range(3))
+    stopped, contact, bottom, fresh, above = (np.empty(rows, dtype=bool) for _ in range(5))
+
+    warm_steps = int(round(warmup_s / dt))
+    total_steps = warm_steps + int(round(segment_s / dt))
+    for block in range(0, total_steps, 256):
+        # The ground is the same for all candidates on a segment: look it up
+        # per segment for a block of steps, then lay it out per row
+        steps = np.arange(block, min(block + 256, total_steps))
+        pos = pos0[None, :] + seg_speed[None, :] * (steps[:, None] * dt)
+        gi = np.clip((pos - x0) * inv_dx_g, 0, last_g)
+        g_idx = gi.astype(np.intp)
+        g_frac = gi - g_idx
+        ground = np.repeat((y_tab[g_idx] * (1 - g_frac) + y_tab[g_idx + 1] * g_frac + tyre0)[:, :, None], n_cand, axis=2)
+        ground_c = np.repeat((grad_tab[g_idx] * seg_speed[None, :] * c_t)[:, :, None], n_cand, axis=2)
+        on_track = pos <= x0 + length
+        all_on = on_track.all(axis=1)
+        on_col = on_track[:, :, None]
+
+        for i, step in enumerate(steps.tolist()):
+            np.maximum(x, 0.0, out=xc)
+            np.minimum(xc, travel, out=xc)
+            np.multiply(xc, inv_dx_w, out=wi)
+            np.copyto(w_idx, wi, casting="unsafe")
+            np.subtract(wi, w_idx, out=frac)
+            w_idx += base
+            np.take(table, w_idx, out=cell, mode="clip")
+            np.multiply(cell_slope, frac, out=f)
+            f += cell_f
+            np.multiply(xd, c_row, out=tmp)
+            f += tmp
+            if hbo:
+                np.subtract(x, x_hbo, out=tmp)
+                np.maximum(tmp, 0.0, out=tmp)
+                tmp *= hbo_row
+                np.maximum(xd, 0.0, out=f_shock)
+                tmp *= f_shock
+                f += tmp
+            np.multiply(f, cell_lr, out=f_shock)  # Through the shock itself; the end stops load the frame
+            np.subtract(x, xc, out=tmp)  # Past either end stop
+            np.not_equal(tmp, 0.0, out=stopped)
+            tmp *= k_stop
+            f += tmp
+            np.multiply(xd, c_stop, out=tmp)
+            tmp *= stopped
+            f += tmp
+
+            if step >= warm_steps:
+                np.greater_equal(x, travel, out=bottom)
+                np.greater(bottom, prev_bottom, out=fresh)  # bottom and not prev_bottom
+                np.greater(x, rearm, out=above)  # Stays bottomed until back below rearm
+                prev_bottom &= above
+                prev_bottom |= bottom
+                scored, wheel_f = x, f
+                if not all_on[i]:
+                    # Rows past the end of the track score nothing
+                    scored = np.multiply(x, on_col[i], out=tmp)
+                    wheel_f = np.multiply(f, on_col[i], out=tmp2)
+                    f_shock *= on_col[i]
+                    fresh &= on_col[i]
+                n_scored += on_track[i]
+                np.maximum(max_x, scored, out=max_x)
+                sum_x += scored
+                bottoms += fresh
+                np.maximum(peak_wheel, wheel_f, out=peak_wheel)
+                np.maximum(peak_shock, f_shock, out=peak_shock)
+            elif step == warm_steps - 1:
+                np.greater(x, rearm, out=prev_bottom)
+
+            np.subtract(ground[i], zu, out=tyre)
+            np.greater(tyre, 0.0, out=contact)
+            np.multiply(vu, -c_t, out=f_tyre)
+            f_tyre += ground_c[i]
+            np.multiply(tyre, k_t, out=tmp)
+            f_tyre += tmp
+            np.maximum(f_tyre, 0.0, out=f_tyre)
+            f_tyre *= contact
+
+            # Semi-implicit Euler; gravity moves body and wheel alike, so it
+            # drops out of the travel
+            np.subtract(f_tyre, f, out=tmp)
+            tmp *= dt / mu
+            np.multiply(f, dt / ms, out=tmp2)
+            xd += tmp
+            xd -= tmp2
+            tmp -= G * dt
+            vu += tmp
+            np.multiply(xd, dt, out=tmp)
+            x += tmp
+            np.multiply(vu, dt, out=tmp)
+            zu += tmp
+
+    # --- Reduce segments back to (speed, candidate) ---
+    def reduce(values, ufunc):
+        return ufunc.reduceat(values, seg_first, axis=0)
+
+    out_shape = (len(speeds), len(rates), len(preload_m))
+    static_shock = np.interp(x_eq, wheel, shock)
+    max_travel = reduce(max_x, np.maximum)
+    scored = np.maximum(reduce(n_scored, np.add), 1)[:, None]
+    return {
+        "speeds": speeds,
+        "rates": rates,
+        "preload_turns": preload_m * 1000 / PRELOAD_MM_PER_TURN,
+        "static_sag_pct": (static_shock / shock[-1] * 100).reshape(len(rates), len(preload_m)),
+        "max_travel_mm": (max_travel * 1000).reshape(out_shape),
+        "max_travel_pct": (max_travel / travel * 100).reshape(out_shape),
+        "mean_travel_pct": (reduce(sum_x, np.add) / scored / travel * 100).reshape(out_shape),
+        "bottom_outs": reduce(bottoms, np.add).astype(int).reshape(out_shape),
+        "peak_wheel_force_n": reduce(peak_wheel, np.maximum).reshape(out_shape),
+        "peak_shock_force_n": reduce(peak_shock, np.maximum).reshape(out_shape),
+    }
+
+def recommend_spring(result, max_bottom_outs=0):
+    # Softest spring (then least preload) that bottoms out at most max_bottom_outs
+    # times over all speeds; if none does, the one that bottoms out least
+    bottoms = result["bottom_outs"].sum(axis=0)
+    ok = np.argwhere(bottoms <= max_bottom_outs)
+    if len(ok):
+        return tuple(int(i) for i in ok[0])
+    return tuple(int(i) for i in np.argwhere(bottoms == bottoms.min())[-1])
+
+def sprung_mass_kg(rear_load_lbs):
+    return float(rear_load_lbs) * LB_TO_KG
+
+# ==========================================================
+# 4. CLI
+# ==========================================================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate candidate springs over a terrain profile.")
+    parser.add_argument("--rider-kg", type=float, required=True)
+    parser.add_argument("--category", required=True, choices=list(CATEGORY_DATA))
+    parser.add_argument("--gear-kg", type=float, default=DEFAULT_GEAR_KG)
+    parser.add_argument("--bike-kg", type=float, help="Default: category default")
+    parser.add_argument("--unsprung-kg", type=float, default=DEFAULT_UNSPRUNG_KG)
+    parser.add_argument("--bias-pct", type=float, help="Default: category default")
+    parser.add_argument("--sag-pct", type=float, help="Target sag, default: category default")
+    parser.add_argument("--track", help="Terrain CSV (distance_m, elevation_m); default: synthetic")
+    parser.add_argument("--length-m", type=float, default=2000.0, help="Synthetic track length")
+    parser.add_argument("--seed", type=int, default=0, help="Synthetic track seed")
+    parser.add_argument("--speeds", type=float, nargs="+", default=DEFAULT_SPEEDS, help="m/s")
+    parser.add_argument("--rates", type=float, nargs="+", help="Default: recommended ±25 lbs")
+    parser.add_argument("--preload", type=float, nargs="+", default=[0.0], help="Preload turns")
+    parser.add_argument("--hbo", action="store_true", help="Shock has hydraulic bottom out")
+    parser.add_argument("--spring-type", default=DEFAULT_SPRING_TYPE, choices=SPRING_TYPES)
+    args = parser.parse_args(argv)
+
+    d = CATEGORY_DATA[args.category]
+    bike_kg = d["bike_mass_def_kg"] if args.bike_kg is None else args.bike_kg
+    bias = d["bias"] if args.bias_pct is None else args.bias_pct
+    sag = d["base_sag"] if args.sag_pct is None else args.sag_pct
+    res = compute_spring_rates(args.rider_kg, args.gear_kg, bike_kg, args.unsprung_kg, bias,
+                               d["stroke"], d["travel"], sag, args.spring_type,
+                               COUPLING_COEFFS[args.category], turns=())
+    rates = args.rates
+    if rates is None:
+        rates, _ = standard_spring_options(res["rear_load_lbs"], res["effective_lr"], res["rounded_rate"], d["stroke"])
+        rates = rates[~np.isnan(rates)]
+    track = read_track_csv(args.track) if args.track else synthetic_track(args.length_m, seed=args.seed)
+
+    out = simulate_ride(track, sprung_mass_kg(res["rear_load_lbs"]), args.unsprung_kg, rates,
+                        d["travel"], d["stroke"], args.speeds, args.preload, hbo=args.hbo,
+                        spring_type=args.spring_type)
+    best = recommend_spring(out)
+    print(f"Track {track[0][-1] - track[0][0]:.0f} m, speeds {', '.join(f'{v:g}' for v in out['speeds'])} m/s")
+    for r, rate in enumerate(out["rates"]):
+        for q, turns in enumerate(out["preload_turns"]):
+            mark = "  <- recommended" if (r, q) == best else ""
+            print(f"{rate:6.0f} lbs +{turns:g} turns  sag {out['static_sag_pct'][r, q]:4.1f}%  "
+                  f"max travel {out['max_travel_pct'][:, r, q].max():5.1f}%  "
+                  f"bottom-outs {out['bottom_outs'][:, r, q].sum():3d}  "
+                  f"peak shock force {out['peak_shock_force_n'][:, r, q].max() / 1000:5.1f} kN{mark}")
+
+if __name__ == "__main__":
+    main()
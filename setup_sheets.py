@@ -0,0 +1,255 @@
+import argparse
+import html
+import importlib.util
+import os
+import re
+import shutil
+import tempfile
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from setups import normalize_setups, result_payloads, size_setups
+from batch import read_chunks, require_parquet
+from table_render import render_table, render_row, table_open, TABLE_CLOSE, HIGHLIGHT_RECOMMENDED
+
+# ==========================================================
+# SETUP SHEET EXPORT
+# One printable sheet per rider (inputs, recommended spring, the ±25 lbs
+# alternatives with resulting sag, the Sprindex choice and the preload
+# table), rendered from a rider file and bundled into a zip archive:
+#
+#   python setup_sheets.py riders.csv sheets.zip --event "Enduro Cup R3" --workers 4
+#   python setup_sheets.py riders.csv sheets.zip --format pdf     # needs weasyprint
+#
+# Input columns are the batch columns (setups.py) plus an optional rider,
+# name or customer column printed on the sheet. Rows are read in chunks,
+# sized in one vectorized pass per chunk and rendered by a pool of worker
+# processes; each chunk's sheets go into the archive as soon as it comes
+# back, oldest first, so sheets are in input order for any worker count
+# and memory holds only the in-flight chunks. index.html (one line per rider)
+# is written last. The archive is built aside and moved into place.
+# ==========================================================
+
+DEFAULT_CHUNK_ROWS = 200
+LABEL_COLUMNS = ["rider", "name", "customer"]
+FORMATS = ["html", "pdf"]
+INDEX_COLUMNS = ["Rider", "Category", "Spring Type", "Spring", "Sag (%)", "Sheet"]
+
+PAGE_STYLE = """
+@page { size: A4; margin: 14mm; }
+body { font-family: Helvetica, Arial, sans-serif; font-size: 10.5pt; color: #222; }
+h1 { font-size: 17pt; margin: 0 0 2mm; }
+h2 { font-size: 12pt; margin: 6mm 0 2mm; }
+.event, .note { color: #666; }
+.headline td { font-size: 12pt; }
+"""
+
+# ==========================================================
+# 1. SHEET RENDERING
+# ==========================================================
+def _fmt(value, pattern, missing="–"):
+    return missing if value is None else pattern.format(value)
+
+def _pairs_table(pairs):
+    return render_table([{"": k, " ": v} for k, v in pairs])
+
+def _sprindex_section(payload):
+    spr = payload["sprindex"]
+    status = spr["status"]
+    if status == "stroke":
+        return f'<p>Shock stroke ({payload["inputs"]["stroke_mm"]:g} mm) exceeds Sprindex maximums.</p>'
+    parts = [f"<p><b>Compatible Family:</b> {html.escape(spr['family'])}</p>"]
+    if status == "fit":
+        parts.append(f"<p><b>Perfect Fit:</b> {html.escape(spr['fit_range'])} lbs/in, "
+                     f"set to {_fmt(spr['tuning_rate'], '{:.0f}')} lbs</p>")
+    elif status == "gap":
+        parts.append(f"<p>The ideal rate ({_fmt(payload['raw_rate'], '{:.0f}')} lbs) falls in a gap between "
+                     "Sprindex ranges:</p>")
+        parts.append(render_table([
+            {"Option": "A (plusher, more grip)", "Range": spr["option_a_range"],
+             "Setting": _fmt(spr["option_a"], "{:.0f} lbs"), "Resulting Sag (%)": _fmt(spr["option_a_sag_pct"], "{:.1f}%")},
+            {"Option": "B (more support, race feel)", "Range": spr["option_b_range"],
+             "Setting": _fmt(spr["option_b"], "{:.0f} lbs"), "Resulting Sag (%)": _fmt(spr["option_b_sag_pct"], "{:.1f}%")},
+        ]))
+    else:
+        parts.append("<p>The ideal rate is outside standard Sprindex ranges.</p>")
+    if status != "fit" and spr["longer_family"]:
+        parts.append(f'<p class="note">A longer-stroke family also covers this rate: '
+                     f"{html.escape(spr['longer_family'])} {html.escape(spr['longer_range'])} lbs/in</p>")
+    return "".join(parts)
+
+def render_sheet(payload, label, event=""):
+    # payload: one setups.result_payloads() entry; returns a standalone HTML page
+    inputs = payload["inputs"]
+    stroke_mm = inputs["stroke_mm"]
+    is_sprindex = inputs["spring_type"] == "Sprindex"
+    rate = payload["recommended_rate"]
+
+    lr = ("Category default" if inputs["lr_start"] is None
+          else f"{inputs['lr_start']:.2f} → {_fmt(inputs['lr_end'], '{:.2f}')}")
+    input_rows = [
+        ("Category", inputs["category"]),
+        ("Spring Type", inputs["spring_type"]),
+        ("Rider Mass", f"{inputs['rider_kg']:.1f} kg"),
+        ("Gear Mass", f"{inputs['gear_kg']:.1f} kg"),
+        ("Bike Mass", f"{inputs['bike_kg']:.1f} kg"),
+        ("Unsprung Mass", f"{inputs['unsprung_kg']:.1f} kg"),
+        ("Rear Bias", f"{inputs['bias_pct']:.0f}%"),
+        ("Travel / Stroke", f"{inputs['travel_mm']:g} mm / {stroke_mm:g} mm"),
+        ("Leverage Ratio", lr),
+        ("Target Sag", f"{inputs['sag_pct']:.1f}% ({inputs['sag_pct'] / 100 * stroke_mm:.1f} mm)"),
+    ]
+    results = [
+        ("Rear Sprung Load", _fmt(payload["rear_load_lbs"], "{:.0f} lbs")),
+        ("Effective Leverage Ratio", _fmt(payload["effective_lr"], "{:.2f}")),
+        ("Ideal Spring Rate", _fmt(payload["raw_rate"], "{:.0f} lbs/in")),
+        ("Recommended Spring", _fmt(rate, "{:.0f} lbs/in")),
+        ("Resulting Sag", _fmt(payload["resulting_sag_pct"], "{:.1f}%")),
+    ]
+
+    if is_sprindex:
+        springs = "<h2>Sprindex Recommendation</h2>" + _sprindex_section(payload)
+    else:
+        springs = "<h2>Available Spring Options</h2>" + render_table([
+            {"Spring Rate": f"{o['rate']:.0f} lbs", "Resulting Sag (%)": _fmt(o["sag_pct"], "{:.1f}%"),
+             "Travel Usage (mm)": _fmt(o["travel_mm"], "{:.1f} mm"), "Fit": o["fit"]}
+            for o in payload["options"]
+        ], highlight=HIGHLIGHT_RECOMMENDED)
+    preload = render_table([
+        {"Turns": f"{p['turns']:g}", "Sag (%)": _fmt(p["sag_pct"], "{:.1f}%"),
+         "Sag (mm)": _fmt(p["sag_mm"], "{:.1f} mm"), "Status": p["status"]}
+        for p in payload["preload"]
+    ])
+
+    title = html.escape(label)
+    return (
+        f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>{title}</title>'
+        f"<style>{PAGE_STYLE}</style></head><body>"
+        + (f'<div class="event">{html.escape(event)}</div>' if event else "")
+        + f"<h1>{title}</h1>"
+        + "<h2>Inputs</h2>" + _pairs_table(input_rows)
+        + '<h2>Result</h2><div class="headline">' + _pairs_table(results) + "</div>"
+        + springs
+        + f"<h2>Fine Tuning (Preload)</h2><p>Effect of preload on the <b>{_fmt(rate, '{:.0f}')} lbs</b> spring"
+        + (" (option A)" if is_sprindex and payload["sprindex"]["status"] == "gap" else "") + ":</p>"
+        + preload
+        + '<p class="note">Standard coils vary ±5% in rate. Ensure spring stroke &gt; shock stroke to avoid coil '
+          "bind, and check spring ID against the shock body.</p>"
+        + "</body></html>"
+    )
+
+def sheet_name(row, label, fmt):
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", label).strip("_")[:60] or "rider"
+    return f"{row + 1:06d}_{slug}.{fmt}"
+
+# ==========================================================
+# 2. CHUNK RENDERING (runs in the workers)
+# ==========================================================
+def _labels(chunk, start):
+    column = next((c for c in LABEL_COLUMNS if c in chunk.columns), None)
+    labels = []
+    for i, v in enumerate(chunk[column].tolist() if column else [None] * len(chunk)):
+        blank = v is None or v != v or str(v).strip() == ""
+        labels.append(f"Rider {start + i + 1}" if blank else str(v).strip())
+    return labels
+
+def render_chunk(chunk, start, fmt="html", event=""):
+    # -> [(archive name, file bytes, index.html row)] for rows start, start + 1, ...
+    setup = normalize_setups({c: chunk[c].to_numpy() for c in chunk.columns}, len(chunk))
+    payloads = result_payloads(setup, size_setups(setup))
+    if fmt == "pdf":
+        from weasyprint import HTML
+    out = []
+    for i, (payload, label) in enumerate(zip(payloads, _labels(chunk, start))):
+        page = render_sheet(payload, label, event)
+        data = HTML(string=page).write_pdf() if fmt == "pdf" else page.encode("utf-8")
+        name = sheet_name(start + i, label, fmt)
+        row = {
+            "Rider": label, "Category": payload["inputs"]["category"],
+            "Spring Type": payload["inputs"]["spring_type"],
+            "Spring": _fmt(payload["recommended_rate"], "{:.0f} lbs"),
+            "Sag (%)": _fmt(payload["resulting_sag_pct"], "{:.1f}%"),
+            "Sheet": name,
+        }
+        out.append((name, data, render_row(row, INDEX_COLUMNS)))
+    return out
+
+# ==========================================================
+# 3. PIPELINE
+# ==========================================================
+def export_sheets(in_path, out_path, chunk_rows=DEFAULT_CHUNK_ROWS, workers=1, fmt="html", event=""):
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format {fmt!r}, expected one of {FORMATS}")
+    if fmt == "pdf" and importlib.util.find_spec("weasyprint") is None:
+        raise RuntimeError("PDF sheets need weasyprint (pip install weasyprint)")
+    require_parquet(in_path)
+    tmp_path = os.path.join(os.path.dirname(os.path.abspath(out_path)), f".{os.path.basename(out_path)}.tmp")
+    # PDFs are already compressed
+    compression = zipfile.ZIP_STORED if fmt == "pdf" else zipfile.ZIP_DEFLATED
+    count = 0
+
+    def write(sheets):
+        nonlocal count
+        for name, data, row in sheets:
+            archive.writestr(name, data)
+            index_rows.write(row.encode("utf-8"))
+            count += 1
+
+    try:
+        # index.html rows are spooled to disk and copied in last, so no per-rider state stays in memory
+        with zipfile.ZipFile(tmp_path, "w", compression=compression) as archive, \
+                tempfile.TemporaryFile() as index_rows:
+            start = 0
+            if workers <= 1:
+                for chunk in read_chunks(in_path, chunk_rows):
+                    write(render_chunk(chunk, start, fmt, event))
+                    start += len(chunk)
+            else:
+                # Same bounded, oldest-first window as batch.py
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+                    pending = deque()
+                    for chunk in read_chunks(in_path, chunk_rows):
+                        pending.append(pool.submit(render_chunk, chunk, start, fmt, event))
+                        start += len(chunk)
+                        if len(pending) >= workers * 2:
+                            write(pending.popleft().result())
+                    while pending:
+                        write(pending.popleft().result())
+
+            title = html.escape(event or "Setup Sheets")
+            index_rows.seek(0)
+            with archive.open("index.html", "w") as index:
+                index.write((f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>{title}</title>'
+                             f"<style>{PAGE_STYLE}</style></head><body><h1>{title}</h1><p>{count} riders</p>"
+                             + table_open(INDEX_COLUMNS)).encode("utf-8"))
+                shutil.copyfileobj(index_rows, index)
+                index.write((TABLE_CLOSE + "</body></html>").encode("utf-8"))
+        os.replace(tmp_path, out_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return count
+
+# ==========================================================
+# 4. CLI
+# ==========================================================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export one printable setup sheet per rider as a zip archive.")
+    parser.add_argument("input", help="Rider file (.csv or .parquet)")
+    parser.add_argument("output", help="Archive to write (.zip)")
+    parser.add_argument("--format", choices=FORMATS, default="html", help="pdf needs weasyprint")
+    parser.add_argument("--event", default="", help="Event name printed on every sheet")
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS, help="Riders per work unit")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes (0 = all cores)")
+    args = parser.parse_args(argv)
+
+    workers = args.workers or os.cpu_count() or 1
+    try:
+        n = export_sheets(args.input, args.output, args.chunk_rows, workers, args.format, args.event)
+    except RuntimeError as e:
+        parser.error(str(e))
+    print(f"Wrote {n} setup sheets -> {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,359 @@
+import argparse
+import csv
+import json
+import os
+import sqlite3
+import time
+
+import numpy as np
+
+from spring_data import (
+    CATEGORY_DATA, COUPLING_COEFFS, SPRING_MODELS, SPRINDEX_DATA, END_COIL_FRACTION, END_COIL_SEAT_PCT,
+    PRELOAD_MM_PER_TURN, DEFAULT_SPRING_TYPE,
+)
+from spring_engine import resulting_sag_pct
+from setups import NUMERIC_COLUMNS, CATEGORY_DEFAULT_COLUMNS, normalize_setups, size_setups
+import frame_library
+
+# ==========================================================
+# CUSTOMER SETUP STORE
+# Saved rider/bike setups in a local SQLite file, indexed by customer,
+# bike model and category, with the sizing results stored alongside.
+#
+#   python setup_store.py workshop.db import past_setups.csv
+#   python setup_store.py workshop.db refresh          # after a model update
+#   python setup_store.py workshop.db changed --out to_contact.csv
+#   python setup_store.py workshop.db find --customer "J. Smith"
+#
+# Inputs are kept as entered: a blank bike mass, bias, stroke, travel or
+# sag stays NULL and takes the category default at sizing time. A setup
+# with a frame (a frame_library.py key) is sized on that frame's leverage
+# curve; if the frame is no longer in the library, its stored travel,
+# stroke and LR columns are used instead. The store remembers the table
+# values it last sized with, one entry per dependency (each category
+# default, each coupling coefficient, each spring type's force curve, each
+# Sprindex family's ranges and the frame library build). refresh() recomputes only the rows that read
+# a changed entry, in batches, and flags those whose recommended spring
+# moved. Flags stay set until cleared.
+# ==========================================================
+
+DEFAULT_STORE = (os.environ.get("SPRING_SETUPS")
+                 or os.path.join(os.path.dirname(os.path.abspath(__file__)), "spring_setups.db"))
+REFRESH_BATCH_ROWS = 5_000
+INPUT_COLUMNS = (["customer", "bike_model", "category", "spring_type"] + NUMERIC_COLUMNS
+                 + ["spring_rate", "preload_turns", "frame"])
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS setups (
+    id INTEGER PRIMARY KEY,
+    customer TEXT NOT NULL,
+    bike_model TEXT NOT NULL DEFAULT '',
+    frame TEXT NOT NULL DEFAULT '',   -- frame library key; '' = travel/stroke/LR columns
+    category TEXT NOT NULL,
+    spring_type TEXT NOT NULL,
+    rider_kg REAL NOT NULL,
+    gear_kg REAL, bike_kg REAL, unsprung_kg REAL, bias_pct REAL,
+    stroke_mm REAL, travel_mm REAL, sag_pct REAL, lr_start REAL, lr_end REAL,
+    spring_rate REAL,                 -- spring fitted; NULL = the recommendation
+    preload_turns REAL NOT NULL DEFAULT 0,
+    saved_at TEXT NOT NULL,
+    rear_load_lbs REAL,
+    effective_lr REAL,
+    recommended_rate REAL,
+    resulting_sag_pct REAL,           -- with the fitted spring and preload
+    recommendation_changed INTEGER NOT NULL DEFAULT 0,
+    previous_rate REAL,
+    changed_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_setups_customer ON setups (customer);
+CREATE INDEX IF NOT EXISTS idx_setups_bike_model ON setups (bike_model);
+CREATE INDEX IF NOT EXISTS idx_setups_category ON setups (category, spring_type);
+CREATE INDEX IF NOT EXISTS idx_setups_changed ON setups (recommendation_changed) WHERE recommendation_changed = 1;
+CREATE TABLE IF NOT EXISTS table_versions (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+# ==========================================================
+# 1. TABLE DEPENDENCIES
+# ==========================================================
+def table_fingerprints():
+    # One entry per table value a stored setup can depend on
+    out = {f"spring_model/{name}": json.dumps([model, END_COIL_FRACTION, END_COIL_SEAT_PCT], sort_keys=True)
+           for name, model in SPRING_MODELS.items()}
+    for family, d in list(SPRINDEX_DATA.items()):
+        out[f"sprindex/{family}"] = json.dumps(d, sort_keys=True)
+    for category, d in list(CATEGORY_DATA.items()):
+        for column, key in CATEGORY_DEFAULT_COLUMNS.items():
+            out[f"category/{category}/{column}"] = json.dumps(d[key])
+        out[f"coupling/{category}"] = json.dumps(COUPLING_COEFFS[category])
+    out["frame_library"] = json.dumps(frame_library.library_stamp())
+    return out
+
+def _affected(key):
+    # SQL condition + params selecting the setups that read this entry
+    if key == "frame_library":
+        return "frame != ''", []
+    if key.startswith("sprindex/"):
+        # Family names can hold a slash; any family may be the one a stroke picks
+        return "spring_type = ?", ["Sprindex"]
+    kind, category, *column = key.split("/")
+    if kind == "spring_model":
+        return "spring_type = ?", [category]
+    if kind == "coupling":
+        return "category = ?", [category]
+    return f"(category = ? AND {column[0]} IS NULL)", [category]
+
+def stale_keys(conn):
+    current = table_fingerprints()
+    stored = dict(conn.execute("SELECT key, value FROM table_versions"))
+    # Entries that disappeared (a removed category) count as changed too
+    return sorted(k for k in set(current) | set(stored) if current.get(k) != stored.get(k))
+
+def _save_fingerprints(conn):
+    conn.execute("DELETE FROM table_versions")
+    conn.executemany("INSERT INTO table_versions (key, value) VALUES (?, ?)", table_fingerprints().items())
+
+# ==========================================================
+# 2. STORE
+# ==========================================================
+def connect(path=DEFAULT_STORE):
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    if conn.execute("SELECT COUNT(*) FROM table_versions").fetchone()[0] == 0:
+        with conn:
+            _save_fingerprints(conn)
+    return conn
+
+def _now():
+    return time.strftime("%Y-%m-%dT%H:%M:%S")
+
+def _frame_curves(frames):
+    # Frame key -> LeverageCurve for the keys the library still has
+    keys = set(frames) - {""}
+    library = frame_library.open_library() if keys else None
+    if library is None:
+        return {}
+    return {k: library.get(k)["curve"] for k in keys if k in library}
+
+def _size_rows(rows):
+    # rows: sequences in INPUT_COLUMNS order -> (rear_load, lr, recommended, sag) columns
+    cols = {name: [r[i] for r in rows] for i, name in enumerate(INPUT_COLUMNS)}
+    setup = normalize_setups(cols, len(rows))
+    fitted = np.array([np.nan if v is None else v for v in cols["spring_rate"]], dtype=float)
+    turns = np.array([v or 0.0 for v in cols["preload_turns"]], dtype=float)
+    frames = np.array([v or "" for v in cols["frame"]], dtype=object)
+
+    # One vectorized pass per leverage curve: rows without one (or whose frame is gone) together
+    curves = _frame_curves(frames)
+    groups = [(None, ~np.isin(frames, list(curves)))] + [(c, frames == k) for k, c in curves.items()]
+    out = [np.empty(len(rows)) for _ in range(4)]
+    for curve, rows_in in groups:
+        if not rows_in.any():
+            continue
+        part = setup if rows_in.all() else {k: v[rows_in] for k, v in setup.items()}
+        sized = size_setups(part, turns=(), curve=curve)
+        stroke_mm = part["stroke_mm"] if curve is None else curve.stroke
+        rate = np.where(np.isnan(fitted[rows_in]), sized["recommended_rate"], fitted[rows_in])
+        sag = resulting_sag_pct(sized["rear_load_lbs"], sized["effective_lr"], rate, stroke_mm, curve,
+                                part["spring_type"], turns[rows_in] * PRELOAD_MM_PER_TURN)
+        values = [sized["rear_load_lbs"], sized["effective_lr"], sized["recommended_rate"], sag]
+        for column, v in zip(out, values):
+            column[rows_in] = v
+    return tuple(out)
+
+def _input_row(record):
+    # A dict with INPUT_COLUMNS keys (missing / blank -> NULL) -> tuple
+    row = []
+    for name in INPUT_COLUMNS:
+        v = record.get(name)
+        if v is None or v == "" or (isinstance(v, float) and v != v):
+            v = None
+        elif name in NUMERIC_COLUMNS or name in ("spring_rate", "preload_turns"):
+            v = float(v)
+        row.append(v)
+    row[INPUT_COLUMNS.index("bike_model")] = row[INPUT_COLUMNS.index("bike_model")] or ""
+    row[INPUT_COLUMNS.index("spring_type")] = row[INPUT_COLUMNS.index("spring_type")] or DEFAULT_SPRING_TYPE
+    row[INPUT_COLUMNS.index("preload_turns")] = row[INPUT_COLUMNS.index("preload_turns")] or 0.0
+    row[INPUT_COLUMNS.index("frame")] = row[INPUT_COLUMNS.index("frame")] or ""
+    if row[0] is None:
+        raise ValueError("Every setup needs a customer")
+    return tuple(row)
+
+INSERT_SQL = (f"INSERT INTO setups ({', '.join(INPUT_COLUMNS)}, saved_at, rear_load_lbs, effective_lr, "
+              f"recommended_rate, resulting_sag_pct) VALUES ({', '.join('?' * (len(INPUT_COLUMNS) + 5))})")
+
+def _insert_values(batch):
+    # Input rows -> INSERT_SQL parameters, sized in one pass
+    load, lr, rate, sag = _size_rows(batch)
+    now = _now()
+    return [row + (now, float(a), float(b), float(c), float(d))
+            for row, a, b, c, d in zip(batch, load, lr, rate, sag)]
+
+def import_setups(conn, records, batch_rows=REFRESH_BATCH_ROWS):
+    # records: iterable of dicts; sized and inserted batch by batch. Returns the row count.
+    # Any table change not yet refreshed is picked up first, so new rows and old agree.
+    if stale_keys(conn):
+        refresh(conn, batch_rows)
+    total, batch = 0, []
+
+    def flush():
+        values = _insert_values(batch)
+        with conn:
+            conn.executemany(INSERT_SQL, values)
+
+    for record in records:
+        batch.append(_input_row(record))
+        if len(batch) == batch_rows:
+            flush()
+            total += len(batch)
+            batch = []
+    if batch:
+        flush()
+        total += len(batch)
+    return total
+
+def save_setup(conn, record):
+    # Returns the new row's id (taken from the insert itself, so other writers can't race it)
+    if stale_keys(conn):
+        refresh(conn)
+    values = _insert_values([_input_row(record)])
+    with conn:
+        return conn.execute(INSERT_SQL, values[0]).lastrowid
+
+def find_setups(conn, customer=None, bike_model=None, category=None, changed=None, limit=None):
+    where, params = [], []
+    for column, value in [("customer", customer), ("bike_model", bike_model), ("category", category)]:
+        if value is not None:
+            where.append(f"{column} = ?")
+            params.append(value)
+    if changed is not None:
+        where.append("recommendation_changed = ?")
+        params.append(int(changed))
+    sql = "SELECT * FROM setups" + (f" WHERE {' AND '.join(where)}" if where else "") + " ORDER BY id"
+    if limit:
+        sql += f" LIMIT {int(limit)}"
+    return [dict(r) for r in conn.execute(sql, params)]
+
+def clear_flags(conn, ids=None):
+    with conn:
+        if ids is None:
+            conn.execute("UPDATE setups SET recommendation_changed = 0")
+        else:
+            conn.executemany("UPDATE setups SET recommendation_changed = 0 WHERE id = ?", [(i,) for i in ids])
+
+# ==========================================================
+# 3. INCREMENTAL RECOMPUTE
+# ==========================================================
+def refresh(conn, batch_rows=REFRESH_BATCH_ROWS):
+    # Re-size only setups that read a changed table entry. Safe to rerun after an
+    # interruption: fingerprints are saved last and flags are only ever set here.
+    keys = stale_keys(conn)
+    report = {"changed_keys": keys, "recomputed": 0, "flagged": 0, "orphaned": 0}
+    if not keys:
+        return report
+
+    conditions = [_affected(k) for k in keys]
+    where = " OR ".join(c for c, _ in conditions)
+    params = [p for _, ps in conditions for p in ps]
+    known = list(CATEGORY_DATA)
+    report["orphaned"] = conn.execute(
+        f"SELECT COUNT(*) FROM setups WHERE ({where}) AND category NOT IN ({', '.join('?' * len(known))})",
+        params + known).fetchone()[0]
+
+    select = (f"SELECT id, {', '.join(INPUT_COLUMNS)}, recommended_rate FROM setups "
+              f"WHERE ({where}) AND category IN ({', '.join('?' * len(known))}) AND id > ? ORDER BY id LIMIT ?")
+    last_id = 0
+    while True:
+        rows = conn.execute(select, params + known + [last_id, batch_rows]).fetchall()
+        if not rows:
+            break
+        last_id = rows[-1]["id"]
+        load, lr, rate, sag = _size_rows([tuple(r)[1:-1] for r in rows])
+        old = np.array([np.nan if r["recommended_rate"] is None else r["recommended_rate"] for r in rows])
+        moved = ~np.isclose(rate, old)
+        now = _now()
+        with conn:
+            conn.executemany(
+                "UPDATE setups SET rear_load_lbs = ?, effective_lr = ?, recommended_rate = ?, resulting_sag_pct = ?, "
+                "recommendation_changed = CASE WHEN ? THEN 1 ELSE recommendation_changed END, "
+                "previous_rate = CASE WHEN ? THEN ? ELSE previous_rate END, "
+                "changed_at = CASE WHEN ? THEN ? ELSE changed_at END WHERE id = ?",
+                [(float(a), float(b), float(c), float(d), int(m), int(m), o, int(m), now, r["id"])
+                 for r, a, b, c, d, m, o in zip(rows, load, lr, rate, sag, moved, old.tolist())],
+            )
+        report["recomputed"] += len(rows)
+        report["flagged"] += int(moved.sum())
+
+    with conn:
+        _save_fingerprints(conn)
+    return report
+
+# ==========================================================
+# 4. CLI
+# ==========================================================
+def _read_csv(path):
+    with open(path, newline="") as f:
+        yield from csv.DictReader(f)
+
+def _write_csv(path, rows):
+    columns = list(rows[0]) if rows else ["id"] + INPUT_COLUMNS
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(rows)
+
+def _print_rows(rows):
+    for r in rows:
+        was = f" (was {r['previous_rate']:.0f})" if r["recommendation_changed"] else ""
+        print(f"{r['id']:7d}  {r['customer'][:24]:24s}  {r['bike_model'][:20]:20s}  {r['category']:10s}  "
+              f"recommended {r['recommended_rate']:.0f} lbs{was}  sag {r['resulting_sag_pct']:.1f}%")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local store of customer setups with incremental recompute.")
+    parser.add_argument("store", nargs="?", default=DEFAULT_STORE, help="SQLite file")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_import = sub.add_parser("import", help="Bulk import setups from CSV")
+    p_import.add_argument("csv", help=f"Columns: {', '.join(INPUT_COLUMNS)} (customer, rider_kg, category required)")
+    sub.add_parser("refresh", help="Recompute setups affected by table changes")
+    for name in ["find", "changed"]:
+        p = sub.add_parser(name, help="Look up setups" if name == "find" else "Setups whose recommendation moved")
+        p.add_argument("--customer")
+        p.add_argument("--bike-model")
+        p.add_argument("--category")
+        p.add_argument("--limit", type=int)
+        p.add_argument("--out", help="Write matches to CSV instead of printing")
+    p_clear = sub.add_parser("clear", help="Clear recommendation-changed flags")
+    p_clear.add_argument("ids", type=int, nargs="*", help="Default: all")
+    args = parser.parse_args(argv)
+
+    conn = connect(args.store)
+    if args.command == "import":
+        n = import_setups(conn, _read_csv(args.csv))
+        print(f"Imported {n} setups into {args.store}")
+    elif args.command == "refresh":
+        report = refresh(conn)
+        if not report["changed_keys"]:
+            print("Tables unchanged, nothing to recompute")
+        else:
+            print(f"Changed: {', '.join(report['changed_keys'])}")
+            print(f"Recomputed {report['recomputed']} setups, {report['flagged']} with a new recommended spring")
+            if report["orphaned"]:
+                print(f"{report['orphaned']} setups belong to categories no longer in CATEGORY_DATA")
+    elif args.command in ("find", "changed"):
+        rows = find_setups(conn, args.customer, args.bike_model, args.category,
+                           changed=True if args.command == "changed" else None, limit=args.limit)
+        if args.out:
+            _write_csv(args.out, rows)
+            print(f"Wrote {len(rows)} setups to {args.out}")
+        else:
+            _print_rows(rows)
+    elif args.command == "clear":
+        clear_flags(conn, args.ids or None)
+    conn.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+import math
+
+import numpy as np
+
+from spring_data import PRELOAD_TURNS, DEFAULT_GEAR_KG, DEFAULT_UNSPRUNG_KG, DEFAULT_SPRING_TYPE, SPRING_TYPES
+import reference_tables
+from spring_engine import option_fit_tags
+from calc_graph import CalcGraph
+
+# ==========================================================
+# SETUP TABLES
+# Column-oriented rider/bike setups shared by the batch CLI and the HTTP
+# API: normalize raw columns (filling the same defaults the UI uses) and
+# size every setup in one vectorized pass. No pandas.
+#
+# Required columns: rider_kg, category (a CATEGORY_DATA key).
+# Optional: gear_kg, bike_kg, unsprung_kg, bias_pct, stroke_mm,
+#           travel_mm, sag_pct, spring_type (a SPRING_TYPES name),
+#           lr_start, lr_end
+# ==========================================================
+
+NUMERIC_COLUMNS = ["rider_kg", "gear_kg", "bike_kg", "unsprung_kg", "bias_pct",
+                   "stroke_mm", "travel_mm", "sag_pct", "lr_start", "lr_end"]
+
+# Column -> CATEGORY_DATA key used when the column is missing or blank
+CATEGORY_DEFAULT_COLUMNS = {
+    "bike_kg": "bike_mass_def_kg",
+    "bias_pct": "bias",
+    "stroke_mm": "stroke",
+    "travel_mm": "travel",
+    "sag_pct": "base_sag",
+}
+
+FIXED_DEFAULTS = {
+    "gear_kg": DEFAULT_GEAR_KG,
+    "unsprung_kg": DEFAULT_UNSPRUNG_KG,
+    "lr_start": np.nan,
+    "lr_end": np.nan,
+}
+
+# ==========================================================
+# 1. NORMALIZATION
+# ==========================================================
+def _to_float(values, n):
+    if values is None:
+        return np.full(n, np.nan)
+    try:
+        return np.array(values, dtype=float).reshape(n)
+    except (TypeError, ValueError):
+        # Blank strings and other junk become NaN and take the default
+        out = np.full(n, np.nan)
+        for i, v in enumerate(values):
+            try:
+                out[i] = float(v)
+            except (TypeError, ValueError):
+                pass
+        return out
+
+def _to_str(values, n, default):
+    if values is None:
+        return np.full(n, default, dtype=object)
+    out = np.array(values, dtype=object).reshape(n)
+    blank = np.array([v is None or v != v or v == "" for v in out], dtype=bool)
+    out[blank] = default
+    return out.astype(str).astype(object)
+
+def normalize_setups(columns, n):
+    # columns: {name: sequence of length n}; unknown names are ignored
+    if columns.get("category") is None or columns.get("rider_kg") is None:
+        raise ValueError("Setups need rider_kg and category")
+
+    # Compiled tables (reference_tables.py): category names become row codes once,
+    # then every default is an array lookup
+    tables = reference_tables.current()
+    category = _to_str(columns["category"], n, "")
+    codes = reference_tables.category_codes(tables, category)
+
+    setup = {"category": category,
+             "spring_type": _to_str(columns.get("spring_type"), n, DEFAULT_SPRING_TYPE)}
+    unknown = sorted(set(setup["spring_type"]) - set(SPRING_TYPES))
+    if unknown:
+        raise ValueError(f"Unknown spring types: {unknown}")
+    for name in NUMERIC_COLUMNS:
+        setup[name] = _to_float(columns.get(name), n)
+
+    if np.isnan(setup["rider_kg"]).any():
+        raise ValueError("rider_kg must be numeric for every setup")
+    for name, key in CATEGORY_DEFAULT_COLUMNS.items():
+        setup[name] = np.where(np.isnan(setup[name]), tables["category"][key][codes], setup[name])
+    for name, default in FIXED_DEFAULTS.items():
+        setup[name] = np.where(np.isnan(setup[name]), default, setup[name])
+    setup["coupling"] = tables["coupling"][codes]
+    return setup
+
+def setup_records(setup):
+    # Back to one dict per setup (NaN lr_start/lr_end become None)
+    n = len(setup["category"])
+    keys = ["category", "spring_type"] + NUMERIC_COLUMNS
+    return [{k: _plain(setup[k][i]) for k in keys} for i in range(n)]
+
+def _plain(v):
+    if isinstance(v, str):
+        return v
+    v = float(v)
+    return None if v != v else v
+
+# ==========================================================
+# 2. SIZING
+# ==========================================================
+def setup_graph(setup, turns=PRELOAD_TURNS, curve=None):
+    # The whole table as one vectorized calculation graph (calc_graph.py); a
+    # LeverageCurve applies to every row
+    return CalcGraph(
+        rider_kg=setup["rider_kg"], gear_kg=setup["gear_kg"], bike_kg=setup["bike_kg"],
+        unsprung_kg=setup["unsprung_kg"], bias_pct=setup["bias_pct"], coupling=setup["coupling"],
+        stroke_mm=setup["stroke_mm"], travel_mm=setup["travel_mm"], target_sag=setup["sag_pct"],
+        spring_type=setup["spring_type"], lr_start=setup["lr_start"], lr_end=setup["lr_end"],
+        preload_turns=turns, curve=curve,
+    )
+
+def size_setups(setup, turns=PRELOAD_TURNS, curve=None):
+    g = setup_graph(setup, turns, curve)
+    option_rates, option_sags = g["spring_options"]
+    # Sprindex setups tune on the matched rate, everything else on the 25 lbs step
+    return {
+        "rear_load_lbs": g["rear_load_lbs"],
+        "effective_lr": g["effective_lr"],
+        "raw_rate": g["raw_rate"],
+        "is_sprindex": setup["spring_type"] == "Sprindex",
+        "recommended_rate": g["final_rate_for_tuning"],
+        "resulting_sag_pct": g["resulting_sag_pct"],
+        "option_rates": option_rates,
+        "option_sags": option_sags,
+        "option_tags": option_fit_tags(option_rates, g["rounded_rate"], option_sags),
+        "sprindex": g["sprindex"],
+        "preload_turns": np.asarray(turns, dtype=float),
+        "preload_sag_pct": g["preload_sag_pct"],
+        "preload_status": g["preload_status"],
+    }
+
+# ==========================================================
+# 3. RESULT PAYLOADS
+# ==========================================================
+def _num(v):
+    v = float(v)
+    return None if math.isnan(v) or math.isinf(v) else round(v, 3)
+
+def result_payloads(setup, sized):
+    # One JSON-ready dict per setup, mirroring what the page shows
+    records = setup_records(setup)
+    spr = sized["sprindex"]
+    turns = sized["preload_turns"]
+    stroke_mm = setup["stroke_mm"]
+    payloads = []
+    for i, record in enumerate(records):
+        options = [
+            {"rate": _num(rate), "sag_pct": _num(sag), "travel_mm": _num(sag / 100 * stroke_mm[i]), "fit": str(tag)}
+            for rate, sag, tag in zip(sized["option_rates"][i], sized["option_sags"][i], sized["option_tags"][i])
+            if not np.isnan(rate)
+        ]
+        sprindex = {k: (_num(v[i]) if isinstance(v[i], (float, np.floating)) else str(v[i])) for k, v in spr.items()}
+        preload = [
+            {"turns": float(t), "sag_pct": _num(sag), "sag_mm": _num(sag / 100 * stroke_mm[i]), "status": str(status)}
+            for t, sag, status in zip(turns, sized["preload_sag_pct"][i], sized["preload_status"][i])
+        ]
+        payloads.append({
+            "inputs": record,
+            "rear_load_lbs": _num(sized["rear_load_lbs"][i]),
+            "effective_lr": _num(sized["effective_lr"][i]),
+            "raw_rate": _num(sized["raw_rate"][i]),
+            "recommended_rate": _num(sized["recommended_rate"][i]),
+            "resulting_sag_pct": _num(sized["resulting_sag_pct"][i]),
+            "options": options,
+            "sprindex": sprindex,
+            "preload": preload,
+        })
+    return payloads
@@ -0,0 +1,119 @@
+import numpy as np
+
+from spring_data import SPRINDEX_RATE_STEP
+from spring_engine import resulting_sag_pct
+import reference_tables
+
+# ==========================================================
+# SPRINDEX RANGE MATCHER
+# SPRINDEX_DATA is parsed once per table load into sorted numeric
+# boundary arrays per family; matching is a binary search over whole arrays.
+# ==========================================================
+
+# ==========================================================
+# 1. COMPILED TABLES
+# ==========================================================
+def compile_sprindex(data):
+    families = {}
+    for name, fam_data in data.items():
+        bounds = [tuple(map(int, r_str.split("-"))) for r_str in fam_data["ranges"]]
+        lows = np.array([b[0] for b in bounds], dtype=float)
+        highs = np.array([b[1] for b in bounds], dtype=float)
+        # Binary search relies on both edges ascending (ranges may overlap)
+        if np.any(np.diff(lows) < 0) or np.any(np.diff(highs) < 0):
+            raise ValueError(f"Sprindex ranges for {name} must be sorted ascending")
+        families[name] = {
+            "max_stroke": float(fam_data["max_stroke"]),
+            "lows": lows,
+            "highs": highs,
+            "labels": np.array(fam_data["ranges"], dtype=object),
+        }
+    # Shortest stroke first: the first family that fits a stroke is the UI's choice
+    return dict(sorted(families.items(), key=lambda kv: kv[1]["max_stroke"]))
+
+def _recompile(tables):
+    # Swapped as one tuple so a match running during a table reload sees one consistent set
+    global _COMPILED
+    families = compile_sprindex(tables["raw"]["sprindex_data"])
+    _COMPILED = (families, list(families), np.array([f["max_stroke"] for f in families.values()]))
+
+reference_tables.on_reload(_recompile)
+_recompile(reference_tables.current())
+
+# ==========================================================
+# 2. MATCHING
+# ==========================================================
+def sprindex_family(stroke_mm, compiled=None):
+    # Index of the shortest family whose max stroke covers stroke_mm, -1 if none
+    max_strokes = (compiled or _COMPILED)[2]
+    idx = np.searchsorted(max_strokes, np.asarray(stroke_mm, dtype=float), side="left")
+    return np.where(idx < len(max_strokes), idx, -1)
+
+def _locate(fam, rate):
+    # k = number of ranges starting at or below rate; j = first range ending at or above it.
+    # A fit exists when j < k; otherwise ranges k-1 and k are the gap neighbours.
+    k = np.searchsorted(fam["lows"], rate, side="right")
+    j = np.searchsorted(fam["highs"], rate, side="left")
+    return j, k, j < k
+
+def match_sprindex(raw_rate, stroke_mm, rear_load=None, effective_lr=None, curve=None):
+    raw_rate, stroke_mm = np.broadcast_arrays(
+        np.asarray(raw_rate, dtype=float), np.asarray(stroke_mm, dtype=float))
+    shape = raw_rate.shape
+    families, family_names, _ = compiled = _COMPILED
+    fam_idx = sprindex_family(stroke_mm, compiled)
+
+    status = np.where(fam_idx < 0, "stroke", "outside").astype(object)
+    fit_range = np.full(shape, "", dtype=object)
+    option_a = np.full(shape, np.nan)
+    option_b = np.full(shape, np.nan)
+    option_a_range = np.full(shape, "", dtype=object)
+    option_b_range = np.full(shape, "", dtype=object)
+    longer_family = np.full(shape, "", dtype=object)
+    longer_range = np.full(shape, "", dtype=object)
+
+    for i, (name, fam) in enumerate(families.items()):
+        j, k, fits = _locate(fam, raw_rate)
+        n = len(fam["lows"])
+
+        own = fam_idx == i
+        hit = own & fits
+        status[hit] = "fit"
+        fit_range[hit] = fam["labels"][j[hit]]
+
+        gap = own & ~fits & (k > 0) & (k < n)
+        status[gap] = "gap"
+        option_a[gap] = fam["highs"][k[gap] - 1]
+        option_a_range[gap] = fam["labels"][k[gap] - 1]
+        option_b[gap] = fam["lows"][k[gap]]
+        option_b_range[gap] = fam["labels"][k[gap]]
+
+        # First longer-stroke family that fits outright (shorter strokes are always compatible)
+        longer = (fam_idx >= 0) & (i > fam_idx) & fits & (longer_family == "")
+        longer_family[longer] = name
+        longer_range[longer] = fam["labels"][j[longer]]
+
+    family = np.where(fam_idx >= 0, np.array(family_names, dtype=object)[np.maximum(fam_idx, 0)], "")
+
+    # Tuning rate follows the UI defaults: fit -> nearest 5, gap -> option A, else the raw rate
+    tuning_rate = np.select(
+        [status == "fit", status == "gap"],
+        [np.round(raw_rate / SPRINDEX_RATE_STEP) * SPRINDEX_RATE_STEP, option_a],
+        default=np.trunc(raw_rate),
+    )
+    result = {
+        "family": family,
+        "status": status,
+        "fit_range": fit_range,
+        "option_a": option_a,
+        "option_a_range": option_a_range,
+        "option_b": option_b,
+        "option_b_range": option_b_range,
+        "longer_family": longer_family,
+        "longer_range": longer_range,
+        "tuning_rate": tuning_rate,
+    }
+    if rear_load is not None and effective_lr is not None:
+        result["option_a_sag_pct"] = resulting_sag_pct(rear_load, effective_lr, option_a, stroke_mm, curve, "Sprindex")
+        result["option_b_sag_pct"] = resulting_sag_pct(rear_load, effective_lr, option_b, stroke_mm, curve, "Sprindex")
+    return result
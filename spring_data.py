@@ -0,0 +1,94 @@
+# ==========================================================
+# CONFIGURATION & DATA CONSTANTS
+# Shared by the Streamlit UI and the headless engine.
+# ==========================================================
+
+import copy
+
+import reference_tables
+
+# --- Constants ---
+LB_TO_KG = 0.453592
+KG_TO_LB = 2.20462
+IN_TO_MM = 25.4
+MM_TO_IN = 1/25.4
+STONE_TO_KG = 6.35029
+
+# Physics Tuning Constants
+STANDARD_RATE_STEP = 25  # Standard coils are sold in 25 lbs/in steps
+SPRINDEX_RATE_STEP = 5   # Sprindex is dialled to the nearest 5 lbs/in
+PRELOAD_TURNS = [0, 0.5, 1.0, 1.5, 2.0, 2.5, 3.0]
+PRELOAD_MM_PER_TURN = 1.0
+
+# UI defaults, reused by the batch paths when a column is missing
+DEFAULT_GEAR_KG = 4.0
+DEFAULT_UNSPRUNG_KG = 4.27
+DEFAULT_SPRING_TYPE = "Standard Steel (Linear)"
+
+# --- Data Tables ---
+# Loaded from the versioned data file (spring_tables.json) by
+# reference_tables.py. Other modules import these objects by name, so a
+# reload refreshes them in place instead of rebinding them; batch paths
+# use the compiled arrays from reference_tables.current() instead.
+# A reload can run on any thread that calls current(), so the refresh
+# keeps concurrent readers safe:
+#   - reloads are serialized (callbacks run under reference_tables' lock)
+#   - values are replaced whole; a nested dict a reader holds never changes
+#   - CATEGORY_DATA and SKILL_LEVELS list the names the other tables are
+#     keyed by: they lose names first and gain them last, so any name read
+#     from them is present everywhere else
+#   - readers iterate a snapshot (list(...), dict(...)), never the live dict,
+#     as the key set changes when a name is added or removed
+# Code that needs several tables from one load reads
+# reference_tables.current()["raw"], which a reload never touches.
+# NOTE: category 'bias' represents DYNAMIC ATTACK POSITION, not static seated weight.
+# Gravity bikes have higher dynamic rear load despite having steeper seat tubes.
+# Coupling approximates how 'heavy' the rider's gear feels in the system dynamics.
+CATEGORY_DATA = {}
+SKILL_MODIFIERS = {}
+SKILL_LEVELS = []
+COUPLING_COEFFS = {}
+SIZE_WEIGHT_MODS = {}
+BIKE_WEIGHT_EST = {}
+SPRINDEX_DATA = {}
+COMMON_STROKES = []
+
+def _refresh(tables):
+    raw = copy.deepcopy(tables["raw"])
+    for stale in set(CATEGORY_DATA) - set(raw["category_data"]):
+        del CATEGORY_DATA[stale]
+    SKILL_LEVELS[:] = [s for s in SKILL_LEVELS if s in raw["skill_modifiers"]]
+    for target, key in [(SKILL_MODIFIERS, "skill_modifiers"), (COUPLING_COEFFS, "coupling_coeffs"),
+                        (SIZE_WEIGHT_MODS, "size_weight_mods"), (BIKE_WEIGHT_EST, "bike_weight_est"),
+                        (SPRINDEX_DATA, "sprindex_data"), (CATEGORY_DATA, "category_data")]:
+        # Update before dropping, so a concurrent reader never sees a half-empty table
+        target.update(raw[key])
+        for stale in set(target) - set(raw[key]):
+            del target[stale]
+    SKILL_LEVELS[:] = list(raw["skill_modifiers"])
+    COMMON_STROKES[:] = raw["common_strokes"]
+
+reference_tables.on_reload(_refresh)
+_refresh(reference_tables.current())
+
+SPRING_TYPES = ["Standard Steel (Linear)", "Lightweight Steel/Ti", "Sprindex", "Progressive Coil", "Dual-Rate Coil"]
+
+# Force curve of each spring type, see spring_models.py. A progressive coil is
+# sold by its initial rate and stiffens by progression_pct over the shock
+# stroke; a dual-rate coil is sold by its main rate and starts on a soft stage
+# (soft_ratio of it) that closes after crossover_pct of the stroke. Sprindex is
+# linear at the rate it is dialled to. end_coil (0-1) is the rate lost at
+# full extension while the end coils seat, fading out over END_COIL_SEAT_PCT.
+SPRING_MODELS = {
+    "Standard Steel (Linear)": {"kind": "linear"},
+    "Lightweight Steel/Ti": {"kind": "linear"},
+    "Sprindex": {"kind": "linear"},
+    "Progressive Coil": {"kind": "progressive", "progression_pct": 20.0},
+    "Dual-Rate Coil": {"kind": "dual_rate", "soft_ratio": 0.6, "crossover_pct": 15.0},
+}
+# Default end_coil for every type (a model may set its own). It ships at 0:
+# there is no measured seating curve to calibrate it against, and any value
+# above 0 makes every linear spring nonlinear, which moves every existing
+# recommendation and invalidates stored setups and cached results.
+END_COIL_FRACTION = 0.0
+END_COIL_SEAT_PCT = 10.0
@@ -0,0 +1,179 @@
+import numpy as np
+
+from spring_data import (
+    KG_TO_LB, MM_TO_IN,
+    STANDARD_RATE_STEP, SPRINDEX_RATE_STEP, PRELOAD_TURNS, PRELOAD_MM_PER_TURN,
+)
+from spring_models import equivalent_mm, compression_mm, spring_codes
+
+# ==========================================================
+# HEADLESS SPRING-RATE ENGINE
+# Pure NumPy, no Streamlit. Every input may be a scalar or an
+# array; arrays are broadcast so a whole roster is sized in one pass.
+# Rates are quoted rates; progressive and dual-rate springs go through
+# their force curves (spring_models.py). Where only the force curve is
+# needed, spring_type may also be spring_codes(); None means linear.
+# ==========================================================
+
+# ==========================================================
+# 1. HELPER FUNCTIONS
+# ==========================================================
+def estimate_unsprung(wheel_tier, frame_mat, has_inserts):
+    base = 1.0 
+    wheels = {"Light": 1.7, "Standard": 2.3, "Heavy": 3.0}[wheel_tier]
+    swingarm = 0.4 if frame_mat == "Carbon" else 0.7
+    inserts = 0.5 if has_inserts else 0.0
+    return base + wheels + swingarm + inserts
+
+def analyze_spring_compatibility(progression_pct, has_hbo):
+    analysis = {
+        "Linear": {"status": "", "msg": ""},
+        "Progressive": {"status": "", "msg": ""}
+    }
+    if progression_pct > 25:
+        analysis["Linear"]["status"] = "✅ Optimal"
+        analysis["Linear"]["msg"] = "Matches frame kinematics perfectly."
+        analysis["Progressive"]["status"] = "⚠️ Avoid"
+        analysis["Progressive"]["msg"] = "Risk of harsh 'Wall Effect' at bottom-out."
+    elif 12 <= progression_pct <= 25:
+        analysis["Linear"]["status"] = "✅ Compatible"
+        analysis["Linear"]["msg"] = "Use for a consistent, planted, and plush coil feel."
+        analysis["Progressive"]["status"] = "✅ Compatible"
+        analysis["Progressive"]["msg"] = "Use for more 'pop' and extra bottom-out resistance (Air-shock feel)."
+        if has_hbo:
+            analysis["Linear"]["msg"] += " (HBO handles the bottom-out)."
+    else:
+        analysis["Linear"]["status"] = "⚠️ Caution"
+        analysis["Linear"]["msg"] = "High risk of harsh bottom-outs unless shock has strong HBO."
+        analysis["Progressive"]["status"] = "✅ Optimal"
+        analysis["Progressive"]["msg"] = "Essential to compensate for the frame's lack of ramp-up."
+    return analysis
+
+# ==========================================================
+# 2. VECTORIZED PHYSICS
+# ==========================================================
+def _as_float(x):
+    # None means "not supplied" (e.g. no advanced kinematics) and becomes NaN
+    return np.asarray(np.nan if x is None else x, dtype=float)
+
+def effective_leverage(travel_mm, stroke_mm, lr_start, lr_end, target_sag):
+    # Rows without lr_start (NaN) fall back to the mean ratio travel/stroke
+    travel_mm, stroke_mm = _as_float(travel_mm), _as_float(stroke_mm)
+    lr_start, lr_end = _as_float(lr_start), _as_float(lr_end)
+    target_sag = _as_float(target_sag)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean_lr = travel_mm / stroke_mm
+    linear_lr = lr_start - ((lr_start - lr_end) * (target_sag / 100))
+    return np.where(np.isnan(lr_start), mean_lr, linear_lr)
+
+# The single steps below are also the nodes of calc_graph.py
+def eff_rider_kg(rider_kg, gear_kg, coupling):
+    return _as_float(rider_kg) + (_as_float(gear_kg) * _as_float(coupling))
+
+def rear_load_kg(system_kg, bias_pct, unsprung_kg):
+    return (_as_float(system_kg) * (_as_float(bias_pct) / 100)) - _as_float(unsprung_kg)
+
+def rear_load_lbs(rider_kg, gear_kg, bike_kg, unsprung_kg, bias_pct, coupling):
+    system_kg = eff_rider_kg(rider_kg, gear_kg, coupling) + _as_float(bike_kg)
+    return rear_load_kg(system_kg, bias_pct, unsprung_kg) * KG_TO_LB
+
+def sag_mm(stroke_mm, target_sag):
+    return _as_float(stroke_mm) * (_as_float(target_sag) / 100)
+
+def rate_for_sag_mm(rear_load, effective_lr, sag_mm, spring_type, stroke_mm):
+    # The spring's force at sag_mm has to carry rear_load through effective_lr
+    spring_mm = equivalent_mm(sag_mm, stroke_mm, spring_type)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return (rear_load * effective_lr) / (spring_mm * MM_TO_IN)
+
+def round_rate(raw_rate, spring_type):
+    # Sprindex dials in 5 lbs steps, coils are sold in 25 lbs steps
+    step = np.where(np.asarray(spring_type) == "Sprindex", SPRINDEX_RATE_STEP, STANDARD_RATE_STEP)
+    return np.round(raw_rate / step) * step
+
+def resulting_sag_pct(rear_load, effective_lr, rate, stroke_mm, curve=None, spring_type=None, preload_mm=0.0):
+    # Static sag (% of stroke) produced by a given spring rate.
+    # With a LeverageCurve (kinematics.py) the equilibrium is solved on the real curve.
+    # Preload pre-compresses the spring, so shock sag = spring compression - preload.
+    if curve is not None:
+        return curve.sag_pct(rear_load, rate, preload_mm, spring_type=spring_type)
+    stroke_mm = _as_float(stroke_mm)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        linear_mm = (rear_load * effective_lr) / (_as_float(rate) * MM_TO_IN)
+        return ((compression_mm(linear_mm, stroke_mm, spring_type) - preload_mm) / stroke_mm) * 100
+
+def preload_sag_pct(rear_load, effective_lr, rate, stroke_mm, turns=PRELOAD_TURNS, curve=None, spring_type=None):
+    # Returns shape (..., len(turns)): sag after each preload setting
+    preload_mm = np.asarray(turns, dtype=float) * PRELOAD_MM_PER_TURN
+    if spring_type is not None:
+        spring_type = np.asarray(spring_type)[..., np.newaxis]
+    return resulting_sag_pct(
+        np.asarray(rear_load, dtype=float)[..., np.newaxis],
+        np.asarray(effective_lr, dtype=float)[..., np.newaxis],
+        _as_float(rate)[..., np.newaxis],
+        None if curve is not None else _as_float(stroke_mm)[..., np.newaxis],
+        curve, spring_type, preload_mm,
+    )
+
+def preload_status_tags(sags, turns=PRELOAD_TURNS):
+    # Same shape as preload_sag_pct(): 3+ turns is excessive, < 25% sag too stiff
+    turns = np.asarray(turns, dtype=float)
+    return np.select([turns >= 3.0, sags < 25], ["⚠️ Excessive", "⚠️ Too Stiff"], default="✅")
+
+def compute_spring_rates(rider_kg, gear_kg, bike_kg, unsprung_kg, bias_pct,
+                         stroke_mm, travel_mm, target_sag, spring_type, coupling,
+                         lr_start=None, lr_end=None, turns=PRELOAD_TURNS, curve=None):
+    # A LeverageCurve overrides travel/stroke/lr_start/lr_end with the frame's real curve
+    if curve is not None:
+        stroke_mm, travel_mm = curve.stroke, curve.travel
+    stroke_mm = _as_float(stroke_mm)
+    target_sag = _as_float(target_sag)
+    spring_type = np.asarray(spring_type)
+
+    if curve is not None:
+        effective_lr = curve.leverage_at(stroke_mm * (target_sag / 100))
+    else:
+        effective_lr = effective_leverage(travel_mm, stroke_mm, lr_start, lr_end, target_sag)
+    rear_load = rear_load_lbs(rider_kg, gear_kg, bike_kg, unsprung_kg, bias_pct, coupling)
+
+    sag = sag_mm(stroke_mm, target_sag)
+    codes = spring_codes(spring_type)
+    raw_rate = rate_for_sag_mm(rear_load, effective_lr, sag, codes, stroke_mm)
+    rounded_rate = round_rate(raw_rate, spring_type)
+
+    return {
+        "rear_load_lbs": rear_load,
+        "effective_lr": effective_lr,
+        "sag_mm": sag,
+        "raw_rate": raw_rate,
+        "rounded_rate": rounded_rate,
+        "resulting_sag_pct": resulting_sag_pct(rear_load, effective_lr, rounded_rate, stroke_mm, curve, codes),
+        "preload_sag_pct": preload_sag_pct(rear_load, effective_lr, rounded_rate, stroke_mm, turns, curve, codes),
+    }
+
+# ==========================================================
+# 3. SPRING OPTIONS
+# ==========================================================
+def standard_spring_options(rear_load, effective_lr, center_rate, stroke_mm, step=STANDARD_RATE_STEP, curve=None,
+                            spring_type=None):
+    # Rates are (..., 3): softer / recommended / stiffer. Non-positive rates become NaN.
+    center_rate = _as_float(center_rate)[..., np.newaxis]
+    rates = center_rate + np.array([-step, 0, step], dtype=float)
+    rates = np.where(rates > 0, rates, np.nan)
+    sags = resulting_sag_pct(
+        np.asarray(rear_load, dtype=float)[..., np.newaxis],
+        np.asarray(effective_lr, dtype=float)[..., np.newaxis],
+        rates,
+        _as_float(stroke_mm)[..., np.newaxis],
+        curve,
+        None if spring_type is None else np.asarray(spring_type)[..., np.newaxis],
+    )
+    return rates, sags
+
+def option_fit_tags(rates, center_rate, sags):
+    center_rate = _as_float(center_rate)[..., np.newaxis]
+    return np.select(
+        [rates == center_rate, sags > 35, sags < 25],
+        ["✅ Recommended", "⚠️ Too Soft", "⚠️ Too Stiff"],
+        default="Alternative",
+    )
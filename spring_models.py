@@ -0,0 +1,159 @@
+import argparse
+from functools import lru_cache
+
+import numpy as np
+
+from spring_data import MM_TO_IN, SPRING_TYPES, SPRING_MODELS, END_COIL_FRACTION, END_COIL_SEAT_PCT
+
+# ==========================================================
+# NONLINEAR SPRING MODELS
+# Force vs compression for every spring type (SPRING_MODELS), written as
+#
+#   force (lbs) = rate (lbs/in) * equivalent_mm(compression) * MM_TO_IN
+#
+# equivalent_mm is the compression a linear spring of the quoted rate
+# needs for the same force: the identity for linear springs, so solvers
+# that used rate * compression swap it in unchanged. Shapes are stored
+# per unit of shock stroke and tabulated once per spring type on an even
+# grid, together with their inverse (force -> compression) on an even
+# grid of force, so both directions are an index computation plus one
+# linear interpolation: sag and preload sag for a whole batch need no
+# root finding. Past the tables the end slopes carry on linearly.
+#
+#   python spring_models.py --rate 450 --stroke 62.5
+# ==========================================================
+
+TABLE_SAMPLES = 4097
+TABLE_SPAN = 2.0  # In strokes; covers preload plus a bottomed-out spring
+
+# ==========================================================
+# 1. SHAPES
+# ==========================================================
+def stiffness_ratio(u, kind, end_coil=0.0, **params):
+    # Local rate / quoted rate at compression u (fraction of the stroke)
+    u = np.asarray(u, dtype=float)
+    if kind == "linear":
+        ratio = np.ones_like(u)
+    elif kind == "progressive":
+        ratio = 1 + params["progression_pct"] / 100 * u
+    elif kind == "dual_rate":
+        ratio = np.where(u < params["crossover_pct"] / 100, params["soft_ratio"], 1.0)
+    else:
+        raise ValueError(f"Unknown spring model {kind!r}")
+    return ratio * (1 - end_coil * np.clip(1 - u / (END_COIL_SEAT_PCT / 100), 0.0, 1.0))
+
+def _lookup(x, step, table, slope_lo, slope_hi):
+    # table sampled at 0, step, 2 * step, ...; linear beyond both ends, NaN stays NaN
+    x = np.asarray(x, dtype=float)
+    pos = x / step
+    last = len(table) - 1
+    i = np.clip(np.nan_to_num(np.floor(pos), nan=0.0, posinf=last - 1, neginf=0.0), 0, last - 1).astype(np.intp)
+    with np.errstate(invalid="ignore"):
+        inside = table[i] + (table[i + 1] - table[i]) * (pos - i)
+        return np.where(x > last * step, table[last] + slope_hi * (x - last * step),
+                        np.where(x < 0, slope_lo * x, inside))
+
+class SpringShape:
+    def __init__(self, kind, end_coil=0.0, **params):
+        self.kind = kind
+        u = np.linspace(0.0, TABLE_SPAN, TABLE_SAMPLES)
+        ratio = stiffness_ratio(u, kind, end_coil, **params)
+        if np.any(ratio <= 0):
+            raise ValueError(f"{kind} spring model must have a positive rate everywhere")
+        self.step = u[1]
+        self.ratio_start, self.ratio_end = float(ratio[0]), float(ratio[-1])
+        # Equivalent compression is the integral of the stiffness ratio
+        self.equivalent = np.concatenate([[0.0], np.cumsum(0.5 * (ratio[1:] + ratio[:-1]) * self.step)])
+        self.inverse_step = self.equivalent[-1] / (TABLE_SAMPLES - 1)
+        self.inverse = np.interp(np.arange(TABLE_SAMPLES) * self.inverse_step, self.equivalent, u)
+
+    def equivalent_of(self, u):
+        return _lookup(u, self.step, self.equivalent, self.ratio_start, self.ratio_end)
+
+    def compression_of(self, equivalent):
+        return _lookup(equivalent, self.inverse_step, self.inverse, 1 / self.ratio_start, 1 / self.ratio_end)
+
+@lru_cache(maxsize=None)
+def spring_shape(spring_type):
+    # None when the spring is exactly linear (also for unknown names)
+    params = dict(SPRING_MODELS.get(spring_type, {"kind": "linear"}))
+    params.setdefault("end_coil", END_COIL_FRACTION)
+    if params["kind"] == "linear" and params["end_coil"] == 0:
+        return None
+    return SpringShape(**params)
+
+MODEL_NAMES = list(SPRING_MODELS)
+
+@lru_cache(maxsize=1)
+def _nonlinear_codes():
+    return [i for i, name in enumerate(MODEL_NAMES) if spring_shape(name) is not None]
+
+def spring_codes(spring_type):
+    # Names -> indices into SPRING_MODELS, -1 for linear springs; batch paths convert once
+    names = np.asarray(spring_type)
+    if names.dtype.kind in "iu":
+        return names
+    codes = np.full(names.shape, -1, dtype=np.int8)
+    for i in _nonlinear_codes():
+        codes[names == MODEL_NAMES[i]] = i
+    return codes
+
+# ==========================================================
+# 2. VECTORIZED CONVERSIONS
+# ==========================================================
+def _convert(method, values_mm, stroke_mm, spring_type):
+    # spring_type: names or spring_codes(); None means linear
+    values_mm = np.asarray(values_mm, dtype=float)
+    if spring_type is None:
+        return values_mm
+    codes = spring_codes(spring_type)
+    stroke_mm = np.asarray(stroke_mm, dtype=float)
+    if codes.size == 1:
+        # One type for the whole batch
+        code = int(codes.flat[0])
+        if code < 0:
+            return values_mm
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return getattr(spring_shape(MODEL_NAMES[code]), method)(values_mm / stroke_mm) * stroke_mm
+    # Mixed batch: only the rows of nonlinear types are converted
+    values_mm, stroke_mm, codes = np.broadcast_arrays(values_mm, stroke_mm, codes)
+    out = None
+    for i in _nonlinear_codes():
+        rows = codes == i
+        if rows.any():
+            out = values_mm.copy() if out is None else out
+            shape = spring_shape(MODEL_NAMES[i])
+            with np.errstate(divide="ignore", invalid="ignore"):
+                out[rows] = getattr(shape, method)(values_mm[rows] / stroke_mm[rows]) * stroke_mm[rows]
+    return values_mm if out is None else out
+
+def equivalent_mm(compression_mm, stroke_mm, spring_type):
+    # Compression of a linear spring of the same quoted rate carrying the same force
+    return _convert("equivalent_of", compression_mm, stroke_mm, spring_type)
+
+def compression_mm(equivalent, stroke_mm, spring_type):
+    # Inverse of equivalent_mm: the real compression for a linear-spring compression
+    return _convert("compression_of", equivalent, stroke_mm, spring_type)
+
+def spring_force_lbs(rate, compression, stroke_mm, spring_type):
+    return np.asarray(rate, dtype=float) * equivalent_mm(compression, stroke_mm, spring_type) * MM_TO_IN
+
+# ==========================================================
+# 3. CLI
+# ==========================================================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Print the force curve of every spring type.")
+    parser.add_argument("--rate", type=float, default=450.0, help="Quoted rate (lbs/in)")
+    parser.add_argument("--stroke", type=float, default=62.5, help="Shock stroke (mm)")
+    parser.add_argument("--steps", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    compression = np.linspace(0.0, args.stroke, args.steps + 1)
+    width = max(len(t) for t in SPRING_TYPES)
+    print("Compression (mm)  " + "  ".join(f"{t:>{width}s}" for t in SPRING_TYPES))
+    for x in compression:
+        forces = [float(spring_force_lbs(args.rate, x, args.stroke, t)) for t in SPRING_TYPES]
+        print(f"{x:16.1f}  " + "  ".join(f"{f:{width - 3}.0f} lb" for f in forces))
+
+if __name__ == "__main__":
+    main()
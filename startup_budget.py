@@ -0,0 +1,94 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# ==========================================================
+# STARTUP BUDGET
+# Measures the first script run of app.py in a fresh interpreter, the
+# way a newly scaled container serves its first request, and fails when
+# it goes over budget.
+#
+#   python startup_budget.py --runs 5
+# ==========================================================
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+
+# Cold start = interpreter start -> end of the first rerun (imports included)
+STARTUP_BUDGET = {
+    "seconds": 1.5,
+    "peak_rss_mb": 120,
+}
+
+# Runs in a child process so every measurement starts cold
+_PROBE = r"""
+import json, resource, sys, time
+t0 = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file(sys.argv[1], default_timeout=60).run()
+elapsed = time.perf_counter() - t0
+print(json.dumps({
+    "seconds": elapsed,
+    "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "pandas_loaded": "pandas" in sys.modules,
+    "exception": [str(e.value) for e in at.exception],
+}))
+"""
+
+def measure_once(app_path=APP_PATH):
+    out = subprocess.run(
+        [sys.executable, "-c", _PROBE, app_path],
+        capture_output=True, text=True,
+    )
+    if out.returncode != 0:
+        # The probe itself failed (missing streamlit, app import error, ...)
+        return {"error": f"probe exited with {out.returncode}: {out.stderr.strip() or 'no output'}"}
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+def measure(runs=3, app_path=APP_PATH):
+    samples = []
+    for _ in range(runs):
+        samples.append(measure_once(app_path))
+        if "error" in samples[-1]:
+            return samples[-1]
+    return {
+        "seconds": statistics.median(s["seconds"] for s in samples),
+        "peak_rss_mb": statistics.median(s["peak_rss_mb"] for s in samples),
+        "pandas_loaded": any(s["pandas_loaded"] for s in samples),
+        "exception": samples[0]["exception"],
+    }
+
+def over_budget(result, budget=STARTUP_BUDGET):
+    if "error" in result:
+        return [result["error"]]
+    problems = [f"{k} {result[k]:.2f} > {limit}" for k, limit in budget.items() if result[k] > limit]
+    if result["pandas_loaded"]:
+        problems.append("pandas imported during the first run")
+    if result["exception"]:
+        problems.append(f"app raised: {result['exception']}")
+    return problems
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check the app's cold-start time and memory budget.")
+    parser.add_argument("--runs", type=int, default=3, help="Cold starts to take the median of")
+    parser.add_argument("--json", action="store_true", help="Print the result as JSON")
+    args = parser.parse_args(argv)
+
+    result = measure(args.runs)
+    problems = over_budget(result)
+    if args.json:
+        print(json.dumps({**result, "budget": STARTUP_BUDGET, "problems": problems}))
+    elif "error" in result:
+        print(f"PROBE FAILED: {result['error']}")
+    else:
+        print(f"First run: {result['seconds']:.2f} s (budget {STARTUP_BUDGET['seconds']} s), "
+              f"peak RSS {result['peak_rss_mb']:.0f} MB (budget {STARTUP_BUDGET['peak_rss_mb']} MB), "
+              f"pandas loaded: {result['pandas_loaded']}")
+        for p in problems:
+            print(f"OVER BUDGET: {p}")
+    sys.exit(1 if problems else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+import argparse
+import csv
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from spring_data import (
+    CATEGORY_DATA, COUPLING_COEFFS, SKILL_MODIFIERS, SKILL_LEVELS,
+    DEFAULT_GEAR_KG, DEFAULT_UNSPRUNG_KG, DEFAULT_SPRING_TYPE,
+)
+from spring_engine import compute_spring_rates
+import reference_tables
+
+# ==========================================================
+# PARAMETER SWEEP
+# Evaluates raw_rate, the recommended (rounded) rate and the resulting
+# sag over a Cartesian grid per category, for publishing spring charts.
+#
+#   python sweep.py charts/ --categories Enduro Trail --workers 4
+#
+# Grid axes (in result-array order):
+#   rider_kg x gear_kg x bias_pct x skill x target_sag x stroke_mm
+# The skill axis applies each SKILL_MODIFIERS bias offset on top of
+# bias_pct. Each category is sharded along the stroke axis; every shard
+# is one broadcast NumPy evaluation, so there are no nested loops. The
+# skill and stroke axes follow the reference tables and are rebuilt in
+# place when they are reloaded.
+# ==========================================================
+
+SWEEP_AXES = {
+    "rider_kg": np.arange(40.0, 130.0 + 1e-9, 2.5),
+    "gear_kg": np.arange(0.0, 10.0 + 1e-9, 2.0),
+    "bias_pct": np.arange(55.0, 85.0 + 1e-9, 2.5),
+    "target_sag": np.arange(20.0, 40.0 + 1e-9, 1.0),
+    "stroke_mm": np.array([], dtype=float),
+}
+# The same list as spring_data.SKILL_LEVELS, so it never names a skill
+# SKILL_MODIFIERS has already dropped
+SKILL_AXIS = SKILL_LEVELS
+
+def _refresh_axes(tables):
+    # A single store to a key that already exists, safe for concurrent readers
+    SWEEP_AXES["stroke_mm"] = np.array(tables["raw"]["common_strokes"], dtype=float)
+
+reference_tables.on_reload(_refresh_axes)
+_refresh_axes(reference_tables.current())
+RESULT_KEYS = ["raw_rate", "recommended_rate", "resulting_sag_pct"]
+
+# ==========================================================
+# 1. GRID EVALUATION
+# ==========================================================
+def sweep_grid(category, rider_kg, gear_kg, bias_pct, target_sag, stroke_mm, skills=None,
+               bike_kg=None, unsprung_kg=DEFAULT_UNSPRUNG_KG, travel_mm=None,
+               spring_type=DEFAULT_SPRING_TYPE, lr_start=None, lr_end=None, curve=None):
+    # 1-D axes in; arrays of shape (rider, gear, bias, skill, sag, stroke) out
+    d = CATEGORY_DATA[category]
+    skills = list(SKILL_AXIS) if skills is None else skills
+    bike_kg = d["bike_mass_def_kg"] if bike_kg is None else bike_kg
+    travel_mm = d["travel"] if travel_mm is None else travel_mm
+    offsets = np.array([SKILL_MODIFIERS[s]["bias"] for s in skills], dtype=float)
+
+    rider = np.asarray(rider_kg, dtype=float).reshape(-1, 1, 1, 1, 1, 1)
+    gear = np.asarray(gear_kg, dtype=float).reshape(1, -1, 1, 1, 1, 1)
+    bias = (np.asarray(bias_pct, dtype=float).reshape(-1, 1) + offsets).reshape(1, 1, -1, len(offsets), 1, 1)
+    sag = np.asarray(target_sag, dtype=float).reshape(1, 1, 1, 1, -1, 1)
+    stroke = np.asarray(stroke_mm, dtype=float).reshape(1, 1, 1, 1, 1, -1)
+
+    res = compute_spring_rates(
+        rider, gear, bike_kg, unsprung_kg, bias, stroke, travel_mm, sag, spring_type,
+        COUPLING_COEFFS[category], lr_start=lr_start, lr_end=lr_end, turns=(), curve=curve,
+    )
+    shape = np.broadcast_shapes(rider.shape, gear.shape, bias.shape, sag.shape, stroke.shape)
+    return {
+        "raw_rate": np.broadcast_to(res["raw_rate"], shape),
+        "recommended_rate": np.broadcast_to(res["rounded_rate"], shape),
+        "resulting_sag_pct": np.broadcast_to(res["resulting_sag_pct"], shape),
+    }
+
+def _sweep_shard(args):
+    category, axes, skills, stroke_idx, bike = args
+    res = sweep_grid(category, axes["rider_kg"], axes["gear_kg"], axes["bias_pct"], axes["target_sag"],
+                     axes["stroke_mm"][stroke_idx], skills, **bike)
+    return category, stroke_idx, {k: v.astype(np.float32) for k, v in res.items()}
+
+def run_sweep(categories, axes=None, workers=1, skills=None, **bike):
+    # Returns {category: {result key: float32 array}}; one shard per (category, stroke).
+    # axes default to SWEEP_AXES and skills to SKILL_AXIS, read once so a table reload
+    # mid-sweep can't change the skill axis between shards. Save with the same skills.
+    axes = {k: np.asarray(v, dtype=float) for k, v in (SWEEP_AXES if axes is None else axes).items()}
+    skills = list(SKILL_AXIS if skills is None else skills)
+    shape = tuple(len(axes[k]) for k in ["rider_kg", "gear_kg", "bias_pct"]) + (len(skills),) + (
+        len(axes["target_sag"]), len(axes["stroke_mm"]))
+    out = {c: {k: np.empty(shape, dtype=np.float32) for k in RESULT_KEYS} for c in categories}
+    jobs = [(c, axes, skills, slice(i, i + 1), bike) for c in categories for i in range(len(axes["stroke_mm"]))]
+
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            shards = pool.map(_sweep_shard, jobs, chunksize=max(1, len(jobs) // (workers * 4)))
+            for category, idx, res in shards:
+                for k in RESULT_KEYS:
+                    out[category][k][..., idx] = res[k]
+    else:
+        for job in jobs:
+            category, idx, res = _sweep_shard(job)
+            for k in RESULT_KEYS:
+                out[category][k][..., idx] = res[k]
+    return out
+
+# ==========================================================
+# 2. SENSITIVITY
+# ==========================================================
+SENSITIVITY_STEPS = [
+    ("Rider +1 kg", "rider_kg", 1.0),
+    ("Gear +1 kg", "gear_kg", 1.0),
+    ("Bike +1 kg", "bike_kg", 1.0),
+    ("Rear Bias +1%", "bias_pct", 1.0),
+    ("Target Sag +1%", "target_sag", 1.0),
+    ("Stroke +2.5 mm", "stroke_mm", 2.5),
+]
+
+def rate_sensitivity(setup, category, spring_type=DEFAULT_SPRING_TYPE, lr_start=None, lr_end=None, curve=None):
+    # Change in raw rate for one step of each input, all steps in one broadcast call.
+    # setup: rider_kg, gear_kg, bike_kg, unsprung_kg, bias_pct, target_sag, stroke_mm, travel_mm
+    steps = [s for s in SENSITIVITY_STEPS if not (curve is not None and s[1] == "stroke_mm")]
+    cols = {k: np.full(len(steps) + 1, float(v)) for k, v in setup.items()}
+    for i, (_, key, delta) in enumerate(steps, start=1):
+        cols[key][i] += delta
+    res = compute_spring_rates(
+        cols["rider_kg"], cols["gear_kg"], cols["bike_kg"], cols["unsprung_kg"], cols["bias_pct"],
+        cols["stroke_mm"], cols["travel_mm"], cols["target_sag"], spring_type, COUPLING_COEFFS[category],
+        lr_start=lr_start, lr_end=lr_end, turns=(), curve=curve,
+    )
+    base = res["raw_rate"][0]
+    return [
+        {"label": label, "delta_rate": float(rate - base), "delta_pct": float((rate - base) / base * 100)}
+        for (label, _, _), rate in zip(steps, res["raw_rate"][1:])
+    ]
+
+# ==========================================================
+# 3. OUTPUT
+# ==========================================================
+def chart_skill(skills):
+    # The skill a chart is drawn for: the first with no bias offset (the bias as
+    # given), else the first one. Skills the tables have since dropped are passed over.
+    return next((s for s in skills if SKILL_MODIFIERS.get(s, {}).get("bias") == 0), skills[0])
+
+def _slug(category):
+    return re.sub(r"[^a-z0-9]+", "_", category.lower()).strip("_")
+
+def save_sweep(out_dir, category, axes, result, skills, gear_kg=DEFAULT_GEAR_KG, skill=None):
+    # Full grid as .npz, plus a printable chart CSV (stroke, rider -> rate per target sag)
+    # at the category default bias, the given gear mass and skill (default: chart_skill).
+    # skills is the skill axis the result was swept over (run_sweep's skills).
+    skill = chart_skill(skills) if skill is None else skill
+    if skill not in skills:
+        raise ValueError(f"Skill {skill!r} is not on the swept skill axis {skills}")
+    os.makedirs(out_dir, exist_ok=True)
+    slug = _slug(category)
+    np.savez(os.path.join(out_dir, f"{slug}.npz"), skills=np.array(skills),
+             **{f"axis_{k}": v for k, v in axes.items()}, **result)
+
+    gi = int(np.abs(axes["gear_kg"] - gear_kg).argmin())
+    bi = int(np.abs(axes["bias_pct"] - CATEGORY_DATA[category]["bias"]).argmin())
+    si = skills.index(skill)
+    chart = result["recommended_rate"][:, gi, bi, si, :, :]
+    with open(os.path.join(out_dir, f"{slug}_chart.csv"), "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["stroke_mm", "rider_kg"] + [f"sag_{s:g}" for s in axes["target_sag"]])
+        for k, stroke in enumerate(axes["stroke_mm"]):
+            for r, rider in enumerate(axes["rider_kg"]):
+                writer.writerow([f"{stroke:g}", f"{rider:g}"] + [f"{v:.0f}" for v in chart[r, :, k]])
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sweep spring rates over a parameter grid per category.")
+    parser.add_argument("out_dir", help="Directory for <category>.npz and <category>_chart.csv")
+    parser.add_argument("--categories", nargs="+", default=list(CATEGORY_DATA), choices=list(CATEGORY_DATA))
+    parser.add_argument("--spring-type", default=DEFAULT_SPRING_TYPE)
+    parser.add_argument("--bike-kg", type=float, help="Default: category default")
+    parser.add_argument("--travel-mm", type=float, help="Default: category default")
+    parser.add_argument("--unsprung-kg", type=float, default=DEFAULT_UNSPRUNG_KG)
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes (0 = all cores)")
+    for name, values in SWEEP_AXES.items():
+        if name != "stroke_mm":
+            parser.add_argument(f"--{name.replace('_', '-')}", type=float, nargs=3, metavar=("START", "STOP", "STEP"),
+                                help=f"Default: {values[0]:g} {values[-1]:g} {values[1] - values[0]:g}")
+    parser.add_argument("--stroke-mm", type=float, nargs="+", help="Default: COMMON_STROKES")
+    args = parser.parse_args(argv)
+
+    axes = dict(SWEEP_AXES)
+    for name in ["rider_kg", "gear_kg", "bias_pct", "target_sag"]:
+        spec = getattr(args, name)
+        if spec:
+            axes[name] = np.arange(spec[0], spec[1] + spec[2] / 2, spec[2])
+    if args.stroke_mm:
+        axes["stroke_mm"] = np.array(args.stroke_mm, dtype=float)
+
+    workers = args.workers or os.cpu_count() or 1
+    skills = list(SKILL_AXIS)
+    results = run_sweep(args.categories, axes, workers, skills, bike_kg=args.bike_kg, travel_mm=args.travel_mm,
+                        unsprung_kg=args.unsprung_kg, spring_type=args.spring_type)
+    for category, result in results.items():
+        save_sweep(args.out_dir, category, axes, result, skills)
+    points = sum(r["raw_rate"].size for r in results.values())
+    print(f"Swept {points} setups over {len(results)} categories -> {args.out_dir}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+import html
+
+# ==========================================================
+# LIGHTWEIGHT TABLE RENDERER
+# The result tables are a handful of rows, so they are rendered as plain
+# HTML instead of going through pandas DataFrames and Stylers, which
+# keeps pandas out of the app's import path entirely.
+# ==========================================================
+
+TABLE_STYLE = "border-collapse: collapse; width: 100%; font-size: 0.9rem;"
+CELL_STYLE = "border-bottom: 1px solid rgba(49, 51, 63, 0.1); padding: 0.35rem 0.6rem; text-align: left;"
+HIGHLIGHT_RECOMMENDED = {"Fit": lambda v: "background-color: #d4edda" if "Recommended" in v else ""}
+
+def render_row(row, columns, highlight=None):
+    highlight = highlight or {}
+    cells = []
+    for c in columns:
+        value = str(row[c])
+        extra = highlight[c](value) if c in highlight else ""
+        cells.append(f'<td style="{CELL_STYLE} {extra}">{html.escape(value)}</td>')
+    return f"<tr>{''.join(cells)}</tr>"
+
+def table_open(columns):
+    # render_table in pieces, for tables too long to build as one string:
+    # table_open(columns) + render_row(...) for each row + TABLE_CLOSE
+    head = "".join(f'<th style="{CELL_STYLE}">{html.escape(str(c))}</th>' for c in columns)
+    return f'<table style="{TABLE_STYLE}"><thead><tr>{head}</tr></thead><tbody>'
+
+TABLE_CLOSE = "</tbody></table>"
+
+def render_table(rows, highlight=None):
+    # rows: list of dicts sharing the same keys (column order = first row's keys).
+    # highlight: {column: fn(value) -> extra CSS}, like Styler.apply on a subset.
+    if not rows:
+        return ""
+    columns = list(rows[0].keys())
+    return table_open(columns) + "".join(render_row(row, columns, highlight) for row in rows) + TABLE_CLOSE
@@ -0,0 +1,126 @@
+import asyncio
+import json
+import threading
+
+import pytest
+
+import api
+from api import SpringRateAPI
+from result_cache import SharedCache
+
+def _exchange(raw, app=None):
+    # Sends raw bytes to a fresh server on a free port; returns (status, JSON body)
+    async def run():
+        server = await asyncio.start_server((app or SpringRateAPI()).handle, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(raw)
+            await writer.drain()
+            response = await asyncio.wait_for(reader.read(), timeout=10)
+            writer.close()
+        return response
+
+    head, _, body = asyncio.run(run()).partition(b"\r\n\r\n")
+    return int(head.split()[1]), json.loads(body)
+
+def _post(path, body, headers=""):
+    body = body if isinstance(body, bytes) else json.dumps(body).encode()
+    return (f"POST {path} HTTP/1.1\r\nConnection: close\r\nContent-Length: {len(body)}\r\n{headers}\r\n"
+            .encode() + body)
+
+def test_setup_is_sized():
+    status, body = _exchange(_post("/v1/setup", {"rider_kg": 68, "category": "Enduro"}))
+    assert status == 200
+    assert body["recommended_rate"] > 0
+
+@pytest.mark.parametrize("raw, error", [
+    (b"GARBAGE\r\n\r\n", "Malformed request line"),
+    (b"POST /v1/setup HTTP/1.1\r\nContent-Length: abc\r\n\r\n", "Invalid Content-Length"),
+    (b"POST /v1/setup HTTP/1.1\r\nContent-Length: -5\r\n\r\n", "Invalid Content-Length"),
+    (_post("/v1/setup", b"{not json"), "Body must be JSON"),
+    (_post("/v1/setup", b'{"rider_kg": NaN, "category": "Enduro"}'), "Numbers must be finite, got NaN"),
+    (_post("/v1/setup", b'{"rider_kg": Infinity, "category": "Enduro"}'), "Numbers must be finite, got Infinity"),
+    (_post("/v1/setup", b'{"rider_kg": 1e999, "category": "Enduro"}'), "Numbers must be finite, got 1e999"),
+    (_post("/v1/setup", {"rider_kg": "inf", "category": "Enduro"}), "Numbers must be finite: rider_kg"),
+    (_post("/v1/setup", [1, 2]), "Expected a JSON object"),
+    (_post("/v1/batch", {"setups": {"rider_kg": 68}}), "Expected {\"setups\""),
+    (_post("/v1/batch", {"setups": [1]}), "Expected {\"setups\""),
+    (_post("/v1/setup", {"rider_kg": 68, "category": "Enduro", "spring_type": "sprindex"}), "Unknown spring types"),
+    (_post("/v1/batch", {"setups": [{"rider_kg": 68, "category": "Enduro"},
+                                    {"rider_kg": 70, "category": "Enduro", "spring_type": "Progresive Coil"}]}),
+     "Unknown spring types: ['Progresive Coil']"),
+    (b"POST /v1/setup HTTP/1.1\r\nX-Long: " + b"a" * 70_000 + b"\r\n\r\n", "Header line too long"),
+    (b"GET /" + b"a" * 70_000 + b" HTTP/1.1\r\n\r\n", "Request line too long"),
+])
+def test_bad_requests_get_400(raw, error):
+    status, body = _exchange(raw)
+    assert status == 400
+    assert body["error"].startswith(error)
+
+@pytest.mark.parametrize("record", [
+    {"category": "Enduro"},
+    {"rider_kg": 68, "category": "No Such Bike"},
+    {"rider_kg": "heavy", "category": "Enduro"},
+    {"rider_kg": 10 ** 400, "category": "Enduro"},
+])
+def test_invalid_setups_get_400(record):
+    status, body = _exchange(_post("/v1/setup", record))
+    assert status == 400
+    assert body["error"]
+
+def test_bad_row_in_batch_gets_400():
+    status, _ = _exchange(_post("/v1/batch", {"setups": [{"rider_kg": 68, "category": "Enduro"},
+                                                          {"rider_kg": float("1e308") * 10, "category": "Enduro"}]}))
+    assert status == 400
+
+def test_routing_errors():
+    assert _exchange(b"GET /v1/nope HTTP/1.1\r\nConnection: close\r\n\r\n")[0] == 404
+    assert _exchange(b"GET /v1/setup HTTP/1.1\r\nConnection: close\r\n\r\n")[0] == 405
+    too_big = f"POST /v1/batch HTTP/1.1\r\nContent-Length: {api.MAX_BODY_BYTES + 1}\r\n\r\n".encode()
+    assert _exchange(too_big)[0] == 413
+
+def test_non_finite_result_is_a_500_not_a_dropped_connection(monkeypatch):
+    app = SpringRateAPI()
+
+    async def route(method, path, body):
+        return 200, {"rate": float("nan")}
+
+    monkeypatch.setattr(app, "route", route)
+    status, body = _exchange(_post("/v1/setup", {}), app)
+    assert status == 500
+    assert "not valid JSON" in body["error"]
+
+def test_shared_cache_runs_off_the_event_loop(tmp_path):
+    # Every SharedCache call must come from an executor thread, LRU hits never reach it
+    loop_threads, calls = set(), []
+
+    class Recording(SharedCache):
+        def get_many(self, namespace, keys):
+            calls.append(threading.get_ident())
+            return super().get_many(namespace, keys)
+
+        def put_many(self, namespace, items):
+            calls.append(threading.get_ident())
+            return super().put_many(namespace, items)
+
+        def stats(self):
+            calls.append(threading.get_ident())
+            return super().stats()
+
+    app = SpringRateAPI(shared=Recording(str(tmp_path / "shared.db")))
+
+    async def run():
+        loop_threads.add(threading.get_ident())
+        body = json.dumps({"rider_kg": 68, "category": "Enduro"}).encode()
+        first = await app.route("POST", "/v1/setup", body)
+        calls_after_miss = len(calls)
+        again = await app.route("POST", "/v1/setup", body)
+        assert len(calls) == calls_after_miss
+        health = await app.route("GET", "/v1/health", b"")
+        return first, again, health
+
+    first, again, health = asyncio.run(run())
+    assert first == again
+    assert "shared_cache" in health[1]
+    assert len(calls) == 3 and not loop_threads & set(calls)
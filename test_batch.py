@@ -0,0 +1,76 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import batch
+from batch import run_batch, size_chunk
+
+N_RIDERS = 41
+
+def _riders(tmp_path):
+    rng = np.random.default_rng(2)
+    df = pd.DataFrame({
+        "rider": [f"R{i}" for i in range(N_RIDERS)],
+        "rider_kg": rng.uniform(50, 110, N_RIDERS).round(1),
+        "category": rng.choice(["Trail", "Enduro", "Downhill (DH)", "Downcountry"], N_RIDERS),
+        "spring_type": rng.choice(["Standard Steel (Linear)", "Sprindex", "Progressive Coil"], N_RIDERS),
+        "stroke_mm": rng.choice([55.0, 62.5, np.nan], N_RIDERS),
+    })
+    path = tmp_path / "riders.csv"
+    df.to_csv(path, index=False)
+    return str(path)
+
+# ==========================================================
+# Chunked output matches sizing the whole file at once
+# ==========================================================
+@pytest.mark.parametrize("chunk_rows, workers", [(7, 1), (5, 2), (N_RIDERS * 2, 1)])
+def test_chunked_csv_matches_single_pass(tmp_path, chunk_rows, workers):
+    in_path = _riders(tmp_path)
+    single = tmp_path / "single.csv"
+    size_chunk(pd.read_csv(in_path)).to_csv(single, index=False)
+
+    out = tmp_path / "out.csv"
+    assert run_batch(in_path, str(out), chunk_rows=chunk_rows, workers=workers) == N_RIDERS
+    result = pd.read_csv(out)
+    assert len(result) == N_RIDERS
+    assert result["rider"].tolist() == [f"R{i}" for i in range(N_RIDERS)]
+    pd.testing.assert_frame_equal(result, pd.read_csv(single))
+
+# ==========================================================
+# With workers, chunks are written oldest-first from a bounded window
+# ==========================================================
+def test_workers_write_oldest_first(tmp_path, monkeypatch):
+    in_path = _riders(tmp_path)
+    workers, lock = 2, threading.Lock()
+    submitted, written = [], []
+
+    def slow_size_chunk(chunk):
+        # Earlier chunks finish last, so completion order is reversed
+        time.sleep(0.02 * (10 - chunk.index[0] // 4))
+        return size_chunk(chunk)
+
+    class Pool(ThreadPoolExecutor):
+        def submit(self, fn, chunk):
+            with lock:
+                submitted.append(chunk.index[0])
+                # Never more than workers * 2 chunks waiting to be written
+                assert len(submitted) - len(written) <= workers * 2
+            return super().submit(slow_size_chunk, chunk)
+
+    write = batch.ChunkWriter.write
+
+    def recording_write(self, df):
+        with lock:
+            written.append(df.index[0])
+        write(self, df)
+
+    monkeypatch.setattr(batch, "ProcessPoolExecutor", Pool)
+    monkeypatch.setattr(batch.ChunkWriter, "write", recording_write)
+    out = tmp_path / "out.csv"
+    assert run_batch(in_path, str(out), chunk_rows=4, workers=workers) == N_RIDERS
+    assert written == submitted == list(range(0, N_RIDERS, 4))
+    assert pd.read_csv(out)["rider"].tolist() == [f"R{i}" for i in range(N_RIDERS)]
@@ -0,0 +1,99 @@
+import numpy as np
+import pytest
+
+from calc_graph import NODES, CalcGraph, _same
+from kinematics import LeverageCurve, leverage_curve
+
+RIDER = dict(rider_kg=68.0, bike_kg=16.5, bias_pct=65.0, coupling=0.6, stroke_mm=62.5, travel_mm=160.0,
+             target_sag=30.0)
+ROSTER = dict(RIDER, rider_kg=np.array([55.0, 68.0, 82.0, 97.0]), spring_type="Progressive Coil")
+
+def _assert_same_values(graph, fresh):
+    for name in NODES:
+        a, b = graph[name], fresh[name]
+        if isinstance(a, dict):
+            for key in a:
+                np.testing.assert_array_equal(a[key], b[key])
+        elif isinstance(a, tuple):
+            for x, y in zip(a, b):
+                np.testing.assert_array_equal(x, y)
+        else:
+            np.testing.assert_array_equal(a, b)
+
+# ==========================================================
+# Setting an input recomputes only what reads it
+# ==========================================================
+@pytest.mark.parametrize("inputs", [RIDER, ROSTER])
+def test_preload_turns_recomputes_only_preload_nodes(inputs):
+    g = CalcGraph(**inputs)
+    g.evaluate()
+    dropped = g.set(preload_turns=(0.0, 1.0, 2.0))
+    assert set(dropped) == {"preload_sag_pct", "preload_status"}
+    g.evaluate()
+    assert set(g.recomputed) == {"preload_sag_pct", "preload_status"}
+    _assert_same_values(g, CalcGraph(**{**inputs, "preload_turns": (0.0, 1.0, 2.0)}))
+
+@pytest.mark.parametrize("inputs", [RIDER, ROSTER])
+def test_target_sag_keeps_rear_load_cached(inputs):
+    g = CalcGraph(**inputs)
+    g.evaluate()
+    g.set(target_sag=34.0)
+    for name in ["eff_rider_kg", "system_kg", "rear_load_kg", "rear_load_lbs", "spring_code", "shock_stroke_mm"]:
+        assert g.is_cached(name)
+    assert not g.is_cached("sag_mm") and not g.is_cached("raw_rate")
+    g.evaluate()
+    assert "rear_load_lbs" not in g.recomputed and "raw_rate" in g.recomputed
+    _assert_same_values(g, CalcGraph(**{**inputs, "target_sag": 34.0}))
+
+# ==========================================================
+# A fork never touches the graph it came from
+# ==========================================================
+def test_fork_does_not_mutate_parent():
+    parent = CalcGraph(**ROSTER)
+    parent.evaluate()
+    inputs, cached = dict(parent.inputs), dict(parent._values)
+    counts, recomputed = dict(parent.counts), list(parent.recomputed)
+
+    child = parent.fork(rider_kg=np.array([60.0, 70.0, 80.0, 90.0]))
+    child.evaluate()
+    child.set(target_sag=25.0, preload_turns=(0.0, 3.0))
+    child.evaluate()
+
+    assert parent.inputs == inputs
+    assert parent._values.keys() == cached.keys()
+    assert all(parent._values[name] is cached[name] for name in cached)
+    assert parent.counts == counts and parent.recomputed == recomputed
+    _assert_same_values(child, CalcGraph(**{**ROSTER, "rider_kg": np.array([60.0, 70.0, 80.0, 90.0]),
+                                            "target_sag": 25.0, "preload_turns": (0.0, 3.0)}))
+
+def test_fork_reuses_independent_nodes():
+    parent = CalcGraph(**RIDER)
+    parent.evaluate()
+    child = parent.fork(rider_kg=75.0)
+    assert child.is_cached("sag_mm") and child["sag_mm"] is parent["sag_mm"]
+    assert not child.is_cached("rear_load_lbs")
+
+# ==========================================================
+# Equal values do not invalidate anything
+# ==========================================================
+def test_same_skips_equal_arrays_and_curves():
+    a = np.array([55.0, np.nan, 82.0])
+    assert _same(a, a.copy())
+    assert _same(a, [55.0, np.nan, 82.0])
+    assert not _same(a, np.array([55.0, np.nan, 83.0]))
+    assert not _same(a, a[:2])
+    assert not _same(None, 0.0) and _same(None, None)
+    assert _same("Progressive Coil", "Progressive Coil") and not _same("Progressive Coil", "Sprindex")
+
+    curve = leverage_curve([0.0, 80.0, 160.0], leverage=[3.0, 2.7, 2.5])
+    same_curve = LeverageCurve(curve.wheel.copy(), curve.shock.copy(), curve.leverage.copy())
+    other_curve = leverage_curve([0.0, 80.0, 160.0], leverage=[3.0, 2.6, 2.5])
+    assert curve is not same_curve and _same(curve, same_curve)
+    assert not _same(curve, other_curve) and not _same(curve, None) and not _same(None, curve)
+
+    g = CalcGraph(**dict(ROSTER, curve=curve))
+    g.evaluate()
+    assert g.set(rider_kg=ROSTER["rider_kg"].copy(), curve=same_curve, target_sag=30.0) == []
+    g.evaluate()
+    assert g.recomputed == []
+    assert "raw_rate" in g.set(curve=other_curve)
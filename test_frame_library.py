@@ -0,0 +1,104 @@
+import os
+
+import numpy as np
+import pytest
+
+import frame_library
+from frame_library import INDEX_FILE, FrameLibrary, build_library, library_stamp, open_library, read_manifest
+
+def _frames(scale=1.0):
+    wheel = np.linspace(0.0, 160.0, 33)
+    return [
+        {"brand": "Santa Cruz", "model": "Megatower", "category": "Enduro", "wheel_mm": wheel,
+         "leverage": np.linspace(3.0, 2.5, 33) * scale},
+        {"brand": "Santa Cruz", "model": "Hightower", "category": "Trail", "wheel_mm": wheel[:-4],
+         "leverage": np.linspace(2.9, 2.6, 29) * scale},
+        {"brand": "Commencal", "model": "Supreme DH", "category": "Downhill (DH)", "wheel_mm": wheel * 1.25,
+         "shock_mm": np.linspace(0.0, 75.0, 33) ** 1.05 * scale},
+    ]
+
+def _samples_files(path):
+    return sorted(n for n in os.listdir(path) if n.startswith("samples."))
+
+# ==========================================================
+# Build, search and get round-trip
+# ==========================================================
+def test_build_search_get_round_trip(tmp_path):
+    frames = _frames()
+    assert build_library(frames, str(tmp_path)) == 3
+    lib = open_library(str(tmp_path))
+    assert len(lib) == 3 and "Santa Cruz Megatower" in lib and "Santa Cruz Nomad" not in lib
+    assert lib.brands() == ["Commencal", "Santa Cruz"]
+
+    assert lib.search("tower") == ["Santa Cruz Megatower", "Santa Cruz Hightower"]
+    assert lib.search("SANTA mega") == ["Santa Cruz Megatower"]
+    assert lib.search(category="Trail") == ["Santa Cruz Hightower"]
+    assert lib.search(brand="Commencal") == ["Commencal Supreme DH"]
+    assert lib.search("tower", limit=1) == ["Santa Cruz Megatower"]
+    assert lib.search("nomad") == []
+
+    for f in frames:
+        frame = lib.get(frame_library.frame_key(f["brand"], f["model"]))
+        kind = "leverage" if "leverage" in f else "shock_mm"
+        expected = frame_library.leverage_curve(np.float32(f["wheel_mm"]).astype(float),
+                                                **{kind: np.float32(f[kind]).astype(float)})
+        assert (frame["brand"], frame["model"], frame["category"]) == (f["brand"], f["model"], f["category"])
+        np.testing.assert_array_equal(frame["curve"].wheel, expected.wheel)
+        np.testing.assert_array_equal(frame["curve"].leverage, expected.leverage)
+        assert frame["travel_mm"] == pytest.approx(expected.travel, rel=1e-6)
+        assert frame["stroke_mm"] == pytest.approx(expected.stroke, rel=1e-6)
+
+def test_manifest_build(tmp_path):
+    (tmp_path / "mega.csv").write_text("wheel_travel_mm,leverage_ratio\n0,3.0\n80,2.7\n160,2.5\n")
+    (tmp_path / "supreme.csv").write_text("wheel_travel_mm,shock_stroke_mm\n0,0\n100,35\n200,75\n")
+    (tmp_path / "manifest.csv").write_text("brand,model,category,curve_file\n"
+                                           "Santa Cruz,Megatower,Enduro,mega.csv\n"
+                                           "Commencal,Supreme DH,Downhill (DH),supreme.csv\n")
+    out = tmp_path / "frames"
+    assert build_library(read_manifest(str(tmp_path / "manifest.csv")), str(out)) == 2
+    lib = FrameLibrary(str(out))
+    assert lib.get("Commencal Supreme DH")["stroke_mm"] == pytest.approx(75.0)
+    assert lib.get("Santa Cruz Megatower")["travel_mm"] == pytest.approx(160.0)
+
+def test_duplicate_frames_and_missing_library(tmp_path):
+    with pytest.raises(ValueError, match="Duplicate"):
+        build_library(_frames() + _frames()[:1], str(tmp_path / "dup"))
+    assert open_library(str(tmp_path / "none")) is None
+    assert library_stamp(str(tmp_path / "none")) is None
+
+# ==========================================================
+# Rebuilds: new stamp, index and samples always from the same build
+# ==========================================================
+def test_rebuild_changes_stamp_and_keeps_open_libraries(tmp_path):
+    path = str(tmp_path)
+    build_library(_frames(), path)
+    stamp = library_stamp(path)
+    old = FrameLibrary(path)
+    old_curve = old.get("Santa Cruz Megatower")["curve"]
+
+    build_library(_frames(scale=1.1), path)
+    assert library_stamp(path) != stamp
+    assert len(_samples_files(path)) == 1
+    new = FrameLibrary(path)
+    assert new.get("Santa Cruz Megatower")["curve"].leverage[0] == pytest.approx(3.3, rel=1e-6)
+    # Opened before the rebuild: still reads its own build
+    np.testing.assert_array_equal(old.get("Santa Cruz Megatower")["curve"].leverage, old_curve.leverage)
+
+    stamps = {library_stamp(path)}
+    for _ in range(3):
+        build_library(_frames(), path)
+        assert library_stamp(path) not in stamps
+        stamps.add(library_stamp(path))
+
+def test_index_checks_its_samples(tmp_path):
+    path = str(tmp_path)
+    build_library(_frames(), path)
+    (current,) = _samples_files(path)
+    samples = np.load(os.path.join(path, current))
+    np.save(os.path.join(path, current), samples[:-1])
+    with pytest.raises(ValueError, match="do not match"):
+        FrameLibrary(path)
+    os.remove(os.path.join(path, current))
+    with pytest.raises(FileNotFoundError):
+        FrameLibrary(path)
+    assert os.path.exists(os.path.join(path, INDEX_FILE))
@@ -0,0 +1,176 @@
+import itertools
+import time
+
+import numpy as np
+import pytest
+
+from inventory import NEIGHBOR_RATES, assign_springs, normalize_catalog, STATUS_ASSIGNED, STATUS_TOLERANCE
+from setups import normalize_setups
+from spring_data import DEFAULT_SPRING_TYPE
+
+# Small fields checked against every possible assignment: the optimizer must
+# serve as many riders as the stock allows and, among those, reach the
+# smallest total |sag error|.
+
+def _field(rng, n_riders, strokes=(62.5,), spring_type=DEFAULT_SPRING_TYPE):
+    return normalize_setups({
+        "rider_kg": rng.uniform(50, 110, n_riders).round(1),
+        "category": ["Enduro"] * n_riders,
+        "stroke_mm": rng.choice(strokes, n_riders),
+        "spring_type": [spring_type] * n_riders,
+    }, n_riders)
+
+def _catalog(rng, n_skus, max_qty, strokes=(62.5,), spring_type=DEFAULT_SPRING_TYPE):
+    return normalize_catalog({
+        "rate_lbs": rng.choice(np.arange(250, 700, 25), n_skus, replace=False).astype(float),
+        "stroke_mm": rng.choice(strokes, n_skus),
+        "quantity": rng.integers(1, max_qty + 1, n_skus),
+        "spring_type": [spring_type] * n_skus,
+    }, n_skus)
+
+def _linear_sag(setup, exact_rate, rate):
+    return exact_rate[:, None] * setup["sag_pct"][:, None] / rate[None, :]
+
+def _progressive_sag(setup, exact_rate, rate):
+    # "Progressive Coil" stiffens by 20% over the stroke, so the linear-equivalent
+    # compression of u strokes is u + 0.1 u^2: solve that for u directly
+    target = setup["sag_pct"][:, None] / 100
+    linear = exact_rate[:, None] * (target + 0.1 * target ** 2) / rate[None, :]
+    return 100 * (np.sqrt(1 + 0.4 * linear) - 1) / 0.2
+
+def _brute_force(setup, catalog, exact_rate, max_sag_error=None, sag=_linear_sag):
+    # Best (riders served, -total error) over every assignment that respects stock,
+    # stroke and tolerance
+    target = setup["sag_pct"]
+    n, m = len(target), len(catalog["rate_lbs"])
+    cost = np.abs(sag(setup, exact_rate, catalog["rate_lbs"]) - target[:, None])
+    allowed = catalog["stroke_mm"][None, :] + 0.05 >= setup["stroke_mm"][:, None]
+    if max_sag_error is not None:
+        allowed &= cost <= max_sag_error
+    best = (0, 0.0)
+    for choice in itertools.product(range(-1, m), repeat=n):
+        used = np.bincount([c for c in choice if c >= 0], minlength=m)
+        if np.any(used > catalog["quantity"]):
+            continue
+        if any(c >= 0 and not allowed[i, c] for i, c in enumerate(choice)):
+            continue
+        served = sum(c >= 0 for c in choice)
+        total = sum(cost[i, c] for i, c in enumerate(choice) if c >= 0)
+        if served > best[0] or (served == best[0] and total < best[1] - 1e-9):
+            best = (served, total)
+    return best
+
+def _check(setup, catalog, max_sag_error=None, sag=_linear_sag, tol=1e-6):
+    result = assign_springs(setup, catalog, max_sag_error=max_sag_error)
+    served = int((result["status"] == STATUS_ASSIGNED).sum())
+    used = np.bincount(result["sku_row"][result["sku_row"] >= 0], minlength=len(catalog["rate_lbs"]))
+    assert np.all(used <= catalog["quantity"])
+    assert np.all(result["remaining"] == catalog["quantity"] - used)
+    expected = _brute_force(setup, catalog, result["exact_rate"], max_sag_error, sag)
+    assert served == expected[0]
+    assert result["total_abs_sag_error"] == pytest.approx(expected[1], abs=tol)
+    return result
+
+@pytest.mark.parametrize("seed", range(60))
+def test_scarce_stock_matches_brute_force(seed):
+    rng = np.random.default_rng(seed)
+    n_riders = int(rng.integers(2, 6))
+    _check(_field(rng, n_riders), _catalog(rng, int(rng.integers(1, 5)), 1))
+
+@pytest.mark.parametrize("seed", range(60))
+def test_ample_stock_matches_brute_force(seed):
+    rng = np.random.default_rng(1000 + seed)
+    n_riders = int(rng.integers(2, 6))
+    _check(_field(rng, n_riders), _catalog(rng, int(rng.integers(1, 5)), 3))
+
+@pytest.mark.parametrize("seed", range(30))
+def test_mixed_strokes_match_brute_force(seed):
+    # Long-stroke springs also fit short-stroke shocks, so pools compete for riders
+    rng = np.random.default_rng(2000 + seed)
+    strokes = (55.0, 62.5)
+    _check(_field(rng, int(rng.integers(2, 6)), strokes), _catalog(rng, int(rng.integers(2, 5)), 2, strokes))
+
+@pytest.mark.parametrize("seed", range(30))
+def test_tolerance_matches_brute_force(seed):
+    rng = np.random.default_rng(3000 + seed)
+    result = _check(_field(rng, int(rng.integers(2, 6))), _catalog(rng, int(rng.integers(1, 5)), 2), 2.0)
+    assert np.all(np.abs(result["sag_error_pct"][result["status"] == STATUS_ASSIGNED]) <= 2.0 + 1e-9)
+
+def test_out_of_tolerance_rider_is_flagged():
+    setup = normalize_setups({"rider_kg": [70.0], "category": ["Enduro"]}, 1)
+    catalog = normalize_catalog({"rate_lbs": [1000.0], "stroke_mm": [62.5], "quantity": [1]}, 1)
+    result = assign_springs(setup, catalog, max_sag_error=1.0)
+    assert result["status"][0] == STATUS_TOLERANCE
+    assert result["remaining"][0] == 1
+
+@pytest.mark.parametrize("seed", range(20))
+def test_progressive_springs_match_brute_force(seed):
+    # Costs go through the force curve: compare against the sag solved by hand
+    rng = np.random.default_rng(4000 + seed)
+    setup = _field(rng, int(rng.integers(2, 6)), spring_type="Progressive Coil")
+    catalog = _catalog(rng, int(rng.integers(1, 5)), 2, spring_type="Progressive Coil")
+    result = _check(setup, catalog, sag=_progressive_sag, tol=1e-4)
+    assigned = result["status"] == STATUS_ASSIGNED
+    by_hand = _progressive_sag(setup, result["exact_rate"], result["spring_rate"])
+    assert np.diag(by_hand)[assigned] == pytest.approx(result["assigned_sag_pct"][assigned], abs=1e-4)
+
+def test_riders_past_the_offer_window_still_get_stock():
+    # 12 identical riders, 14 single springs: the rates near the exact one run
+    # out, and the rest still fit, so every rider is served from the 12
+    # springs with the smallest sag error
+    n, rates = 12, np.arange(250.0, 576.0, 25.0)
+    assert len(rates) > 2 * NEIGHBOR_RATES
+    setup = normalize_setups({"rider_kg": [75.0] * n, "category": ["Enduro"] * n, "stroke_mm": [65.0] * n}, n)
+    catalog = normalize_catalog({"rate_lbs": rates, "stroke_mm": [65.0] * len(rates),
+                                 "quantity": [1] * len(rates)}, len(rates))
+    result = assign_springs(setup, catalog)
+    assert np.all(result["status"] == STATUS_ASSIGNED)
+    assert result["remaining"].sum() == len(rates) - n
+    errors = np.abs(_linear_sag(setup, result["exact_rate"], rates)[0] - setup["sag_pct"][0])
+    assert result["total_abs_sag_error"] == pytest.approx(np.sort(errors)[:n].sum(), abs=1e-6)
+
+@pytest.mark.parametrize("seed", range(10))
+def test_spread_field_uses_all_stock_it_can(seed):
+    # Riders spread over a wide catalog, two strokes: as many riders are served
+    # as the stock allows, however far from their exact rate it sits
+    rng = np.random.default_rng(5000 + seed)
+    strokes = (55.0, 62.5)
+    setup = _field(rng, 30, strokes)
+    catalog = _catalog(rng, 18, 2, strokes)
+    result = assign_springs(setup, catalog)
+    served = int((result["status"] == STATUS_ASSIGNED).sum())
+    # Long-stroke shocks need long springs; short ones take whatever is left
+    long_riders = int((setup["stroke_mm"] > 55.0).sum())
+    long_stock = int(catalog["quantity"][catalog["stroke_mm"] > 55.0].sum())
+    long_served = min(long_riders, long_stock)
+    expected = long_served + min(len(setup["stroke_mm"]) - long_riders, catalog["quantity"].sum() - long_served)
+    assert served == expected
+
+def test_large_field_solves_quickly():
+    # 20k riders against 5k SKUs on a 25 lbs grid: every spring has riders in
+    # reach, so all of them go out
+    rng = np.random.default_rng(0)
+    n, m = 20000, 5000
+    strokes = (55.0, 62.5, 65.0)
+    setup = normalize_setups({
+        "rider_kg": rng.uniform(50, 110, n).round(1),
+        "category": rng.choice(["Trail", "Enduro", "Downhill (DH)"], n),
+        "stroke_mm": rng.choice(strokes, n),
+    }, n)
+    catalog = normalize_catalog({
+        "rate_lbs": rng.choice(np.arange(250, 800, 25), m).astype(float),
+        "stroke_mm": rng.choice(strokes, m),
+        "id_mm": rng.choice([np.nan, 35.0, 38.0], m),
+        "quantity": rng.integers(1, 4, m),
+    }, m)
+    spring_id = rng.choice([np.nan, 35.0, 38.0], n)
+    start = time.perf_counter()
+    result = assign_springs(setup, catalog, spring_id)
+    assert time.perf_counter() - start < 30
+    assigned = result["status"] == STATUS_ASSIGNED
+    rows = result["sku_row"][assigned]
+    assert np.all(np.bincount(rows, minlength=m) <= catalog["quantity"])
+    assert np.all(catalog["stroke_mm"][rows] + 0.05 >= setup["stroke_mm"][assigned])
+    assert np.all(np.isnan(catalog["id_mm"][rows]) | np.isnan(spring_id[assigned]) | (catalog["id_mm"][rows] == spring_id[assigned]))
+    assert assigned.sum() == catalog["quantity"].sum()
+    assert np.abs(result["sag_error_pct"][assigned]).mean() < 1.0
@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+
+from kinematics import SOLVER_TOL_MM, LeverageCurve, leverage_curve
+from spring_data import MM_TO_IN
+from spring_engine import compute_spring_rates
+
+RIDER = (80.0, 4.0, 15.0, 4.27, 65.0)
+
+# ==========================================================
+# A constant ratio must reproduce the travel/stroke path of the engine
+# ==========================================================
+@pytest.mark.parametrize("target_sag", [20.0, 30.0, 38.0])
+def test_constant_curve_matches_linear_path(target_sag):
+    stroke, lr = 62.5, 2.6
+    curve = leverage_curve([0.0, stroke * lr], leverage=[lr, lr])
+    assert curve.stroke == pytest.approx(stroke, rel=1e-12)
+
+    kinematic = compute_spring_rates(*RIDER, stroke, stroke * lr, target_sag, "Standard Steel (Linear)", 0.7,
+                                     curve=curve)
+    linear = compute_spring_rates(*RIDER, stroke, stroke * lr, target_sag, "Standard Steel (Linear)", 0.7)
+    for key in ["effective_lr", "raw_rate", "rounded_rate"]:
+        assert float(kinematic[key]) == pytest.approx(float(linear[key]), rel=1e-9)
+    tol_pct = SOLVER_TOL_MM / stroke * 100
+    assert float(kinematic["resulting_sag_pct"]) == pytest.approx(float(linear["resulting_sag_pct"]), abs=tol_pct)
+    np.testing.assert_allclose(kinematic["preload_sag_pct"], linear["preload_sag_pct"], atol=tol_pct)
+
+# ==========================================================
+# sag_mm solves rate * s = W * LR(s) on a progressive curve
+# ==========================================================
+def test_sag_solves_equilibrium_to_tolerance():
+    curve = leverage_curve([0.0, 80.0, 160.0], leverage=[3.2, 2.8, 2.5])
+    loads = np.linspace(120.0, 260.0, 15)[:, np.newaxis]
+    rates = np.array([350.0, 450.0, 550.0, 700.0])
+    sag = curve.sag_mm(loads, rates)
+    assert sag.shape == (15, 4)
+    assert np.all((sag > 0) & (sag < curve.stroke))
+
+    def excess(s):
+        return rates * s * MM_TO_IN - loads * curve.leverage_at(s)
+
+    # The root lies within the tolerance band around every returned sag
+    assert np.all(excess(sag - SOLVER_TOL_MM) < 0)
+    assert np.all(excess(sag + SOLVER_TOL_MM) > 0)
+
+def test_sag_clamps_to_preload_and_stroke():
+    curve = leverage_curve([0.0, 150.0], leverage=[2.8, 2.4])
+    assert float(curve.sag_mm(100.0, 500.0, preload_mm=50.0)) == 0.0
+    assert float(curve.sag_mm(400.0, 10.0)) == curve.stroke
+    assert np.isnan(curve.sag_mm(np.nan, 500.0))
+
+# ==========================================================
+# Both sample formats describe the same linkage
+# ==========================================================
+def test_stroke_and_leverage_samples_agree():
+    # LR(w) = a - b*w integrates to shock(w) = -ln(1 - b*w/a) / b
+    a, b = 3.1, 0.004
+    wheel = np.linspace(0.0, 160.0, 161)
+    shock = -np.log(1 - b * wheel / a) / b
+    from_lr = LeverageCurve.from_leverage(wheel, a - b * wheel)
+    from_stroke = LeverageCurve.from_stroke(wheel, shock)
+
+    assert from_lr.stroke == pytest.approx(from_stroke.stroke, rel=1e-6)
+    assert from_lr.travel == from_stroke.travel
+    # Segment slopes sit at midpoints, so the end ratios are half a sample off
+    assert from_lr.progression_pct == pytest.approx(from_stroke.progression_pct, abs=0.25)
+    points = np.linspace(1.0, from_lr.stroke - 1.0, 40)
+    np.testing.assert_allclose(from_lr.leverage_at(points), from_stroke.leverage_at(points), rtol=1e-4)
+
+def test_identical_samples_share_one_curve():
+    one = leverage_curve([0, 100, 150], shock_mm=[0, 35, 55])
+    assert leverage_curve([0.0, 100.0, 150.0], shock_mm=[0.0, 35.0, 55.0]) is one
+    with pytest.raises(ValueError):
+        leverage_curve([0, 100], shock_mm=[0, 35], leverage=[3, 3])
+    with pytest.raises(ValueError):
+        leverage_curve([10, 100], leverage=[3, 2.8])
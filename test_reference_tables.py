@@ -0,0 +1,138 @@
+import json
+import os
+import shutil
+import time
+
+import pytest
+
+import reference_tables
+import spring_data
+import sweep
+from reference_tables import REGIONAL_KEYS, TABLE_KEYS
+
+@pytest.fixture
+def data_file(tmp_path, monkeypatch):
+    # A private copy of the data file, loaded like the app loads it
+    path = tmp_path / "spring_tables.json"
+    shutil.copy(reference_tables.DEFAULT_PATH, path)
+    monkeypatch.setenv("SPRING_TABLES", str(path))
+    monkeypatch.delenv("SPRING_REGION", raising=False)
+    reference_tables.reload()
+    yield path
+    monkeypatch.undo()
+    reference_tables.reload()
+
+def _write(path, change):
+    doc = json.loads(path.read_text())
+    change(doc)
+    path.write_text(json.dumps(doc))
+    # A later mtime even on file systems with coarse timestamps
+    stamp = os.stat(path).st_mtime_ns + 1_000_000_000
+    os.utime(path, ns=(stamp, stamp))
+
+# ==========================================================
+# A file that fails validation keeps the previous tables
+# ==========================================================
+def test_invalid_file_keeps_previous_tables(data_file):
+    before = reference_tables.current()
+    coupling = dict(spring_data.COUPLING_COEFFS)
+    _write(data_file, lambda doc: doc["coupling_coeffs"].pop("Enduro"))
+
+    assert reference_tables.reload(force=False) is before
+    assert "coupling_coeffs" in reference_tables.last_error()
+    assert spring_data.COUPLING_COEFFS == coupling
+    # Not retried until the file changes again
+    assert reference_tables.reload(force=False) is before
+
+    _write(data_file, lambda doc: doc["coupling_coeffs"].update(Enduro=0.5, Trail=0.45))
+    tables = reference_tables.reload(force=False)
+    assert tables is not before and reference_tables.last_error() is None
+    assert spring_data.COUPLING_COEFFS["Trail"] == 0.45 and spring_data.COUPLING_COEFFS["Enduro"] == 0.5
+
+@pytest.mark.parametrize("progression, ok", [(-10, True), (-4.5, True), (0, True), (60, True),
+                                              (-10.5, False), (75, False), ("12", False)])
+def test_progression_accepts_what_the_app_accepts(data_file, progression, ok):
+    _write(data_file, lambda doc: doc["category_data"]["Enduro"].update(progression=progression))
+    tables = reference_tables.reload(force=False)
+    if ok:
+        assert reference_tables.last_error() is None
+        assert tables["raw"]["category_data"]["Enduro"]["progression"] == progression
+        assert spring_data.CATEGORY_DATA["Enduro"]["progression"] == progression
+    else:
+        assert "category_data.Enduro.progression" in reference_tables.last_error()
+
+def test_first_load_of_invalid_file_raises(tmp_path):
+    path = tmp_path / "broken.json"
+    path.write_text(json.dumps({"schema": reference_tables.SCHEMA_VERSION, "version": "1"}))
+    with pytest.raises(ValueError, match="Missing tables"):
+        reference_tables.load_tables(str(path))
+
+# ==========================================================
+# A regional overlay replaces only REGIONAL_KEYS
+# ==========================================================
+def test_regional_overlay_replaces_only_regional_keys(data_file, monkeypatch):
+    base = json.loads(data_file.read_text())
+    sizes = {name: mod + 0.1 for name, mod in base["size_weight_mods"].items()}
+    weights = {c: {m: [w + 1.0 for w in tiers] for m, tiers in by_material.items()}
+               for c, by_material in base["bike_weight_est"].items()}
+    overlay = data_file.with_name("spring_tables.eu.json")
+    overlay.write_text(json.dumps({"version": "3", "size_weight_mods": sizes, "bike_weight_est": weights}))
+    monkeypatch.setenv("SPRING_REGION", "eu")
+
+    tables = reference_tables.reload()
+    assert tables["version"] == f"{base['version']}+eu.3" and tables["region"] == "eu"
+    assert tables["sources"] == [str(data_file), str(overlay)]
+    for key in TABLE_KEYS:
+        expected = {"size_weight_mods": sizes, "bike_weight_est": weights}.get(key, base[key])
+        assert tables["raw"][key] == expected, key
+    assert spring_data.SIZE_WEIGHT_MODS == sizes and spring_data.BIKE_WEIGHT_EST == weights
+    assert set(REGIONAL_KEYS) == {"size_weight_mods", "bike_weight_est"}
+
+    # One regional table only: the other stays the base one
+    overlay.write_text(json.dumps({"size_weight_mods": sizes}))
+    tables = reference_tables.reload()
+    assert tables["version"] == base["version"]
+    assert tables["raw"]["bike_weight_est"] == base["bike_weight_est"]
+
+    overlay.write_text(json.dumps({"size_weight_mods": sizes, "coupling_coeffs": base["coupling_coeffs"]}))
+    with pytest.raises(ValueError, match="can be regional"):
+        reference_tables.load_tables(region="eu")
+
+# ==========================================================
+# A changed file is picked up after RELOAD_CHECK_S
+# ==========================================================
+def test_mtime_change_reloads_after_check_interval(data_file, monkeypatch):
+    monkeypatch.setattr(reference_tables, "RELOAD_CHECK_S", 0.3)
+    before = reference_tables.reload()
+    _write(data_file, lambda doc: doc.update(version="2099.1.0"))
+
+    assert reference_tables.current() is before  # Within the interval: not even re-statted
+    time.sleep(0.35)
+    tables = reference_tables.current()
+    assert tables["version"] == "2099.1.0" and tables["fingerprint"] != before["fingerprint"]
+    assert reference_tables.current() is tables  # Unchanged file: nothing reloaded
+
+# ==========================================================
+# In-place refresh of the module-level tables
+# ==========================================================
+def test_refresh_adds_and_removes_names_everywhere(data_file):
+    def add_gravel(doc):
+        doc["category_data"]["Gravel"] = dict(doc["category_data"]["Trail"], desc="Gravel")
+        doc["coupling_coeffs"]["Gravel"] = 0.5
+        doc["bike_weight_est"]["Gravel"] = doc["bike_weight_est"]["Trail"]
+        doc["skill_modifiers"]["Pro"] = {"bias": 2.0}
+
+    category_data, skill_levels = spring_data.CATEGORY_DATA, spring_data.SKILL_LEVELS
+    _write(data_file, add_gravel)
+    reference_tables.reload()
+    assert spring_data.CATEGORY_DATA is category_data and spring_data.SKILL_LEVELS is skill_levels
+    for table in (spring_data.CATEGORY_DATA, spring_data.COUPLING_COEFFS, spring_data.BIKE_WEIGHT_EST):
+        assert "Gravel" in table
+    assert spring_data.SKILL_LEVELS[-1] == "Pro" and "Pro" in spring_data.SKILL_MODIFIERS
+    assert sweep.SKILL_AXIS is spring_data.SKILL_LEVELS
+
+    shutil.copy(reference_tables.DEFAULT_PATH, data_file)
+    reference_tables.reload()
+    for table in (spring_data.CATEGORY_DATA, spring_data.COUPLING_COEFFS, spring_data.BIKE_WEIGHT_EST):
+        assert "Gravel" not in table
+    assert "Pro" not in spring_data.SKILL_LEVELS and "Pro" not in spring_data.SKILL_MODIFIERS
@@ -0,0 +1,138 @@
+import pytest
+
+import result_cache
+from result_cache import SharedCache, cache_key
+
+class _Clock:
+    # Stands in for the time module inside result_cache
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(result_cache, "time", clock)
+    return clock
+
+@pytest.fixture
+def cache(tmp_path, clock):
+    return SharedCache(str(tmp_path / "cache.db"), max_bytes=10_000, ttl_s=3600)
+
+def _keys(cache):
+    return {k for (k,) in cache._conn().execute("SELECT key FROM entries")}
+
+def test_entries_expire_after_ttl(cache, clock):
+    cache.put("ns", "a", {"rate": 450})
+    clock.now += 3599
+    assert cache.get("ns", "a") == {"rate": 450}
+    assert cache.get_many("ns", ["a"]) == {"a": {"rate": 450}}
+    clock.now += 2
+    assert cache.get("ns", "a") is None
+    assert cache.get_many("ns", ["a"]) == {}
+    assert (cache.hits, cache.misses) == (2, 2)
+    # Reads never delete; eviction drops the expired row
+    assert _keys(cache) == {"a"}
+    assert cache.evict() == 1
+    assert _keys(cache) == set()
+
+def test_ttl_runs_from_creation_not_last_use(cache, clock):
+    cache.put("ns", "a", 1)
+    for _ in range(5):
+        clock.now += 1000
+        cache.get("ns", "a")
+    assert cache.get("ns", "a") is None
+
+def test_eviction_drops_least_recently_used(cache, clock):
+    value = "x" * 1000  # ~1 KB each, bound is 10 KB
+    for key in "abcdefghi":
+        cache.put("ns", key, value)
+        clock.now += 100
+    # Reading a and b after TOUCH_AFTER_S makes them the most recent
+    assert cache.get_many("ns", ["a", "b"]).keys() == {"a", "b"}
+    clock.now += 1
+    cache.put("ns", "j", value)
+    cache.put("ns", "k", value)
+    dropped = cache.evict()
+    # Down to 90% of the bound: the oldest untouched entries go first
+    assert dropped == 3
+    assert _keys(cache) == set("abfghijk")
+    assert cache.stats()["evictions"] == 3
+
+def test_recent_reads_do_not_rewrite_recency(cache, clock):
+    cache.put("ns", "a", 1)
+    clock.now += result_cache.TOUCH_AFTER_S / 2
+    cache.get("ns", "a")
+    (last_used,) = cache._conn().execute("SELECT last_used FROM entries").fetchone()
+    assert last_used == clock.now - result_cache.TOUCH_AFTER_S / 2
+
+def test_put_many_get_many_across_chunks(cache, monkeypatch):
+    monkeypatch.setattr(result_cache, "MANY_CHUNK", 3)
+    monkeypatch.setattr(result_cache, "EVICT_EVERY_PUTS", 4)
+    evictions = []
+    monkeypatch.setattr(cache, "evict", lambda: evictions.append(1))
+    items = [(f"k{i}", {"i": i}) for i in range(10)]
+    cache.put_many("ns", items[:3])
+    assert not evictions
+    cache.put_many("ns", items[3:])
+    # Crossing an EVICT_EVERY_PUTS boundary evicts once per batch
+    assert len(evictions) == 1
+    found = cache.get_many("ns", [k for k, _ in items] + ["missing", "k0"])
+    assert found == dict(items)
+    stats = cache.stats()["namespaces"]["ns"]
+    assert (stats["hits"], stats["misses"]) == (10, 1)
+
+def test_keys_follow_inputs_tables_and_models(monkeypatch):
+    key = cache_key("calc", 80.0, category="Enduro")
+    # Floats are compared at CANONICAL_DECIMALS
+    assert cache_key("calc", 80.0000000001, category="Enduro") == key
+    assert cache_key("calc", 80.5, category="Enduro") != key
+    assert cache_key("sheet", 80.0, category="Enduro") != key
+    monkeypatch.setattr(result_cache, "MODELS_FINGERPRINT", "changed")
+    assert cache_key("calc", 80.0, category="Enduro") != key
+    models_changed = cache_key("calc", 80.0, category="Enduro")
+    monkeypatch.setattr(result_cache, "CODE_FINGERPRINT", "changed")
+    assert cache_key("calc", 80.0, category="Enduro") != models_changed
+
+def test_code_fingerprint_follows_module_sources(tmp_path):
+    # Rendered HTML is cached, so a formatting change must give new keys
+    (tmp_path / "table_render.py").write_text("ROW = '<tr>{}</tr>'\n")
+    (tmp_path / "test_table_render.py").write_text("")
+    (tmp_path / "notes.txt").write_text("")
+    before = result_cache.code_fingerprint(str(tmp_path))
+    (tmp_path / "test_table_render.py").write_text("def test_row(): pass\n")
+    (tmp_path / "notes.txt").write_text("changed")
+    assert result_cache.code_fingerprint(str(tmp_path)) == before
+    (tmp_path / "table_render.py").write_text("ROW = '<tr class=\"r\">{}</tr>'\n")
+    edited = result_cache.code_fingerprint(str(tmp_path))
+    assert edited != before
+    (tmp_path / "app_extra.py").write_text("")
+    assert result_cache.code_fingerprint(str(tmp_path)) not in (before, edited)
+
+def test_batched_keys_match_single_keys():
+    rows = [{"rider_kg": 80.0, "category": "Enduro"}, {"rider_kg": 61.5, "category": "Trail"}]
+    assert result_cache.cache_keys("api.setup", rows) == [cache_key("api.setup", r) for r in rows]
+
+def test_shared_decorator_calls_once(tmp_path, monkeypatch):
+    path = str(tmp_path / "shared.db")
+    monkeypatch.setenv("SPRING_CACHE", path)
+    monkeypatch.setattr(result_cache, "_default", {})
+    calls = []
+
+    @result_cache.shared("square")
+    def square(x):
+        calls.append(x)
+        return x * x
+
+    assert square(3) == 9 and square(3) == 9
+    assert calls == [3]
+    # Nothing left for the exit hook to write once tmp_path is gone
+    result_cache._default[path].flush_counters()
+    monkeypatch.setenv("SPRING_CACHE", "off")
+    assert square(3) == 9
+    assert calls == [3, 3]
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from kinematics import leverage_curve
+from ride_sim import simulate_ride, sprung_mass_kg, synthetic_track
+from spring_data import PRELOAD_MM_PER_TURN
+from spring_engine import resulting_sag_pct
+
+TRACK = synthetic_track(600.0, seed=3)
+REAR_LOAD_LBS, UNSPRUNG_KG = 180.0, 17.0
+TRAVEL, STROKE = 160.0, 62.5
+
+# ==========================================================
+# A stiffer spring never uses its end stop more often
+# ==========================================================
+@pytest.mark.parametrize("hbo", [False, True])
+def test_stiffer_spring_never_bottoms_out_more(hbo):
+    rates = np.arange(300.0, 651.0, 50.0)
+    out = simulate_ride(TRACK, sprung_mass_kg(REAR_LOAD_LBS), UNSPRUNG_KG, rates, TRAVEL, STROKE,
+                        preload_turns=(0.0, 2.0), hbo=hbo)
+    bottoms = out["bottom_outs"].sum(axis=0)
+    assert bottoms.shape == (len(rates), 2)
+    assert bottoms[0, 0] > 0  # The softest spring must actually bottom out
+    assert np.all(np.diff(bottoms, axis=0) <= 0)
+
+# ==========================================================
+# Static sag matches the engine's equilibrium
+# ==========================================================
+@pytest.mark.parametrize("spring_type,tol", [("Standard Steel (Linear)", 1e-4), ("Progressive Coil", 0.05)])
+def test_static_sag_matches_engine(spring_type, tol):
+    rates = np.array([350.0, 450.0, 550.0])
+    turns = np.array([0.0, 1.0, 2.0])
+    out = simulate_ride(TRACK, sprung_mass_kg(REAR_LOAD_LBS), UNSPRUNG_KG, rates, TRAVEL, STROKE,
+                        speeds=[5.0], preload_turns=turns, spring_type=spring_type, segment_s=0.01, warmup_s=0.0)
+    expected = resulting_sag_pct(REAR_LOAD_LBS, TRAVEL / STROKE, rates[:, None], STROKE, spring_type=spring_type,
+                                 preload_mm=turns[None, :] * PRELOAD_MM_PER_TURN)
+    np.testing.assert_allclose(out["static_sag_pct"], expected, atol=tol)
+
+# ==========================================================
+# Candidates integrated together match each candidate alone
+# ==========================================================
+def test_rows_match_single_candidate_runs():
+    curve = leverage_curve([0.0, 80.0, TRAVEL], leverage=[2.9, 2.6, 2.4])
+    rates, turns = np.array([380.0, 450.0, 520.0]), (0.0, 1.5)
+    kwargs = dict(speeds=[6.0, 10.0], curve=curve, hbo=True, spring_type="Progressive Coil")
+    together = simulate_ride(TRACK, sprung_mass_kg(REAR_LOAD_LBS), UNSPRUNG_KG, rates, TRAVEL, curve.stroke,
+                             preload_turns=turns, **kwargs)
+    for r, rate in enumerate(rates):
+        for q, turn in enumerate(turns):
+            alone = simulate_ride(TRACK, sprung_mass_kg(REAR_LOAD_LBS), UNSPRUNG_KG, [rate], TRAVEL, curve.stroke,
+                                  preload_turns=(turn,), **kwargs)
+            np.testing.assert_array_equal(together["bottom_outs"][:, r, q], alone["bottom_outs"][:, 0, 0])
+            for key in ["max_travel_mm", "mean_travel_pct", "peak_wheel_force_n", "peak_shock_force_n"]:
+                np.testing.assert_allclose(together[key][:, r, q], alone[key][:, 0, 0], rtol=1e-9)
+            assert together["static_sag_pct"][r, q] == pytest.approx(alone["static_sag_pct"][0, 0], rel=1e-12)
@@ -0,0 +1,66 @@
+import os
+import re
+import zipfile
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from setup_sheets import export_sheets, sheet_name
+
+N_RIDERS = 23
+
+def _riders(tmp_path, bad_row=None):
+    rng = np.random.default_rng(4)
+    names = [f"Rider Ånne {i}" if i % 7 else "" for i in range(N_RIDERS)]
+    df = pd.DataFrame({
+        "rider": names,
+        "rider_kg": rng.uniform(50, 110, N_RIDERS).round(1),
+        "category": rng.choice(["Trail", "Enduro", "Downhill (DH)"], N_RIDERS),
+        "spring_type": rng.choice(["Standard Steel (Linear)", "Sprindex", "Progressive Coil"], N_RIDERS),
+    })
+    if bad_row is not None:
+        df.loc[bad_row, "category"] = "Unicycle"
+    path = tmp_path / "riders.csv"
+    df.to_csv(path, index=False)
+    return str(path), names
+
+def _expected_names(names):
+    labels = [n or f"Rider {i + 1}" for i, n in enumerate(names)]
+    return [sheet_name(i, label, "html") for i, label in enumerate(labels)] + ["index.html"]
+
+# ==========================================================
+# Sheets come out in input order, whatever the worker count
+# ==========================================================
+def test_export_order_and_index_for_any_worker_count(tmp_path):
+    in_path, names = _riders(tmp_path)
+    archives = {}
+    for workers in (1, 2):
+        out = str(tmp_path / f"sheets_{workers}.zip")
+        assert export_sheets(in_path, out, chunk_rows=4, workers=workers, event="Cup R3") == N_RIDERS
+        with zipfile.ZipFile(out) as z:
+            archives[workers] = {name: z.read(name) for name in z.namelist()}
+            assert z.namelist() == _expected_names(names)
+
+    assert archives[1] == archives[2]
+    index = archives[1]["index.html"].decode("utf-8")
+    body = index.split("<tbody>", 1)[1]
+    assert body.count("<tr>") == N_RIDERS
+    assert f"<p>{N_RIDERS} riders</p>" in index and "Cup R3" in index
+    # Index rows follow the sheets, in order
+    assert re.findall(r"\d{6}_[A-Za-z0-9_]+\.html", body) == _expected_names(names)[:-1]
+    sheet = archives[1][_expected_names(names)[0]].decode("utf-8")
+    assert "Rider Ånne" not in sheet and "Rider 1" in sheet
+
+# ==========================================================
+# A failed export leaves nothing behind
+# ==========================================================
+@pytest.mark.parametrize("workers", [1, 2])
+def test_failed_export_leaves_no_tmp_file(tmp_path, workers):
+    in_path, _ = _riders(tmp_path, bad_row=17)
+    out = tmp_path / "sheets.zip"
+    out.write_bytes(b"previous archive")
+    with pytest.raises(ValueError, match="Unknown categories"):
+        export_sheets(in_path, str(out), chunk_rows=4, workers=workers)
+    assert out.read_bytes() == b"previous archive"
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
@@ -0,0 +1,151 @@
+import json
+import shutil
+
+import numpy as np
+import pytest
+
+import reference_tables
+import setup_store
+from kinematics import leverage_curve
+from spring_engine import preload_sag_pct
+
+CATEGORIES = ["Trail", "Enduro"]
+SPRING_TYPES = ["Standard Steel (Linear)", "Progressive Coil"]
+
+@pytest.fixture
+def tables(tmp_path, monkeypatch):
+    # A private copy of the data file; edit() changes it and reloads like the app does
+    path = tmp_path / "spring_tables.json"
+    shutil.copy(reference_tables.DEFAULT_PATH, path)
+    monkeypatch.setenv("SPRING_TABLES", str(path))
+    reference_tables.reload()
+
+    def edit(change):
+        doc = json.loads(path.read_text())
+        change(doc)
+        path.write_text(json.dumps(doc))
+        reference_tables.reload()
+
+    yield edit
+    monkeypatch.undo()
+    reference_tables.reload()
+
+@pytest.fixture
+def store(tmp_path, tables):
+    conn = setup_store.connect(str(tmp_path / "setups.db"))
+    rng = np.random.default_rng(5)
+    records = []
+    for i in range(40):
+        records.append({
+            "customer": f"rider {i}",
+            "category": CATEGORIES[i % 2],
+            "spring_type": SPRING_TYPES[(i // 2) % 2],
+            "rider_kg": float(rng.uniform(55, 105)),
+            # Every fourth rider entered their own bias, so no category bias applies to them
+            "bias_pct": 66.0 if i % 4 == 0 else None,
+        })
+    setup_store.import_setups(conn, records)
+    yield conn
+    conn.close()
+
+def _rows(conn):
+    return {r["id"]: r for r in setup_store.find_setups(conn)}
+
+def _refreshed_ids(before, after):
+    # Rows whose sized columns were rewritten (their values change with the edit)
+    return {i for i in before if before[i]["rear_load_lbs"] != after[i]["rear_load_lbs"]
+            or before[i]["recommended_rate"] != after[i]["recommended_rate"]
+            or before[i]["resulting_sag_pct"] != after[i]["resulting_sag_pct"]}
+
+def test_refresh_without_changes_recomputes_nothing(store):
+    report = setup_store.refresh(store)
+    assert report == {"changed_keys": [], "recomputed": 0, "flagged": 0, "orphaned": 0}
+
+def test_category_default_only_recomputes_rows_that_use_it(store, tables):
+    before = _rows(store)
+    tables(lambda doc: doc["category_data"]["Enduro"].update(bias=72))
+    report = setup_store.refresh(store)
+
+    expected = {i for i, r in before.items() if r["category"] == "Enduro" and r["bias_pct"] is None}
+    assert report["changed_keys"] == ["category/Enduro/bias_pct"]
+    assert report["recomputed"] == len(expected)
+    after = _rows(store)
+    assert _refreshed_ids(before, after) == expected
+    # The heavier rear load moves some recommendations; those are flagged with the old rate
+    flagged = {i for i, r in after.items() if r["recommendation_changed"]}
+    assert flagged and flagged <= expected
+    assert report["flagged"] == len(flagged)
+    for i in flagged:
+        assert after[i]["previous_rate"] == before[i]["recommended_rate"]
+    assert setup_store.refresh(store)["recomputed"] == 0
+
+def test_coupling_change_only_recomputes_its_category(store, tables):
+    before = _rows(store)
+    tables(lambda doc: doc["coupling_coeffs"].update(Trail=0.5))
+    report = setup_store.refresh(store)
+
+    expected = {i for i, r in before.items() if r["category"] == "Trail"}
+    assert report["changed_keys"] == ["coupling/Trail"]
+    assert report["recomputed"] == len(expected)
+    assert _refreshed_ids(before, _rows(store)) == expected
+
+def test_refreshed_rows_match_a_fresh_import(store, tables, tmp_path):
+    tables(lambda doc: doc["category_data"]["Trail"].update(base_sag=26))
+    setup_store.refresh(store)
+    fresh = setup_store.connect(str(tmp_path / "fresh.db"))
+    rows = _rows(store)
+    setup_store.import_setups(fresh, [{k: r[k] for k in setup_store.INPUT_COLUMNS} for r in rows.values()])
+    for old, new in zip(rows.values(), _rows(fresh).values()):
+        for key in ["rear_load_lbs", "effective_lr", "recommended_rate", "resulting_sag_pct"]:
+            assert new[key] == pytest.approx(old[key], rel=1e-12)
+    fresh.close()
+
+def test_spring_model_change_only_recomputes_that_type(store, monkeypatch):
+    before = _rows(store)
+    monkeypatch.setitem(setup_store.SPRING_MODELS, "Progressive Coil",
+                        {"kind": "progressive", "progression_pct": 30.0})
+    report = setup_store.refresh(store)
+    assert report["changed_keys"] == ["spring_model/Progressive Coil"]
+    assert report["recomputed"] == sum(r["spring_type"] == "Progressive Coil" for r in before.values())
+
+def test_sprindex_range_change_recomputes_sprindex_rows(store, tables):
+    setup_id = setup_store.save_setup(store, {"customer": "sprindex", "category": "Enduro",
+                                              "spring_type": "Sprindex", "rider_kg": 80.0})
+    before = _rows(store)
+    assert before[setup_id]["recommended_rate"] == 425.0
+
+    def narrow(doc):
+        doc["sprindex_data"]["Enduro (65mm)"]["ranges"][1] = "390-426"
+    tables(narrow)
+    report = setup_store.refresh(store)
+    assert report["changed_keys"] == ["sprindex/Enduro (65mm)"]
+    assert report["recomputed"] == 1 and report["flagged"] == 1
+    row = _rows(store)[setup_id]
+    fresh = setup_store._size_rows([tuple(row[k] for k in setup_store.INPUT_COLUMNS)])[2][0]
+    assert row["recommended_rate"] == fresh == 426.0
+    assert row["previous_rate"] == 425.0
+
+@pytest.mark.parametrize("spring_type", ["Standard Steel (Linear)", "Progressive Coil", "Dual-Rate Coil"])
+@pytest.mark.parametrize("on_frame", [False, True])
+def test_stored_sag_matches_engine_preload_table(store, monkeypatch, spring_type, on_frame):
+    # Preload goes through the spring's force curve and the frame's leverage curve, as in the app
+    curve = leverage_curve([0.0, 160.0], leverage=[3.2, 2.4])
+    monkeypatch.setattr(setup_store, "_frame_curves", lambda frames: {"test/frame": curve} if on_frame else {})
+    record = {"customer": "preload", "category": "Enduro", "spring_type": spring_type, "rider_kg": 80.0,
+              "spring_rate": 450.0, "preload_turns": 3.0, "frame": "test/frame" if on_frame else ""}
+    setup_id = setup_store.save_setup(store, record)
+    row = _rows(store)[setup_id]
+
+    expected = preload_sag_pct(row["rear_load_lbs"], row["effective_lr"], 450.0, 62.5, [3.0],
+                               curve if on_frame else None, spring_type)[0]
+    assert row["resulting_sag_pct"] == pytest.approx(expected, rel=1e-12)
+
+def test_save_setup_returns_its_own_id(store, tmp_path):
+    # Another connection writing in between must not change the id handed back
+    other = setup_store.connect(str(tmp_path / "setups.db"))
+    first = setup_store.save_setup(store, {"customer": "a", "category": "Trail", "rider_kg": 70.0})
+    setup_store.import_setups(other, [{"customer": "b", "category": "Trail", "rider_kg": 71.0}] * 3)
+    second = setup_store.save_setup(store, {"customer": "c", "category": "Trail", "rider_kg": 72.0})
+    rows = _rows(store)
+    assert (rows[first]["customer"], rows[second]["customer"]) == ("a", "c")
+    other.close()
@@ -0,0 +1,96 @@
+import numpy as np
+import pytest
+
+import sprindex
+from sprindex import compile_sprindex, match_sprindex
+
+# The shipped tables: overlapping (430-500 / 490-560), touching
+# (380-430 / 430-500) and gapped (390-430 / 450-500) neighbours
+TABLE = {
+    "XC/Trail (55mm)": {"max_stroke": 55, "ranges": ["380-430", "430-500", "490-560", "550-610", "610-690", "650-760"]},
+    "Enduro (65mm)": {"max_stroke": 65, "ranges": ["340-380", "390-430", "450-500", "500-550", "540-610", "610-700"]},
+    "DH (75mm)": {"max_stroke": 75, "ranges": ["290-320", "340-370", "400-440", "450-490", "510-570", "570-630"]},
+}
+
+@pytest.fixture(autouse=True)
+def fixed_table(monkeypatch):
+    families = compile_sprindex(TABLE)
+    monkeypatch.setattr(sprindex, "_COMPILED",
+                        (families, list(families), np.array([f["max_stroke"] for f in families.values()])))
+
+def _reference(raw_rate, stroke_mm):
+    # The original app.py loop: first family covering the stroke, first range
+    # containing the rate, else the last pair of ranges the rate falls between
+    family = next((name for name, fam in sorted(TABLE.items(), key=lambda kv: kv[1]["max_stroke"])
+                   if stroke_mm <= fam["max_stroke"]), None)
+    if family is None:
+        return {"status": "stroke"}
+    ranges = TABLE[family]["ranges"]
+    gap = None
+    for i, r_str in enumerate(ranges):
+        low, high = map(int, r_str.split("-"))
+        if low <= raw_rate <= high:
+            return {"status": "fit", "family": family, "fit_range": r_str,
+                    "tuning_rate": round(raw_rate / 5) * 5}
+        if i > 0:
+            prev_high = int(ranges[i - 1].split("-")[1])
+            if prev_high < raw_rate < low:
+                gap = (ranges[i - 1], prev_high, r_str, low)
+    if gap:
+        return {"status": "gap", "family": family, "option_a_range": gap[0], "option_a": gap[1],
+                "option_b_range": gap[2], "option_b": gap[3], "tuning_rate": gap[1]}
+    return {"status": "outside", "family": family, "tuning_rate": int(raw_rate)}
+
+def test_matches_reference_loop():
+    rng = np.random.default_rng(11)
+    # Whole numbers hit every range edge exactly; fractions land between them
+    rates = np.concatenate([np.arange(250, 800, 1.0), rng.uniform(250, 800, 2000)])
+    strokes = np.array([45.0, 55.0, 57.5, 65.0, 70.0, 75.0, 80.0])
+    raw, stroke = (a.ravel() for a in np.meshgrid(rates, strokes))
+    res = match_sprindex(raw, stroke)
+    for i in range(len(raw)):
+        ref = _reference(raw[i], stroke[i])
+        for key, value in ref.items():
+            assert res[key][i] == value, (raw[i], stroke[i], key)
+
+@pytest.mark.parametrize("rate, fit_range", [
+    (430, "380-430"),   # shared edge goes to the lower range
+    (495, "430-500"),   # overlap goes to the lower range
+    (500, "430-500"),
+    (550, "490-560"),
+    (655, "610-690"),
+])
+def test_overlapping_ranges_pick_the_first(rate, fit_range):
+    res = match_sprindex(rate, 55.0)
+    assert res["status"] == "fit"
+    assert res["fit_range"] == fit_range
+
+def test_gap_options_and_sags():
+    res = match_sprindex(440.0, 62.5, rear_load=300.0, effective_lr=2.6)
+    assert res["status"] == "gap"
+    assert (res["option_a_range"], res["option_a"]) == ("390-430", 430)
+    assert (res["option_b_range"], res["option_b"]) == ("450-500", 450)
+    assert res["tuning_rate"] == 430
+    # The softer option A always sags more than option B
+    assert res["option_a_sag_pct"] > res["option_b_sag_pct"]
+
+def test_outside_and_stroke_statuses():
+    res = match_sprindex([300.0, 800.0, 450.0], [55.0, 62.5, 80.0])
+    assert list(res["status"]) == ["outside", "outside", "stroke"]
+    assert list(res["family"]) == ["XC/Trail (55mm)", "Enduro (65mm)", ""]
+    assert np.isnan(res["option_a"]).all()
+
+def test_longer_family_is_the_first_longer_one_that_fits():
+    # 300 is below every XC/Trail range but fits the DH 290-320 range, which covers 50 mm too
+    res = match_sprindex(300.0, 50.0)
+    assert res["status"] == "outside"
+    assert (res["longer_family"], res["longer_range"]) == ("DH (75mm)", "290-320")
+    # 440 is in a DH range but a gap for Enduro: only DH is longer than Enduro
+    res = match_sprindex(440.0, 62.5)
+    assert (res["status"], res["longer_family"], res["longer_range"]) == ("gap", "DH (75mm)", "400-440")
+    # Nothing is longer than DH
+    assert match_sprindex(330.0, 75.0)["longer_family"] == ""
+
+def test_unsorted_ranges_are_rejected():
+    with pytest.raises(ValueError, match="sorted ascending"):
+        compile_sprindex({"Bad": {"max_stroke": 55, "ranges": ["400-450", "380-420"]}})
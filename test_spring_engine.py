@@ -0,0 +1,120 @@
+import numpy as np
+import pytest
+
+from spring_data import KG_TO_LB, MM_TO_IN, PRELOAD_TURNS
+from spring_engine import (
+    compute_spring_rates, option_fit_tags, preload_status_tags, standard_spring_options,
+)
+
+# ==========================================================
+# Reference: the scalar formulas of the original app.py (one rider at a
+# time, linear springs). The engine must reproduce them row for row.
+# ==========================================================
+def _baseline(rider_kg, gear_kg, bike_kg, unsprung_kg, bias_pct, stroke_mm, travel_mm,
+              target_sag, coupling, lr_start=None, lr_end=None):
+    if lr_start is not None:
+        effective_lr = lr_start - ((lr_start - lr_end) * (target_sag / 100))
+    else:
+        effective_lr = travel_mm / stroke_mm
+    system_kg = rider_kg + (gear_kg * coupling) + bike_kg
+    rear_load_lbs = ((system_kg * (bias_pct / 100)) - unsprung_kg) * KG_TO_LB
+    sag_mm = stroke_mm * (target_sag / 100)
+    raw_rate = (rear_load_lbs * effective_lr) / (sag_mm * MM_TO_IN)
+
+    center_rate = int(round(raw_rate / 25) * 25)
+    options = []
+    for rate in [center_rate - 25, center_rate, center_rate + 25]:
+        if rate <= 0:
+            options.append((np.nan, np.nan, ""))
+            continue
+        sag_pct = ((rear_load_lbs * effective_lr) / (rate * MM_TO_IN) / stroke_mm) * 100
+        if rate == center_rate: tag = "✅ Recommended"
+        elif sag_pct > 35: tag = "⚠️ Too Soft"
+        elif sag_pct < 25: tag = "⚠️ Too Stiff"
+        else: tag = "Alternative"
+        options.append((rate, sag_pct, tag))
+
+    preload = []
+    for turns in PRELOAD_TURNS:
+        sag_in_eff = (rear_load_lbs * effective_lr / center_rate) - turns * 1.0 * MM_TO_IN
+        sag_pct_eff = (sag_in_eff / (stroke_mm * MM_TO_IN)) * 100
+        status = "✅"
+        if turns >= 3.0: status = "⚠️ Excessive"
+        elif sag_pct_eff < 25: status = "⚠️ Too Stiff"
+        preload.append((sag_pct_eff, status))
+
+    return {
+        "effective_lr": effective_lr,
+        "rear_load_lbs": rear_load_lbs,
+        "raw_rate": raw_rate,
+        "rounded_rate": center_rate,
+        "options": options,
+        "preload": preload,
+    }
+
+def _random_riders(n, seed, advanced):
+    rng = np.random.default_rng(seed)
+    riders = {
+        "rider_kg": rng.uniform(40, 130, n),
+        "gear_kg": rng.uniform(0, 10, n),
+        "bike_kg": rng.uniform(11, 22, n),
+        "unsprung_kg": rng.uniform(3, 6, n),
+        "bias_pct": rng.uniform(55, 75, n),
+        "stroke_mm": rng.choice([45.0, 50.0, 55.0, 57.5, 60.0, 62.5, 65.0, 75.0], n),
+        "travel_mm": rng.uniform(110, 210, n),
+        "target_sag": rng.uniform(20, 40, n),
+        "coupling": rng.uniform(0.5, 0.9, n),
+    }
+    if advanced:
+        riders["lr_start"] = rng.uniform(2.6, 3.6, n)
+        riders["lr_end"] = riders["lr_start"] - rng.uniform(0.0, 0.9, n)
+    return riders
+
+@pytest.mark.parametrize("advanced", [False, True])
+@pytest.mark.parametrize("spring_type", ["Standard Steel (Linear)", "Lightweight Steel/Ti"])
+def test_engine_matches_baseline_formulas(advanced, spring_type):
+    n = 500
+    riders = _random_riders(n, seed=7 + advanced, advanced=advanced)
+    res = compute_spring_rates(
+        riders["rider_kg"], riders["gear_kg"], riders["bike_kg"], riders["unsprung_kg"], riders["bias_pct"],
+        riders["stroke_mm"], riders["travel_mm"], riders["target_sag"], np.full(n, spring_type),
+        riders["coupling"], riders.get("lr_start"), riders.get("lr_end"),
+    )
+    rates, sags = standard_spring_options(res["rear_load_lbs"], res["effective_lr"], res["rounded_rate"],
+                                          riders["stroke_mm"])
+    tags = option_fit_tags(rates, res["rounded_rate"], sags)
+    preload_tags = preload_status_tags(res["preload_sag_pct"])
+
+    for i in range(n):
+        ref = _baseline(**{k: float(v[i]) for k, v in riders.items()})
+        for key in ["effective_lr", "rear_load_lbs", "raw_rate"]:
+            assert res[key][i] == pytest.approx(ref[key], rel=1e-12)
+        assert res["rounded_rate"][i] == ref["rounded_rate"]
+        for j, (rate, sag_pct, tag) in enumerate(ref["options"]):
+            if np.isnan(rate):
+                assert np.isnan(rates[i, j])
+                continue
+            assert rates[i, j] == rate
+            assert sags[i, j] == pytest.approx(sag_pct, rel=1e-12)
+            assert tags[i, j] == tag
+        for j, (sag_pct, status) in enumerate(ref["preload"]):
+            assert res["preload_sag_pct"][i, j] == pytest.approx(sag_pct, rel=1e-9, abs=1e-9)
+            assert preload_tags[i, j] == status
+
+def test_scalar_inputs_match_vectorized_rows():
+    riders = _random_riders(20, seed=3, advanced=True)
+    spring_type = np.full(20, "Standard Steel (Linear)")
+    keys = ["rider_kg", "gear_kg", "bike_kg", "unsprung_kg", "bias_pct", "stroke_mm", "travel_mm", "target_sag"]
+    batch = compute_spring_rates(*(riders[k] for k in keys), spring_type, riders["coupling"],
+                                 riders["lr_start"], riders["lr_end"])
+    for i in range(20):
+        one = compute_spring_rates(*(float(riders[k][i]) for k in keys), "Standard Steel (Linear)",
+                                   float(riders["coupling"][i]), float(riders["lr_start"][i]),
+                                   float(riders["lr_end"][i]))
+        assert float(one["raw_rate"]) == batch["raw_rate"][i]
+        np.testing.assert_array_equal(one["preload_sag_pct"], batch["preload_sag_pct"][i])
+
+def test_sprindex_rounds_to_five():
+    res = compute_spring_rates(80, 4, 15, 4.27, 65, 62.5, 160, 30, "Sprindex", 0.7)
+    assert float(res["rounded_rate"]) % 5 == 0
+    assert abs(float(res["rounded_rate"]) - float(res["raw_rate"])) <= 2.5
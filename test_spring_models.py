@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+
+from spring_data import MM_TO_IN, SPRING_MODELS, SPRING_TYPES
+from spring_models import (
+    TABLE_SPAN, SpringShape, compression_mm, equivalent_mm, spring_codes, spring_force_lbs, spring_shape,
+)
+
+STROKE = 62.5
+NONLINEAR = [t for t in SPRING_TYPES if spring_shape(t) is not None]
+
+# ==========================================================
+# The inverse table undoes the forward table, inside and past the span
+# ==========================================================
+@pytest.mark.parametrize("spring_type", SPRING_TYPES)
+def test_compression_round_trips_equivalent(spring_type):
+    # The dual-rate kink falls between grid points, where the two tables
+    # cut the corner differently by a small fraction of a grid step
+    tol = (2e-5 if spring_type == "Dual-Rate Coil" else 1e-6) * STROKE
+    x = np.linspace(-0.2, 3.5 * TABLE_SPAN, 4001) * STROKE
+    back = compression_mm(equivalent_mm(x, STROKE, spring_type), STROKE, spring_type)
+    np.testing.assert_allclose(back, x, rtol=0, atol=tol)
+    forward = equivalent_mm(compression_mm(x, STROKE, spring_type), STROKE, spring_type)
+    np.testing.assert_allclose(forward, x, rtol=0, atol=tol)
+
+def test_end_coil_shape_round_trips():
+    shape = SpringShape("progressive", end_coil=0.4, progression_pct=20.0)
+    u = np.linspace(0.0, 1.5, 3001)
+    np.testing.assert_allclose(shape.compression_of(shape.equivalent_of(u)), u, atol=1e-6)
+    # Softer while the end coils seat, unchanged past the seat
+    plain = SpringShape("progressive", progression_pct=20.0)
+    assert np.all(shape.equivalent_of(u[1:]) < plain.equivalent_of(u[1:]))
+    np.testing.assert_allclose(np.diff(shape.equivalent_of([0.5, 1.0])), np.diff(plain.equivalent_of([0.5, 1.0])),
+                               rtol=1e-9)
+
+@pytest.mark.parametrize("spring_type", NONLINEAR)
+def test_tables_carry_on_past_span(spring_type):
+    shape = spring_shape(spring_type)
+    edge = TABLE_SPAN * STROKE
+    x = edge + np.array([0.0, 1e-9, 1.0, 50.0, 500.0])
+    force = equivalent_mm(x, STROKE, spring_type)
+    # Continuous at the edge, then the end rate of the table
+    assert force[1] == pytest.approx(force[0], abs=1e-6)
+    np.testing.assert_allclose(np.diff(force[1:]) / np.diff(x[1:]), shape.ratio_end, rtol=1e-9)
+    assert np.all(np.diff(force) > 0)
+    assert np.all(np.isfinite(force))
+    assert np.isnan(equivalent_mm(np.nan, STROKE, spring_type))
+
+# ==========================================================
+# Mixed batches match one type at a time
+# ==========================================================
+def test_mixed_batch_matches_per_type_calls():
+    rng = np.random.default_rng(0)
+    n = 500
+    types = rng.choice(SPRING_TYPES, n)
+    strokes = rng.choice([45.0, 55.0, 62.5, 75.0], n)
+    x = rng.uniform(-5.0, 160.0, n)
+    for fn in (equivalent_mm, compression_mm):
+        by_name = fn(x, strokes, types)
+        by_code = fn(x, strokes, spring_codes(types))
+        one_by_one = np.array([float(fn(x[i], strokes[i], types[i])) for i in range(n)])
+        np.testing.assert_array_equal(by_name, by_code)
+        np.testing.assert_allclose(by_name, one_by_one, rtol=1e-12, atol=1e-12)
+        for t in SPRING_TYPES:
+            rows = types == t
+            np.testing.assert_array_equal(by_name[rows], fn(x[rows], strokes[rows], t))
+    linear = np.isin(types, ["Standard Steel (Linear)", "Lightweight Steel/Ti", "Sprindex"])
+    np.testing.assert_array_equal(equivalent_mm(x, strokes, types)[linear], x[linear])
+
+# ==========================================================
+# A progressive coil matches solving its force equation directly
+# ==========================================================
+def test_progressive_coil_matches_root_finding():
+    progression = SPRING_MODELS["Progressive Coil"]["progression_pct"] / 100
+    rate = 450.0
+    force = np.linspace(0.0, 1.6, 200) * STROKE * rate * MM_TO_IN
+
+    def exact_force(x):
+        # Local rate rises linearly with compression, so force is its integral
+        u = x / STROKE
+        return rate * STROKE * (u + progression * u * u / 2) * MM_TO_IN
+
+    lo, hi = np.zeros_like(force), np.full_like(force, TABLE_SPAN * STROKE)
+    for _ in range(200):
+        mid = (lo + hi) / 2
+        below = exact_force(mid) < force
+        lo, hi = np.where(below, mid, lo), np.where(below, hi, mid)
+    solved = (lo + hi) / 2
+
+    equivalent = force / (rate * MM_TO_IN)
+    np.testing.assert_allclose(compression_mm(equivalent, STROKE, "Progressive Coil"), solved, atol=1e-6 * STROKE)
+    np.testing.assert_allclose(spring_force_lbs(rate, solved, STROKE, "Progressive Coil"), force,
+                               rtol=1e-6, atol=1e-4)
@@ -0,0 +1,96 @@
+import csv
+import json
+import shutil
+
+import numpy as np
+import pytest
+
+import reference_tables
+import sweep
+from spring_data import SKILL_MODIFIERS
+
+AXES = {
+    "rider_kg": np.array([60.0, 80.0, 100.0]),
+    "gear_kg": np.array([0.0, 4.0]),
+    "bias_pct": np.array([60.0, 65.0, 70.0]),
+    "target_sag": np.array([25.0, 30.0]),
+    "stroke_mm": np.array([55.0, 62.5, 65.0]),
+}
+
+@pytest.fixture
+def tables(tmp_path, monkeypatch):
+    # A private copy of the data file; edit() changes it and reloads like the app does
+    path = tmp_path / "spring_tables.json"
+    shutil.copy(reference_tables.DEFAULT_PATH, path)
+    monkeypatch.setenv("SPRING_TABLES", str(path))
+    reference_tables.reload()
+
+    def edit(change):
+        doc = json.loads(path.read_text())
+        change(doc)
+        path.write_text(json.dumps(doc))
+        reference_tables.reload()
+
+    yield edit
+    monkeypatch.undo()
+    reference_tables.reload()
+
+def test_sweep_shape_and_skill_offsets():
+    skills = list(sweep.SKILL_AXIS)
+    result = sweep.run_sweep(["Enduro"], AXES)["Enduro"]
+    shape = tuple(len(AXES[k]) for k in ["rider_kg", "gear_kg", "bias_pct"]) + (
+        len(skills), len(AXES["target_sag"]), len(AXES["stroke_mm"]))
+    assert {k: v.shape for k, v in result.items()} == {k: shape for k in sweep.RESULT_KEYS}
+
+    # Each skill is the same grid at bias_pct + that skill's bias offset
+    for s, skill in enumerate(skills):
+        shifted = sweep.sweep_grid("Enduro", AXES["rider_kg"], AXES["gear_kg"],
+                                   AXES["bias_pct"] + SKILL_MODIFIERS[skill]["bias"],
+                                   AXES["target_sag"], AXES["stroke_mm"], skills=["Intermediate"])
+        for k in sweep.RESULT_KEYS:
+            np.testing.assert_allclose(result[k][:, :, :, s], shifted[k][:, :, :, 0], rtol=1e-6)
+
+def test_parallel_shards_match_serial():
+    serial = sweep.run_sweep(["Trail", "Enduro"], AXES)
+    parallel = sweep.run_sweep(["Trail", "Enduro"], AXES, workers=2)
+    for category, result in serial.items():
+        for k in sweep.RESULT_KEYS:
+            np.testing.assert_array_equal(parallel[category][k], result[k])
+
+def test_save_uses_the_swept_skills_after_a_reload(tables, tmp_path):
+    skills = list(sweep.SKILL_AXIS)
+    result = sweep.run_sweep(["Enduro"], AXES, skills=skills)["Enduro"]
+    # A reload that drops a skill must not shift the saved axis or the chart's skill
+    tables(lambda doc: doc["skill_modifiers"].pop(skills[0]))
+    assert sweep.SKILL_AXIS == skills[1:]
+    sweep.save_sweep(str(tmp_path), "Enduro", AXES, result, skills, gear_kg=4.0)
+
+    saved = np.load(tmp_path / "enduro.npz")
+    assert list(saved["skills"]) == skills
+    np.testing.assert_array_equal(saved["recommended_rate"], result["recommended_rate"])
+
+    with open(tmp_path / "enduro_chart.csv", newline="") as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == ["stroke_mm", "rider_kg", "sag_25", "sag_30"]
+    assert len(rows) == 1 + len(AXES["stroke_mm"]) * len(AXES["rider_kg"])
+    bi = int(np.abs(AXES["bias_pct"] - sweep.CATEGORY_DATA["Enduro"]["bias"]).argmin())
+    chart = result["recommended_rate"][:, 1, bi, skills.index("Intermediate")]
+    assert [float(v) for v in rows[1][2:]] == [round(float(v)) for v in chart[0, :, 0]]
+
+def test_chart_skill_follows_the_tables(tables, tmp_path):
+    skills = list(sweep.SKILL_AXIS)
+    result = sweep.run_sweep(["Enduro"], AXES, skills=skills)["Enduro"]
+    with pytest.raises(ValueError, match="'Expert' is not on the swept skill axis"):
+        sweep.save_sweep(str(tmp_path), "Enduro", AXES, result, skills, skill="Expert")
+
+    # Without a zero-offset skill the chart takes the first one
+    def rename(doc):
+        doc["skill_modifiers"] = {"Weekend": {"bias": 1}, "Pro": {"bias": -2}}
+    tables(rename)
+    assert sweep.chart_skill(sweep.SKILL_AXIS) == "Weekend"
+    result = sweep.run_sweep(["Enduro"], AXES)["Enduro"]
+    sweep.save_sweep(str(tmp_path), "Enduro", AXES, result, list(sweep.SKILL_AXIS))
+    with open(tmp_path / "enduro_chart.csv", newline="") as f:
+        rows = list(csv.reader(f))
+    bi = int(np.abs(AXES["bias_pct"] - sweep.CATEGORY_DATA["Enduro"]["bias"]).argmin())
+    assert [float(v) for v in rows[1][2:]] == [round(float(v)) for v in result["recommended_rate"][0, 1, bi, 0, :, 0]]
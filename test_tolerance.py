@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+import tolerance
+from kinematics import leverage_curve
+from tolerance import SAG_BIN_WIDTH, sag_tolerance
+
+NOMINAL = (68.0, 4.0, 16.5, 4.27, 65.0, 0.6)  # rider, gear, bike, unsprung, bias, coupling
+RATES = [400.0, 450.0, 500.0]
+CURVE = leverage_curve([0.0, 80.0, 160.0], leverage=[3.0, 2.7, 2.5])
+
+# ==========================================================
+# The same seed gives the same answer for any number of workers
+# ==========================================================
+@pytest.mark.parametrize("curve", [None, CURVE])
+def test_workers_do_not_change_results(curve):
+    kwargs = dict(draws=130_000, chunk_draws=30_000, seed=7, spring_type="Progressive Coil", curve=curve)
+    one = sag_tolerance(*NOMINAL, 2.8, 62.5, RATES, workers=1, **kwargs)
+    many = sag_tolerance(*NOMINAL, 2.8, 62.5, RATES, workers=3, **kwargs)
+    np.testing.assert_array_equal(one["hist_counts"], many["hist_counts"])
+    assert one["hist_counts"].sum(axis=1).tolist() == [130_000] * len(RATES)
+    for key in ["mean_sag_pct", "std_sag_pct", "p05_sag_pct", "p50_sag_pct", "p95_sag_pct", "p_outside"]:
+        np.testing.assert_array_equal(one[key], many[key])
+
+    other_seed = sag_tolerance(*NOMINAL, 2.8, 62.5, RATES, workers=1, **dict(kwargs, seed=8))
+    assert not np.array_equal(one["hist_counts"], other_seed["hist_counts"])
+
+# ==========================================================
+# Histogram statistics match the raw draws
+# ==========================================================
+@pytest.mark.parametrize("curve", [None, CURVE])
+def test_percentiles_match_raw_samples(monkeypatch, curve):
+    raw = []
+
+    def recording(fn):
+        def wrapper(*args, **kwargs):
+            sags = fn(*args, **kwargs)
+            raw.append(sags)
+            return sags
+        return wrapper
+
+    monkeypatch.setattr(tolerance, "resulting_sag_pct", recording(tolerance.resulting_sag_pct))
+    monkeypatch.setattr(tolerance, "_curve_sags", recording(tolerance._curve_sags))
+    out = sag_tolerance(*NOMINAL, 2.8, 62.5, RATES, draws=90_000, chunk_draws=40_000, seed=3, curve=curve)
+    sags = np.concatenate(raw)
+    assert sags.shape == (90_000, len(RATES))
+
+    for key, q in [("p05_sag_pct", 5), ("p50_sag_pct", 50), ("p95_sag_pct", 95)]:
+        np.testing.assert_allclose(out[key], np.percentile(sags, q, axis=0), atol=SAG_BIN_WIDTH)
+    np.testing.assert_allclose(out["mean_sag_pct"], sags.mean(axis=0), rtol=1e-9)
+    np.testing.assert_allclose(out["std_sag_pct"], sags.std(axis=0), rtol=1e-6)
+    np.testing.assert_array_equal(out["p_outside"], ((sags < 25) | (sags > 35)).mean(axis=0))
+    for k in range(len(RATES)):
+        np.testing.assert_array_equal(out["hist_counts"][k], np.histogram(sags[:, k], out["hist_edges"])[0])
+
+# ==========================================================
+# Draw and worker counts are checked up front
+# ==========================================================
+@pytest.mark.parametrize("kwargs", [dict(draws=0), dict(draws=-5), dict(chunk_draws=0), dict(workers=0)])
+def test_bad_counts_raise(kwargs):
+    with pytest.raises(ValueError, match="must be at least 1"):
+        sag_tolerance(*NOMINAL, 2.8, 62.5, RATES, **kwargs)
+
+@pytest.mark.parametrize("flag", ["--draws", "--workers"])
+def test_cli_rejects_zero_counts(flag, capsys):
+    with pytest.raises(SystemExit):
+        tolerance.main(["--rider-kg", "68", "--category", "Enduro", flag, "0"])
+    assert f"{flag} must be at least 1" in capsys.readouterr().err
@@ -0,0 +1,230 @@
+import argparse
+import json
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from spring_data import (
+    CATEGORY_DATA, COUPLING_COEFFS, DEFAULT_GEAR_KG, DEFAULT_UNSPRUNG_KG, DEFAULT_SPRING_TYPE, MM_TO_IN,
+)
+from spring_engine import compute_spring_rates, rear_load_lbs, resulting_sag_pct, standard_spring_options
+from spring_models import equivalent_mm
+from kinematics import read_curve_csv
+
+# ==========================================================
+# MONTE CARLO TOLERANCE ANALYSIS
+# Samples the uncertain inputs (bike mass estimate, unsprung estimate,
+# rear bias, gear coupling and the spring's own rate tolerance) and
+# reports the resulting sag distribution and the chance of landing
+# outside the 25-35% band for each candidate spring.
+#
+#   python tolerance.py --rider-kg 68 --category Enduro --draws 5000000 --workers 4
+#
+# Draws are made in fixed-size chunks, each seeded from its own
+# SeedSequence child, so a given seed gives the same answer for any
+# number of workers. Chunks only return histogram counts and sums, so
+# memory stays flat however many draws are requested.
+#
+# With a measured leverage curve (kinematics.py) each draw's sag is
+# solved on the curve. Without preload it depends only on load / rate,
+# so that relation is tabulated once per chunk and inverted by
+# interpolation instead of bisecting every draw.
+# ==========================================================
+
+# (distribution, width): "normal" width = standard deviation,
+# "uniform" / "triangular" width = half range, "fixed" = no spread.
+# rate_pct is relative (% of the nominal rate), the rest are absolute.
+DEFAULT_TOLERANCES = {
+    "bike_kg": ("normal", 0.6),
+    "unsprung_kg": ("normal", 0.4),
+    "bias_pct": ("normal", 2.0),
+    "coupling": ("normal", 0.03),
+    "rate_pct": ("uniform", 5.0),   # "Standard coils vary +/- 5%"
+}
+DISTRIBUTIONS = ["normal", "uniform", "triangular", "fixed"]
+
+SAG_BAND = (25.0, 35.0)
+DEFAULT_DRAWS = 1_000_000
+DEFAULT_CHUNK_DRAWS = 250_000
+SAG_BIN_WIDTH = 0.1
+SAG_BIN_EDGES = np.arange(0.0, 100.0 + SAG_BIN_WIDTH / 2, SAG_BIN_WIDTH)
+CURVE_TABLE_POINTS = 4096
+
+# ==========================================================
+# 1. SAMPLING
+# ==========================================================
+def _offsets(rng, spec, size):
+    kind, width = spec
+    if kind == "fixed" or width == 0:
+        return np.zeros(size)
+    if kind == "normal":
+        return rng.normal(0.0, width, size)
+    if kind == "uniform":
+        return rng.uniform(-width, width, size)
+    if kind == "triangular":
+        return rng.triangular(-width, 0.0, width, size)
+    raise ValueError(f"Unknown distribution {kind!r}, expected one of {DISTRIBUTIONS}")
+
+def _curve_sags(curve, load, rates, spring_type):
+    # Sag % on the curve: rate * spring_in(s) = load * LR(s), i.e. load / rate = spring_in(s) / LR(s)
+    shock_mm = np.linspace(0.0, curve.stroke, CURVE_TABLE_POINTS)
+    per_rate = equivalent_mm(shock_mm, curve.stroke, spring_type) * MM_TO_IN / curve.leverage_at(shock_mm)
+    if not np.all(np.diff(per_rate) > 0):
+        # Leverage rising faster than the spring: solve each draw on the curve
+        return curve.sag_pct(load, rates, spring_type=spring_type)
+    # np.interp clamps like the solver: no load -> 0, bottomed out -> full stroke
+    return np.interp(load / rates, per_rate, shock_mm) / curve.stroke * 100
+
+def _simulate_chunk(args):
+    # One chunk of draws -> per-spring histogram counts and moments
+    seed, size, nominal, tolerances, effective_lr, stroke_mm, rates, spring_type, curve = args
+    rng = np.random.default_rng(seed)
+    # Fixed draw order keeps results reproducible when tolerances change shape
+    bike = nominal["bike_kg"] + _offsets(rng, tolerances["bike_kg"], size)
+    unsprung = np.maximum(nominal["unsprung_kg"] + _offsets(rng, tolerances["unsprung_kg"], size), 0.0)
+    bias = np.clip(nominal["bias_pct"] + _offsets(rng, tolerances["bias_pct"], size), 0.0, 100.0)
+    coupling = nominal["coupling"] + _offsets(rng, tolerances["coupling"], size)
+    rate_scale = 1.0 + _offsets(rng, tolerances["rate_pct"], (size, len(rates))) / 100
+
+    load = rear_load_lbs(nominal["rider_kg"], nominal["gear_kg"], bike, unsprung, bias, coupling)
+    if curve is not None:
+        sags = _curve_sags(curve, load[:, None], rates[None, :] * rate_scale, spring_type)
+    else:
+        sags = resulting_sag_pct(load[:, None], effective_lr, rates[None, :] * rate_scale, stroke_mm,
+                                 spring_type=spring_type)
+
+    bins = np.clip(np.searchsorted(SAG_BIN_EDGES, sags, side="right") - 1, 0, len(SAG_BIN_EDGES) - 2)
+    counts = np.stack([np.bincount(bins[:, k], minlength=len(SAG_BIN_EDGES) - 1) for k in range(len(rates))])
+    return {
+        "counts": counts,
+        "below": (sags < SAG_BAND[0]).sum(axis=0),
+        "above": (sags > SAG_BAND[1]).sum(axis=0),
+        "sum": sags.sum(axis=0),
+        "sumsq": np.square(sags).sum(axis=0),
+    }
+
+def _percentile(counts, q):
+    # Linear interpolation inside the histogram bin holding quantile q
+    cum = np.cumsum(counts)
+    target = q * cum[-1]
+    i = min(int(np.searchsorted(cum, target, side="left")), len(counts) - 1)
+    before = cum[i - 1] if i else 0
+    frac = (target - before) / counts[i] if counts[i] else 0.0
+    return SAG_BIN_EDGES[i] + frac * SAG_BIN_WIDTH
+
+# ==========================================================
+# 2. ANALYSIS
+# ==========================================================
+def sag_tolerance(rider_kg, gear_kg, bike_kg, unsprung_kg, bias_pct, coupling, effective_lr, stroke_mm, rates,
+                  draws=DEFAULT_DRAWS, tolerances=None, seed=0, chunk_draws=DEFAULT_CHUNK_DRAWS, workers=1,
+                  spring_type=None, curve=None):
+    # Without a curve, effective_lr is held fixed: the leverage at the nominal sag point.
+    # With a LeverageCurve, every draw's sag is solved on it and effective_lr / stroke_mm are unused.
+    if draws < 1 or chunk_draws < 1:
+        raise ValueError(f"draws and chunk_draws must be at least 1, got {draws} and {chunk_draws}")
+    if workers < 1:
+        raise ValueError(f"workers must be at least 1, got {workers}")
+    tolerances = {**DEFAULT_TOLERANCES, **(tolerances or {})}
+    rates = np.atleast_1d(np.asarray(rates, dtype=float))
+    nominal = {"rider_kg": float(rider_kg), "gear_kg": float(gear_kg), "bike_kg": float(bike_kg),
+               "unsprung_kg": float(unsprung_kg), "bias_pct": float(bias_pct), "coupling": float(coupling)}
+
+    sizes = [chunk_draws] * (draws // chunk_draws) + ([draws % chunk_draws] if draws % chunk_draws else [])
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    jobs = [(s, size, nominal, tolerances, float(effective_lr), float(stroke_mm), rates, spring_type, curve)
+            for s, size in zip(seeds, sizes)]
+
+    if workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parts = list(pool.map(_simulate_chunk, jobs))
+    else:
+        parts = [_simulate_chunk(job) for job in jobs]
+
+    # Summed in chunk order, so the float totals do not depend on workers
+    total = {k: sum(p[k] for p in parts) for k in parts[0]}
+    mean = total["sum"] / draws
+    std = np.sqrt(np.maximum(total["sumsq"] / draws - mean ** 2, 0.0))
+    return {
+        "rates": rates,
+        "draws": draws,
+        "mean_sag_pct": mean,
+        "std_sag_pct": std,
+        "p05_sag_pct": np.array([_percentile(c, 0.05) for c in total["counts"]]),
+        "p50_sag_pct": np.array([_percentile(c, 0.50) for c in total["counts"]]),
+        "p95_sag_pct": np.array([_percentile(c, 0.95) for c in total["counts"]]),
+        "p_below": total["below"] / draws,
+        "p_above": total["above"] / draws,
+        "p_outside": (total["below"] + total["above"]) / draws,
+        "hist_edges": SAG_BIN_EDGES,
+        "hist_counts": total["counts"],
+    }
+
+# ==========================================================
+# 3. CLI
+# ==========================================================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Monte Carlo sag tolerance for candidate springs.")
+    parser.add_argument("--rider-kg", type=float, required=True)
+    parser.add_argument("--category", required=True, choices=list(CATEGORY_DATA))
+    parser.add_argument("--gear-kg", type=float, default=DEFAULT_GEAR_KG)
+    parser.add_argument("--bike-kg", type=float, help="Default: category default")
+    parser.add_argument("--unsprung-kg", type=float, default=DEFAULT_UNSPRUNG_KG)
+    parser.add_argument("--bias-pct", type=float, help="Default: category default")
+    parser.add_argument("--sag-pct", type=float, help="Target sag, default: category default")
+    parser.add_argument("--stroke-mm", type=float, help="Default: category default")
+    parser.add_argument("--travel-mm", type=float, help="Default: category default")
+    parser.add_argument("--spring-type", default=DEFAULT_SPRING_TYPE)
+    parser.add_argument("--curve", help="Leverage curve CSV (see kinematics.py); overrides stroke and travel")
+    parser.add_argument("--rates", type=float, nargs="+", help="Candidate springs (default: recommended ±25 lbs)")
+    parser.add_argument("--draws", type=int, default=DEFAULT_DRAWS)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--tolerance", nargs=3, action="append", metavar=("NAME", "DIST", "WIDTH"),
+                        help=f"Override a tolerance, e.g. --tolerance bias_pct uniform 3 ({', '.join(DEFAULT_TOLERANCES)})")
+    parser.add_argument("--json", action="store_true", help="Print the summary as JSON")
+    args = parser.parse_args(argv)
+    if args.draws < 1:
+        parser.error("--draws must be at least 1")
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+
+    d = CATEGORY_DATA[args.category]
+    bike_kg = d["bike_mass_def_kg"] if args.bike_kg is None else args.bike_kg
+    bias = d["bias"] if args.bias_pct is None else args.bias_pct
+    sag = d["base_sag"] if args.sag_pct is None else args.sag_pct
+    stroke = d["stroke"] if args.stroke_mm is None else args.stroke_mm
+    travel = d["travel"] if args.travel_mm is None else args.travel_mm
+    coupling = COUPLING_COEFFS[args.category]
+    curve = read_curve_csv(args.curve) if args.curve else None
+    if curve is not None:
+        stroke, travel = curve.stroke, curve.travel
+
+    res = compute_spring_rates(args.rider_kg, args.gear_kg, bike_kg, args.unsprung_kg, bias,
+                               stroke, travel, sag, args.spring_type, coupling, turns=(), curve=curve)
+    rates = args.rates
+    if rates is None:
+        rates, _ = standard_spring_options(res["rear_load_lbs"], res["effective_lr"], res["rounded_rate"], stroke,
+                                           curve=curve)
+        rates = rates[~np.isnan(rates)]
+    tolerances = {}
+    for name, dist, width in args.tolerance or []:
+        if name not in DEFAULT_TOLERANCES or dist not in DISTRIBUTIONS:
+            parser.error(f"Bad tolerance {name} {dist}")
+        tolerances[name] = (dist, float(width))
+
+    out = sag_tolerance(args.rider_kg, args.gear_kg, bike_kg, args.unsprung_kg, bias, coupling,
+                        res["effective_lr"], stroke, rates, draws=args.draws, tolerances=tolerances,
+                        seed=args.seed, workers=args.workers, spring_type=args.spring_type, curve=curve)
+
+    keys = ["mean_sag_pct", "std_sag_pct", "p05_sag_pct", "p50_sag_pct", "p95_sag_pct", "p_below", "p_above", "p_outside"]
+    if args.json:
+        print(json.dumps([{"rate": float(r), **{k: float(out[k][i]) for k in keys}} for i, r in enumerate(out["rates"])]))
+        return
+    print(f"{out['draws']} draws, band {SAG_BAND[0]:.0f}-{SAG_BAND[1]:.0f}% sag")
+    for i, r in enumerate(out["rates"]):
+        print(f"{r:6.0f} lbs  sag {out['p50_sag_pct'][i]:5.1f}% "
+              f"(90%: {out['p05_sag_pct'][i]:.1f}-{out['p95_sag_pct'][i]:.1f})  "
+              f"outside band {out['p_outside'][i] * 100:5.1f}%")
+
+if __name__ == "__main__":
+    main()